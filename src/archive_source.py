@@ -0,0 +1,199 @@
+"""Read project sources straight from zip and tar archives.
+
+A CodeStore whose project path is an archive (.zip, .tar, .tar.gz/.tgz or
+.tar.zst/.tzst) indexes its members without extracting them to disk. Members
+are streamed in archive order, so a compressed tar is decompressed once per
+run; zip files and plain tars can also read single members on demand.
+
+Reading .tar.zst archives needs the optional `zstandard` package.
+"""
+
+import os
+import time
+import tarfile
+import zipfile
+import logging
+import posixpath
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Generator, NamedTuple, Optional, Tuple, Union
+
+ARCHIVE_SUFFIXES = {
+    '.tar.gz': 'tar.gz', '.tgz': 'tar.gz',
+    '.tar.zst': 'tar.zst', '.tzst': 'tar.zst',
+    '.tar': 'tar', '.zip': 'zip',
+}
+
+
+def archive_kind(path: Union[str, Path]) -> Optional[str]:
+    """'zip', 'tar', 'tar.gz' or 'tar.zst' for a supported archive file name, else None."""
+    name = Path(path).name.lower()
+    for suffix, kind in ARCHIVE_SUFFIXES.items():
+        if name.endswith(suffix):
+            return kind
+    return None
+
+
+def is_archive(path: Union[str, Path]) -> bool:
+    """Check whether a path is an existing file in a supported archive format."""
+    return archive_kind(path) is not None and Path(path).is_file()
+
+
+def member_path(name: str) -> Optional[str]:
+    """
+    Normalise a member name to a '/'-separated path relative to the archive
+    root, or None for names that would leave it.
+    """
+    name = name.replace('\\', '/')
+    while name.startswith('./'):
+        name = name[2:]
+    name = posixpath.normpath(name.lstrip('/'))
+    if name in ('', '.') or name == '..' or name.startswith('../'):
+        return None
+    return name
+
+
+class ArchiveMember(NamedTuple):
+    """A regular file in an archive."""
+    name: str
+    size: int
+    mtime: float
+
+    def stat_result(self) -> os.stat_result:
+        """A stat result for the member, as the directory walk would give for a file."""
+        return os.stat_result((0o100644, 0, 0, 1, 0, 0, self.size, self.mtime, self.mtime, self.mtime))
+
+
+class ArchiveSource:
+    """Streams the regular files of an archive, or reads them one at a time."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.kind = archive_kind(self.path)
+        if self.kind is None:
+            raise ValueError(f"Unsupported archive format: {self.path}")
+        if self.kind == 'tar.zst':
+            # Fail when the store is opened rather than midway through a run
+            _zstandard(self.path)
+        # Opened on the first read() of a zip or plain tar
+        self.handle: Optional[Union[zipfile.ZipFile, tarfile.TarFile]] = None
+        self.lock = threading.Lock()
+
+    @property
+    def random_access(self) -> bool:
+        """Whether single members can be read without decompressing everything before them."""
+        return self.kind in ('zip', 'tar')
+
+    @property
+    def stem(self) -> str:
+        """Archive file name without its archive suffix."""
+        name = self.path.name
+        for suffix in ARCHIVE_SUFFIXES:
+            if name.lower().endswith(suffix):
+                return name[:-len(suffix)]
+        return name
+
+    def stamp(self) -> Dict:
+        """Size and mtime of the archive file, for telling whether it was replaced."""
+        stats = self.path.stat()
+        return {'size': stats.st_size, 'mtime': stats.st_mtime}
+
+    def members(self) -> Generator[Tuple[ArchiveMember, Callable[[], bytes]], None, None]:
+        """
+        Yield each regular file with a function reading its contents, in
+        archive order. The function must be called before the next member is
+        requested; members that are not read are skipped without buffering.
+        """
+        if self.kind == 'zip':
+            with zipfile.ZipFile(self.path) as archive:
+                for info in archive.infolist():
+                    name = member_path(info.filename)
+                    if info.is_dir() or name is None:
+                        continue
+                    mtime = time.mktime(info.date_time + (0, 0, -1))
+                    yield (ArchiveMember(name, info.file_size, mtime),
+                           lambda info=info: archive.read(info))
+            return
+
+        with self._tar_stream() as archive:
+            for info in archive:
+                name = member_path(info.name)
+                if not info.isfile() or name is None:
+                    continue
+                yield (ArchiveMember(name, info.size, float(info.mtime)),
+                       lambda info=info: self._read_tar_member(archive, info))
+
+    def read(self, name: str) -> Optional[bytes]:
+        """
+        Read one member by its archive-relative path. Compressed tars are
+        scanned from the start, so prefer the contents members() yields.
+        """
+        if not self.random_access:
+            for member, read in self.members():
+                if member.name == name:
+                    return read()
+            return None
+
+        with self.lock:
+            try:
+                if self.handle is None:
+                    self.handle = zipfile.ZipFile(self.path) if self.kind == 'zip' else tarfile.open(self.path, 'r:')
+                if self.kind == 'zip':
+                    return self._read_zip_entry(name)
+                info = self._find_tar_entry(name)
+                return self._read_tar_member(self.handle, info) if info is not None else None
+            except (OSError, KeyError, zipfile.BadZipFile, tarfile.TarError) as e:
+                logging.error(f"Error reading {name} from {self.path}: {e}")
+                return None
+
+    def close(self) -> None:
+        """Close the handle opened for read()."""
+        with self.lock:
+            if self.handle is not None:
+                self.handle.close()
+                self.handle = None
+
+    def _read_zip_entry(self, name: str) -> Optional[bytes]:
+        """Read a zip member, trying the names it may be stored under. Caller holds the lock."""
+        for candidate in (name, f"./{name}", f"/{name}"):
+            try:
+                return self.handle.read(candidate)
+            except KeyError:
+                continue
+        return None
+
+    def _find_tar_entry(self, name: str) -> Optional[tarfile.TarInfo]:
+        """Find a plain tar member by its normalised path. Caller holds the lock."""
+        for candidate in (name, f"./{name}", f"/{name}"):
+            try:
+                return self.handle.getmember(candidate)
+            except KeyError:
+                continue
+        return None
+
+    @staticmethod
+    def _read_tar_member(archive: tarfile.TarFile, info: tarfile.TarInfo) -> bytes:
+        with archive.extractfile(info) as f:
+            return f.read()
+
+    @contextmanager
+    def _tar_stream(self) -> Generator[tarfile.TarFile, None, None]:
+        """Open the tar for a single forward pass, decompressing as it goes."""
+        if self.kind != 'tar.zst':
+            with tarfile.open(self.path, 'r|*') as archive:
+                yield archive
+            return
+        zstandard = _zstandard(self.path)
+        with open(self.path, 'rb') as raw, zstandard.ZstdDecompressor().stream_reader(raw) as stream:
+            with tarfile.open(fileobj=stream, mode='r|') as archive:
+                yield archive
+
+
+def _zstandard(path: Path):
+    """Import the optional zstandard package, needed for .tar.zst archives."""
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError(f"Reading {path} needs the zstandard package: pip install zstandard")
+    return zstandard
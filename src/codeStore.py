@@ -4,12 +4,24 @@ import sys
 import time
 import fnmatch
 import logging
+import threading
 import customprint  # Import the custom print module
-from typing import List, Set, Dict, Optional, Generator
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Set, Dict, Optional, Generator, Iterable, Tuple
 from llama_index.core import Document
-import chardet
+from watchfiles import watch, DefaultFilter
 from gitignore import GitignoreParser  # Import the GitignoreParser from gitignore.py
+from file_manifest import FileManifest, hash_bytes, hash_file, make_entry
 from embedding_model import init_embedding_model
+from code_chunker import init_node_parser
+from file_classifier import SNIFF_BYTES, FileClassifier, detect_encoding
+from ingest_metrics import IngestMetrics
+from symbol_index import DEFAULT_SYMBOLS_DIR, SymbolIndex, extract_symbols
+from import_graph import DEFAULT_IMPORTS_DIR, ImportGraph, extract_imports
+from archive_source import ArchiveSource, is_archive
+from git_changes import (git_root, head_commit, changed_paths, tracked_blobs, worktree_changes,
+                         untracked_files, GitBlobReader)
 
 class CodeDocumentProcessor:
     """Handles reading and processing of code files."""
@@ -19,9 +31,22 @@ class CodeDocumentProcessor:
         '.html', '.css', '.json', '.yaml', '.yml',
         '.md', '.txt', '.sh', '.bash', '.sql'
     }
+    # Indexing order by kind of file: source, then markup, then docs, then config
+    PRIORITY_BY_EXTENSION = {
+        '.py': 0, '.js': 0, '.jsx': 0, '.ts': 0, '.tsx': 0, '.sh': 0, '.bash': 0, '.sql': 0,
+        '.html': 1, '.css': 1,
+        '.md': 2, '.txt': 2,
+        '.json': 3, '.yaml': 3, '.yml': 3,
+    }
+    # Metadata kept on documents and their chunks but left out of the text
+    # embedded or sent to the LLM: timestamps and size change without the
+    # content changing, and the file's type and name repeat its file_path
+    EXCLUDED_METADATA_KEYS = ['creation_time', 'modification_time', 'size', 'file_type', 'file_name']
 
     def __init__(self):
         self.errors: List[Dict] = []
+        # Run metrics set by CodeStore, counting decode fallbacks
+        self.metrics: Optional[IngestMetrics] = None
 
     def is_supported_file(self, path: Path) -> bool:
         """Check if a file is supported based on its extension."""
@@ -37,23 +62,54 @@ class CodeDocumentProcessor:
         Returns:
             Optional[str]: File contents if successful, None if failed
         """
+        raw_data = self.read_bytes(path)
+        if raw_data is None:
+            return None
+        return self.decode(path, raw_data)
+
+    def read_bytes(self, path: Path, sniff: Optional[Callable[[bytes], bool]] = None) -> Optional[bytes]:
+        """
+        Read a file's raw bytes, recording an error if it cannot be read.
+
+        If sniff is given, it is called with the first SNIFF_BYTES + 1 bytes
+        and the rest is only read if it returns True; otherwise None is returned.
+        """
         try:
-            # First try UTF-8
-            try:
-                with path.open('r', encoding='utf-8') as f:
+            with path.open('rb') as f:
+                if sniff is None:
                     return f.read()
+                head = f.read(SNIFF_BYTES + 1)
+                if not sniff(head):
+                    return None
+                return head + f.read()
+        except Exception as e:
+            self.errors.append({
+                'path': str(path),
+                'error': str(e),
+                'type': 'read_error'
+            })
+            logging.error(f"Error reading file {path}: {e}")
+            return None
+
+    def decode(self, path: Path, raw_data: bytes) -> Optional[str]:
+        """
+        Decode file contents, trying UTF-8 first and falling back to chardet.
+
+        Only a sample of the file is given to chardet, so characters the guessed
+        encoding cannot decode are replaced rather than failing the file. Line endings are normalised the way a text-mode read would.
+        """
+        try:
+            try:
+                text = raw_data.decode('utf-8')
             except UnicodeDecodeError:
-                # If UTF-8 fails, detect encoding
-                with path.open('rb') as f:
-                    raw_data = f.read()
-                    result = chardet.detect(raw_data)
-                    encoding = result['encoding']
-                    
-                if encoding:
-                    with path.open('r', encoding=encoding) as f:
-                        return f.read()
-                else:
+                # If UTF-8 fails, detect encoding from a sample
+                if self.metrics is not None:
+                    self.metrics.count('decode_fallbacks')
+                encoding = detect_encoding(raw_data)
+                if not encoding:
                     raise ValueError(f"Could not detect encoding for {path}")
+                text = raw_data.decode(encoding, errors='replace')
+            return text.replace('\r\n', '\n').replace('\r', '\n')
 
         except Exception as e:
             self.errors.append({
@@ -64,79 +120,145 @@ class CodeDocumentProcessor:
             logging.error(f"Error reading file {path}: {e}")
             return None
 
-    def create_document(self, path: Path, content: str, metadata: Dict) -> Document:
-        """Create a Document object from file content with metadata."""
+    def create_document(self, path: Path, content: str, metadata: Dict,
+                        file_path: Optional[str] = None) -> Document:
+        """
+        Create a Document object from file content with metadata, keyed by file path.
+        Only file_path and content-derived metadata reach the embedded and LLM text.
+
+        Args:
+            file_path: Path recorded in the metadata, if not the document's path
+        """
         return Document(
+            id_=str(path),
             text=content,
             metadata={
-                'file_path': str(path),
+                'file_path': file_path or str(path),
                 'file_type': path.suffix.lower(),
                 'file_name': path.name,
                 **metadata
-            }
+            },
+            excluded_embed_metadata_keys=list(self.EXCLUDED_METADATA_KEYS),
+            excluded_llm_metadata_keys=list(self.EXCLUDED_METADATA_KEYS),
         )
 
 class CodeStore:
     """Main class for managing code document storage and processing."""
     
-    def __init__(self, project_path: str, store_name: Optional[str] = None):
+    # Recorded in the file manifest by full indexes and kept by incremental ones;
+    # bumped when documents change in a way stores built earlier cannot pick up
+    # incrementally. 2: volatile metadata is no longer embedded (see
+    # CodeDocumentProcessor.EXCLUDED_METADATA_KEYS)
+    STORE_FORMAT = 2
+
+    def __init__(self, project_path: str, store_name: Optional[str] = None,
+                 read_workers: int = 8, max_inflight_bytes: int = 64 * 1024 * 1024,
+                 manifest_dir: str = "vector_stores/manifests",
+                 classifier: Optional[FileClassifier] = None,
+                 symbols_dir: str = DEFAULT_SYMBOLS_DIR,
+                 imports_dir: str = DEFAULT_IMPORTS_DIR,
+                 pinned_dirs: Optional[Iterable[str]] = None):
         self.project_path = Path(project_path).resolve()
-        self.store_name = store_name or self.project_path.name
+        # Zip and tar projects are read member by member, without extracting them
+        self.archive = ArchiveSource(self.project_path) if is_archive(self.project_path) else None
+        self.store_name = store_name or (self.archive.stem if self.archive else self.project_path.name)
         self.processor = CodeDocumentProcessor()
-        self.gitignore = GitignoreParser(self.project_path / '.gitignore')  # Remove log_level argument
+        # An archive's .gitignore is read from its root member by each scan of it
+        self.gitignore = (GitignoreParser(self.project_path / '.gitignore') if self.archive is None
+                          else GitignoreParser(self.project_path / '.gitignore', text=''))
         self.docs_processed = 0
         self.errors: List[Dict] = []
+        # Parallel reading: thread count and cap on bytes being read at once
+        self.read_workers = read_workers
+        self.max_inflight_bytes = max_inflight_bytes
+        # Content-hash manifest of indexed files, saved by commit_manifest()
+        self.file_manifest = FileManifest(Path(manifest_dir) / f"{self.store_name}.json")
+        self.pending_manifest: Optional[Dict[str, Dict]] = None
+        self.pending_meta: Optional[Dict] = None
+        self.failed_paths: Set[str] = set()
+        self.removed_document_ids: List[str] = []
+        # Definitions and imports found in each file read, saved by commit_manifest()
+        self.symbol_index = SymbolIndex.for_store(self.store_name, symbols_dir)
+        self.import_graph = ImportGraph.for_store(self.store_name, imports_dir)
+        self.pending_symbols: Dict[str, List[Dict]] = {}
+        self.pending_imports: Dict[str, List[str]] = {}
+        self.symbols_lock = threading.Lock()
+        # Content hashes known before reading, and the files the current plan re-indexes
+        self.known_hashes: Dict[str, str] = {}
+        self.planned_paths: Set[str] = set()
+        # Files the current run has finished with, and the commit a resumed run diffs from
+        self.recorded_paths: Set[str] = set()
+        self.resume_commit: Optional[str] = None
+        # Git checkout containing the project, used to enumerate changes cheaply
+        self.git_root = git_root(self.project_path) if self.archive is None else None
+        # Set by plan_git_index: blob SHA of each file whose contents come from git
+        self.git_blobs: Dict[str, str] = {}
+        self.blob_reader: Optional[GitBlobReader] = None
+        # Contents of blobs shared by several files, kept until every copy is read
+        self.shared_blobs: Dict[str, int] = {}
+        self.blob_cache: Dict[str, bytes] = {}
+        self.blob_lock = threading.Lock()
+        # Contents of compressed tar members streamed by a plan and not yet read, the
+        # changed members still to be streamed again, and the stream doing so
+        self.archive_cache: Dict[str, bytes] = {}
+        self.archive_wanted: Set[str] = set()
+        self.archive_stream: Optional[Generator] = None
+        # Project-relative directories indexed before everything else
+        self.pinned_dirs = [Path(d).as_posix().strip('/') for d in (pinned_dirs or [])]
+        # Skips binary, oversized, minified and lock files before they are embedded
+        self.classifier = classifier or FileClassifier()
+        # Background watcher started by start_watching()
+        self.watch_thread: Optional[threading.Thread] = None
+        self.watch_stop: Optional[threading.Event] = None
+        # Counters and stage timings, restarted whenever a run is planned
+        self.metrics = IngestMetrics()
+        self.processor.metrics = self.metrics
         
-        # Initialize embedding model
+        # Initialize embedding model and syntax-aware chunking
         init_embedding_model()
+        init_node_parser()
 
-    def process_project(self, batch_size: int = 100) -> List[Document]:
+    def process_project(self, batch_size: int = 100, metrics_path: Optional[str] = None) -> List[Document]:
         """
         Process all files in the project directory.
         
         Args:
             batch_size: Number of documents to process in each batch
+            metrics_path: Write the run's metrics to this JSON file
             
         Returns:
-            List[Document]: List of processed documents
+            List[Document]: List of processed documents. The run's metrics are
+            left in self.metrics (see IngestMetrics.to_dict)
         """
         documents = []
         current_batch = []
-        total_files = 0
         processed_files = 0
         
         try:
             print(f"Starting project processing at {self.project_path}")
             
-            # First count total files for progress reporting
-            for _ in self._iterate_files():
-                total_files += 1
-            
-            print(f"Found {total_files} files to process")
-            
-            # Now process files
-            for file_path in self._iterate_files():
-                if self.processor.is_supported_file(file_path):
-                    processed_files += 1
-                    if processed_files % 100 == 0:  # Progress update every 100 files
-                        print(f"Processing file {processed_files}/{total_files}: {file_path.name}")
+            # Single pass: files are read as the walk discovers them
+            for file_path, stats, doc, content_hash in self._read_documents(self.plan_full_index()):
+                processed_files += 1
+                if processed_files % 100 == 0:  # Progress update every 100 files
+                    print(f"Processing file {processed_files}: {file_path.name}")
+                
+                if doc is not None:
+                    self.record_file(file_path, stats, content_hash)
+                    current_batch.append(doc)
                     
-                    content = self.processor.read_file(file_path)
-                    if content is not None:
-                        metadata = self._get_file_metadata(file_path)
-                        doc = self.processor.create_document(file_path, content, metadata)
-                        current_batch.append(doc)
-                        
-                        if len(current_batch) >= batch_size:
-                            documents.extend(current_batch)
-                            print(f"Completed batch of {batch_size} documents. Total processed: {len(documents)}")
-                            current_batch = []
+                    if len(current_batch) >= batch_size:
+                        documents.extend(current_batch)
+                        print(f"Completed batch of {batch_size} documents. Total processed: {len(documents)}")
+                        current_batch = []
                             
             if current_batch:
                 documents.extend(current_batch)
                 
             self.docs_processed = len(documents)
             print(f"Project processing complete. Total documents: {self.docs_processed}")
+            self.report_skipped()
+            self._report_metrics(metrics_path)
             return documents
             
         except Exception as e:
@@ -147,64 +269,70 @@ class CodeStore:
             print(f"Error processing project: {e}")
             raise
 
-    def process_changed_files(self, last_update_time: float, batch_size: int = 100) -> List[Document]:
+    def process_changed_files(self, last_update_time: float, batch_size: int = 100,
+                              metrics_path: Optional[str] = None) -> List[Document]:
         """
-        Process only files that have been modified since the last update.
+        Process only files whose content has changed since the last update.
+        
+        See find_changed_files for how changes are detected. Deleted files,
+        the old paths of renamed files and indexed files the classifier now
+        skips are left in removed_document_ids for the caller to delete from
+        the vector store. Check needs_rebuild first: a store without a file
+        manifest, or indexed with an older STORE_FORMAT, must be cleared and
+        processed with process_project.
         
         Args:
-            last_update_time: Unix timestamp of last update
+            last_update_time: Unix timestamp of last update, used without a manifest
             batch_size: Number of documents to process in each batch
+            metrics_path: Write the run's metrics to this JSON file
             
         Returns:
-            List[Document]: List of processed documents
+            List[Document]: List of processed documents. The run's metrics are
+            left in self.metrics (see IngestMetrics.to_dict)
         """
         documents = []
         current_batch = []
-        total_files = 0
-        modified_files = []
         processed_files = 0
         
         try:
-            print(f"Looking for files modified since {time.ctime(last_update_time)}")
-            
-            # First count total files and collect modified files for reporting
-            for file_path in self._iterate_files():
-                if self._is_file_modified(file_path, last_update_time):
-                    total_files += 1
-                    modified_files.append(file_path)
-            
+            changed_files = self.find_changed_files(last_update_time)
+            total_files = len(changed_files)
             if total_files == 0:
                 print("No modified files found")
+                self._report_metrics(metrics_path)
                 return []
                 
             print(f"Found {total_files} modified files to process")
             print("First 10 modified files:")
-            for i, file_path in enumerate(modified_files[:10]):
+            for i, (file_path, _) in enumerate(changed_files[:10]):
                 print(f"{i+1}. {file_path}")
             
             # Now process modified files
-            for file_path in self._iterate_files():
-                if self.processor.is_supported_file(file_path) and self._is_file_modified(file_path, last_update_time):
-                    processed_files += 1
-                    if processed_files % 10 == 0:  # Progress update every 10 files for changed files
-                        print(f"Processing modified file {processed_files}/{total_files}: {file_path.name}")
-                    
-                    content = self.processor.read_file(file_path)
-                    if content is not None:
-                        metadata = self._get_file_metadata(file_path)
-                        doc = self.processor.create_document(file_path, content, metadata)
-                        current_batch.append(doc)
-                        
-                        if len(current_batch) >= batch_size:
-                            documents.extend(current_batch)
-                            print(f"Completed batch of {batch_size} documents. Total processed: {len(documents)}")
-                            current_batch = []
+            for file_path, stats, doc, content_hash in self._read_documents(changed_files):
+                processed_files += 1
+                if processed_files % 10 == 0:  # Progress update every 10 files for changed files
+                    print(f"Processing modified file {processed_files}/{total_files}: {file_path.name}")
+                
+                if doc is None:
+                    if self.record_failed_file(file_path):
+                        self.removed_document_ids.append(str(file_path))
+                    continue
+                
+                self.record_file(file_path, stats, content_hash)
+                current_batch.append(doc)
+                
+                if len(current_batch) >= batch_size:
+                    documents.extend(current_batch)
+                    print(f"Completed batch of {batch_size} documents. Total processed: {len(documents)}")
+                    current_batch = []
                             
             if current_batch:
                 documents.extend(current_batch)
                 
             self.docs_processed += len(documents)
             print(f"Modified files processing complete. Total documents: {len(documents)}")
+            self.report_skipped()
+            self._report_metrics(metrics_path)
             return documents
             
         except Exception as e:
@@ -215,21 +343,853 @@ class CodeStore:
             print(f"Error processing changed files: {e}")
             raise
 
-    def _iterate_files(self) -> Generator[Path, None, None]:
-        """Iterate through project files, respecting .gitignore rules."""
-        def _scan_directory(directory: Path):
+    def find_changed_files(self, last_update_time: float) -> List[Tuple[Path, os.stat_result]]:
+        """
+        Find the files that need (re)indexing, without reading them.
+        
+        When the project is a git checkout and the manifest records the commit
+        last indexed, only the paths git reports as changed since that commit
+        (plus untracked files, indexed files git does not track and files that
+        failed last time) are examined.
+        Otherwise, when the store has a file manifest, changes are found by
+        walking the project and diffing it: files are only hashed if their
+        size or mtime moved, and only added, modified or renamed content is
+        returned. Without a manifest this falls back to comparing mtimes with
+        last_update_time, but callers should rebuild such stores instead (see
+        needs_rebuild). Archive projects are diffed member by member against
+        the manifest, or not at all if the archive file is unchanged.
+        
+        Sets removed_document_ids and starts a pending manifest that
+        record_file/record_failed_file complete and commit_manifest saves.
+        
+        Args:
+            last_update_time: Unix timestamp of last update, used without a manifest
+            
+        Returns:
+            List[Tuple[Path, os.stat_result]]: Files to read and index
+        """
+        self._start_metrics()
+        if self.archive is not None:
+            return self._find_changed_archive_members()
+        commit = head_commit(self.project_path) if self.git_root else None
+        if self.file_manifest.exists():
+            changed_files = self._find_changed_files_with_git(commit)
+            if changed_files is not None:
+                return changed_files
+
+        self.classifier.reset()
+        self._forget_blobs()
+        self.pending_meta = {'git_commit': commit, 'format': self.file_manifest.meta.get('format', 1)}
+        self.failed_paths = set()
+        if self.file_manifest.exists():
+            print("Looking for changed files using the file manifest")
+            changes = self.file_manifest.diff(
+                (self._relative_path(path), path, stats) for path, stats in self._supported_files())
+            print(f"{len(changes['added'])} added, {len(changes['modified'])} modified, "
+                  f"{len(changes['renamed'])} renamed, {len(changes['deleted'])} deleted, "
+                  f"{len(changes['touched'])} touched without content changes, "
+                  f"{changes['unchanged']} unchanged")
+            changed_files = [(path, stats) for _, path, stats, _ in changes['added'] + changes['modified']]
+            changed_files += [(path, stats) for _, _, path, stats, _ in changes['renamed']]
+            removed_paths = changes['deleted'] + [old_path for old_path, *_ in changes['renamed']]
+            known_hashes = {str(path): content_hash
+                            for _, path, _, content_hash in changes['added'] + changes['modified']}
+            known_hashes.update((str(path), content_hash) for _, _, path, _, content_hash in changes['renamed'])
+            self.pending_manifest = self.file_manifest.apply(changes)
+        else:
+            print(f"Looking for files modified since {time.ctime(last_update_time)}")
+            changed_files = []
+            removed_paths = []
+            known_hashes = {}
+            self.pending_manifest = {}
+            for path, stats in self._supported_files():
+                if stats.st_mtime > last_update_time:
+                    changed_files.append((path, stats))
+                else:
+                    # No manifest yet: record unchanged files so the next run can diff
+                    content_hash = hash_file(path)
+                    if content_hash is not None:
+                        self.record_file(path, stats, content_hash)
+        
+        return self._finish_plan(changed_files, removed_paths, known_hashes)
+
+    def _find_changed_files_with_git(self, commit: Optional[str]) -> Optional[List[Tuple[Path, os.stat_result]]]:
+        """
+        Find changed files from git instead of walking the project.
+
+        Returns:
+            Optional[List[Tuple[Path, os.stat_result]]]: Files to read and index,
+            or None if git cannot be used and the project must be walked
+        """
+        indexed_commit = self.file_manifest.meta.get('git_commit')
+        if not (commit and indexed_commit):
+            return None
+        paths = changed_paths(self.git_root, indexed_commit)
+        if paths is None:
+            return None
+
+        tracked = tracked_blobs(self.project_path)
+        if tracked is None:
+            return None
+
+        paths = {path for path in paths if self.project_path in path.parents}
+        print(f"Git reports {len(paths)} paths changed since commit {indexed_commit[:12]}")
+        paths.update(self.project_path / path for path in self.file_manifest.meta.get('retry', []))
+        # Git says nothing about indexed files it does not track: untracked files
+        # since deleted, and files it ignores. They are stat-ed instead, and
+        # plan_changes skips those whose size and mtime match the manifest
+        paths.update(self.project_path / path for path in self.file_manifest.entries if path not in tracked)
+        changed_files = self.plan_changes(paths)
+        print(f"{len(changed_files)} changed, {len(self.removed_document_ids)} removed")
+        self.pending_meta['git_commit'] = commit
+        self.failed_paths = set()
+        return changed_files
+
+    def prioritize(self, files: Iterable[Tuple[Path, os.stat_result]]) -> List[Tuple[Path, os.stat_result]]:
+        """
+        Order planned files so the most useful are indexed first: files in
+        pinned directories, then source before markup, docs and config, and
+        within each group the most recently modified first.
+
+        Args:
+            files: (path, stat result) pairs from any plan_* or find_changed_files call
+
+        Returns:
+            List[Tuple[Path, os.stat_result]]: The same files, reordered. Files
+            of compressed tars are returned as given, since they can only be
+            read in archive order
+        """
+        if self.archive is not None and not self.archive.random_access:
+            return files
+
+        def priority(item: Tuple[Path, os.stat_result]) -> Tuple[int, int, float]:
+            file_path, stats = item
+            relative_path = self._relative_path(file_path)
+            pinned = any(relative_path == d or relative_path.startswith(d + '/') for d in self.pinned_dirs)
+            kind = self.processor.PRIORITY_BY_EXTENSION.get(file_path.suffix.lower(), 4)
+            return (0 if pinned else 1, kind, -(stats.st_mtime if stats is not None else 0.0))
+
+        return sorted(files, key=priority)
+
+    def plan_changes(self, paths: Iterable[Path]) -> List[Tuple[Path, os.stat_result]]:
+        """
+        Work out what a set of changed paths means for the index. Used by watch
+        mode and by git-based change detection.
+
+        Like find_changed_files, but only the given paths are examined. Paths
+        that no longer exist are removed, along with every indexed file below
+        them if they were directories. Directories that appear (e.g. moved into
+        the project) are walked. Files whose content hash matches the manifest
+        are not returned.
+
+        Args:
+            paths: Absolute paths reported as added, modified or deleted
+
+        Returns:
+            List[Tuple[Path, os.stat_result]]: Files to read and index
+        """
+        self.classifier.reset()
+        self._forget_blobs()
+        self.pending_meta = dict(self.file_manifest.meta)
+        self.failed_paths = set(self.file_manifest.meta.get('retry', []))
+        entries = dict(self.file_manifest.entries)
+        changed_files = []
+        removed_paths = []
+        known_hashes = {}
+
+        def remove(relative_path: str) -> None:
+            if entries.pop(relative_path, None) is not None:
+                removed_paths.append(relative_path)
+
+        # Relative path -> (path, stats), so a file reported both by itself and
+        # below a new directory in the same burst is planned once
+        candidates: Dict[str, Tuple[Path, os.stat_result]] = {}
+        for path in sorted(set(Path(p) for p in paths)):
+            relative_path = self._relative_path(path)
+            if path.is_dir():
+                found = list(self._supported_files(path))
+            elif path.is_file():
+                stats = path.stat()
+                found = [(path, stats)] if self._should_index(path, stats) else []
+            else:
+                found = []
+            if not found:
+                # Gone, ignored or unsupported: drop it and anything indexed below it
+                remove(relative_path)
+                prefix = relative_path + '/'
+                for indexed_path in [p for p in entries if p.startswith(prefix)]:
+                    remove(indexed_path)
+                continue
+            candidates.update((self._relative_path(file_path), (file_path, stats)) for file_path, stats in found)
+
+        for relative_file, (file_path, stats) in candidates.items():
+            entry = entries.get(relative_file)
+            if entry and entry['size'] == stats.st_size and entry['mtime'] == stats.st_mtime:
+                continue
+            content_hash = hash_file(file_path)
+            if content_hash is None:
+                continue
+            if entry and entry['hash'] == content_hash:
+                entries[relative_file] = make_entry(stats, content_hash, entry.get('duplicate_of'))
+                continue
+            changed_files.append((file_path, stats))
+            known_hashes[str(file_path)] = content_hash
+
+        self.pending_manifest = entries
+        return self._finish_plan(changed_files, removed_paths, known_hashes)
+
+    def _finish_plan(self, changed_files: List[Tuple[Path, os.stat_result]], removed_paths: List[str],
+                     known_hashes: Dict[str, str]) -> List[Tuple[Path, os.stat_result]]:
+        """
+        Complete an incremental plan. Files stored as references to a file
+        that is changing or going away are re-indexed too, so one of them can
+        take over its content.
+        """
+        gone = set(removed_paths) | {self._relative_path(path) for path, _ in changed_files}
+        for relative_path, entry in self.pending_manifest.items():
+            if entry.get('duplicate_of') in gone and relative_path not in gone:
+                path = self.project_path / relative_path
+                try:
+                    changed_files.append((path, path.stat()))
+                except OSError:
+                    continue
+                known_hashes[str(path)] = entry['hash']
+
+        self.known_hashes = known_hashes
+        self.planned_paths = {self._relative_path(path) for path, _ in changed_files}
+        self.recorded_paths = set()
+        self.resume_commit = self.file_manifest.meta.get('git_commit')
+        self.removed_document_ids = [str(self.project_path / path) for path in removed_paths]
+        return changed_files
+
+    def index_changes(self, manager, pipeline, paths: Iterable[Path]) -> int:
+        """
+        Bring the store up to date with a batch of changed paths.
+
+        Args:
+            manager: VectorStoreManager or VectorStoreClient holding the store
+            pipeline: IngestionPipeline inserting into the store
+            paths: Absolute paths reported as changed
+
+        Returns:
+            int: Number of files re-indexed or removed
+        """
+        self._start_metrics()
+        changed_files = self.plan_changes(paths)
+        if self.removed_document_ids:
+            print(f"Removing {len(self.removed_document_ids)} deleted files from {self.store_name}")
+            manager.delete_from_vector_store(self.store_name, self.removed_document_ids)
+        if changed_files:
+            print(f"Re-indexing {len(changed_files)} changed files in {self.store_name}")
+            pipeline.run(changed_files)
+        if changed_files or self.removed_document_ids:
+            manager.update_store_timestamp(self.store_name)
+        self.commit_manifest()
+        return len(changed_files) + len(self.removed_document_ids)
+
+    def watch(self, manager, pipeline=None, debounce_ms: int = 1000, step_ms: int = 100,
+              stop_event: Optional[threading.Event] = None,
+              exclude_dirs: Optional[Iterable[str]] = None) -> None:
+        """
+        Keep the store in sync with the project until stop_event is set.
+
+        Filesystem events (inotify on Linux) are collected by watchfiles, which
+        waits until no event has arrived for step_ms, or debounce_ms has
+        passed, and delivers the burst as one set. Each set becomes one
+        micro-batch for index_changes. Blocks while waiting, without polling.
+        The pipeline holds the store's write lock while it runs, so batches
+        never interleave with another writer to the same store.
+
+        Args:
+            manager: VectorStoreManager or VectorStoreClient holding the store
+            pipeline: IngestionPipeline to use, or None to create one
+            debounce_ms: Longest time to keep collecting a burst of events
+            step_ms: Quiet time that ends a burst
+            stop_event: Event that stops the watcher when set
+            exclude_dirs: Directories never indexed, by default the vector
+                store, manifest, symbol index and import graph directories,
+                whose writes would otherwise trigger re-indexing
+        """
+        if self.archive is not None:
+            print(f"Not watching {self.project_path}: archives are re-indexed by the next run after they change")
+            return
+        if pipeline is None:
+            from ingest_pipeline import IngestionPipeline
+            pipeline = IngestionPipeline(self, manager, self.store_name)
+        if exclude_dirs is None:
+            exclude_dirs = [self.file_manifest.manifest_path.parent, self.symbol_index.index_path.parent,
+                            self.import_graph.graph_path.parent]
+            if hasattr(manager, 'index_base_path'):
+                exclude_dirs.append(manager.index_base_path)
+        excluded = [Path(d).resolve() for d in exclude_dirs]
+        default_filter = DefaultFilter()
+
+        def watch_filter(change, path: str) -> bool:
+            return default_filter(change, path) and self._is_watched(Path(path), excluded)
+
+        print(f"Watching {self.project_path} for changes")
+        for changes in watch(self.project_path, watch_filter=watch_filter, debounce=debounce_ms,
+                             step=step_ms, stop_event=stop_event):
+            try:
+                self.index_changes(manager, pipeline, [path for _, path in changes])
+            except Exception as e:
+                # Keep watching; the files are picked up again when next changed or at startup
+                self.errors.append({
+                    'error': str(e),
+                    'type': 'watch_error'
+                })
+                logging.error(f"Error indexing changes in {self.project_path}: {e}")
+        print(f"Stopped watching {self.project_path}")
+
+    def start_watching(self, manager, pipeline=None, **kwargs) -> threading.Event:
+        """
+        Run watch() on a background thread.
+
+        Returns:
+            threading.Event: Set it, or call stop_watching(), to stop the watcher
+        """
+        self.stop_watching()
+        self.watch_stop = threading.Event()
+        self.watch_thread = threading.Thread(
+            target=self.watch, args=(manager, pipeline),
+            kwargs={**kwargs, 'stop_event': self.watch_stop},
+            name="codestore-watch", daemon=True)
+        self.watch_thread.start()
+        return self.watch_stop
+
+    def stop_watching(self, timeout: Optional[float] = 5.0) -> None:
+        """Stop a watcher started by start_watching and wait for it to exit."""
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+        if self.watch_thread is not None:
+            self.watch_thread.join(timeout)
+        self.watch_thread = None
+        self.watch_stop = None
+
+    def plan_full_index(self) -> Generator[Tuple[Path, os.stat_result], None, None]:
+        """
+        Start a full (re)index, returning every supported file as it is walked.
+        Archive projects are streamed member by member instead.
+        
+        The pending manifest starts empty and is filled by record_file.
+        """
+        self._start_metrics()
+        self.pending_manifest = {}
+        self.known_hashes = {}
+        self.planned_paths = set()
+        self.pending_meta = {'git_commit': head_commit(self.project_path) if self.git_root else None,
+                             'format': self.STORE_FORMAT}
+        self.failed_paths = set()
+        self.removed_document_ids = []
+        self.classifier.reset()
+        self._forget_blobs()
+        if self.archive is not None:
+            # The archive may have been replaced since the last run read from it
+            self.archive.close()
+            self.pending_meta['archive'] = self.archive.stamp()
+        self._start_checkpoints()
+        return self._archive_files() if self.archive is not None else self._supported_files()
+
+    def plan_git_index(self) -> Iterable[Tuple[Path, os.stat_result]]:
+        """
+        Start a full (re)index from git's file lists instead of a walk.
+
+        Tracked files come from `git ls-files --stage`, so no directory is
+        walked and no .gitignore rule evaluated, and their contents are read
+        from the object database by one `git cat-file --batch` process. Files
+        edited in the working tree and untracked, non-ignored files are read
+        from disk. Files sharing a blob SHA are read once.
+
+        Falls back to plan_full_index when the project is not a git checkout.
+
+        Returns:
+            Iterable[Tuple[Path, os.stat_result]]: Files to read and index
+        """
+        blobs = tracked_blobs(self.project_path) if self.git_root else None
+        dirty = worktree_changes(self.project_path) if blobs is not None else None
+        untracked = untracked_files(self.project_path) if dirty is not None else None
+        if untracked is None:
+            return self.plan_full_index()
+
+        self._start_metrics()
+        self.pending_manifest = {}
+        self.known_hashes = {}
+        self.planned_paths = set()
+        self.pending_meta = {'git_commit': head_commit(self.project_path), 'format': self.STORE_FORMAT}
+        self.failed_paths = set()
+        self.removed_document_ids = []
+        self.classifier.reset()
+        self._start_checkpoints()
+        if self.blob_reader is None:
+            self.blob_reader = GitBlobReader(self.project_path)
+
+        files = []
+        git_blobs = {}
+        started = time.perf_counter()
+        for relative_path in sorted(set(blobs) | set(untracked)):
+            file_path = self.project_path / relative_path
+            if not self.processor.is_supported_file(file_path):
+                continue
+            self.metrics.count('files_scanned')
+            try:
+                stats = file_path.stat()
+            except OSError:
+                # Deleted from the working tree but still tracked
+                continue
+            reason = self.classifier.check_path(file_path, stats)
+            if reason:
+                self.classifier.skip(file_path, reason, stats.st_size)
+                continue
+            if relative_path in blobs and relative_path not in dirty:
+                git_blobs[str(file_path)] = blobs[relative_path]
+            files.append((file_path, stats))
+        self.metrics.add_time('walk', time.perf_counter() - started)
+
+        counts: Dict[str, int] = {}
+        for sha in git_blobs.values():
+            counts[sha] = counts.get(sha, 0) + 1
+        with self.blob_lock:
+            self.git_blobs = git_blobs
+            self.shared_blobs = {sha: count for sha, count in counts.items() if count > 1}
+            self.blob_cache = {}
+        print(f"Git lists {len(files)} files to index, {len(git_blobs)} read from the object database "
+              f"({len(git_blobs) - len(counts)} duplicate blobs)")
+        return files
+
+    def content_owners(self) -> Dict[str, str]:
+        """
+        Content hash -> document id of files already indexed with their own
+        nodes and not re-indexed by the current plan. New files with the same
+        content can be stored as references to them.
+        """
+        owners = {}
+        for relative_path, entry in (self.pending_manifest or {}).items():
+            if (not entry.get('duplicate_of') and relative_path not in self.planned_paths
+                    and self.file_manifest.entries.get(relative_path) == entry):
+                owners.setdefault(entry['hash'], str(self.project_path / relative_path))
+        return owners
+
+    def reference_document(self, file_path: Path, stats: Optional[os.stat_result]) -> Document:
+        """Build a file's Document without reading it, for storing as a reference."""
+        if self.archive is not None:
+            self._release_archive_member(file_path)
+        return self.processor.create_document(file_path, '', self._get_file_metadata(file_path, stats),
+                                              self._document_file_path(file_path))
+
+    def close(self) -> None:
+        """Stop the watcher and the git cat-file process, if running."""
+        self.stop_watching()
+        if self.blob_reader is not None:
+            self.blob_reader.close()
+            self.blob_reader = None
+        if self.archive is not None:
+            self._forget_blobs()
+            self.archive.close()
+
+    def record_file(self, file_path: Path, stats: os.stat_result, content_hash: str,
+                    duplicate_of: Optional[str] = None) -> None:
+        """
+        Record a successfully indexed file in the pending manifest.
+
+        Args:
+            duplicate_of: Document id of the identical file this one is stored
+                as a reference to, if any
+        """
+        if self.pending_manifest is None:
+            self.pending_manifest = {}
+        relative_path = self._relative_path(file_path)
+        if duplicate_of:
+            duplicate_of = self._relative_path(Path(duplicate_of))
+        self.pending_manifest[relative_path] = make_entry(stats, content_hash, duplicate_of)
+        self.failed_paths.discard(relative_path)
+        self.recorded_paths.add(relative_path)
+
+    def record_failed_file(self, file_path: Path) -> bool:
+        """
+        Record a file that was not indexed. A file that could not be read
+        keeps its previous manifest entry, if any, so it is retried next run.
+        A file the classifier skipped loses its entry, since its content is no
+        longer wanted.
+
+        Returns:
+            bool: Whether the file was skipped but the store holds an earlier
+                version, whose document the caller must delete
+        """
+        if self.pending_manifest is None:
+            return False
+        relative_path = self._relative_path(file_path)
+        self.recorded_paths.add(relative_path)
+        previous = self.file_manifest.entries.get(relative_path)
+        if self.classifier.was_skipped(file_path):
+            self.pending_manifest.pop(relative_path, None)
+            return previous is not None
+        # Retried even when git reports no change to it
+        self.failed_paths.add(relative_path)
+        if previous:
+            self.pending_manifest[relative_path] = previous
+        else:
+            self.pending_manifest.pop(relative_path, None)
+        return False
+
+    def commit_manifest(self) -> None:
+        """
+        Save the file manifest built by the last process_project or
+        process_changed_files call. Call this once the returned documents
+        have been stored, so a failed store update is retried next run.
+        """
+        if self.pending_manifest is None:
+            return
+        meta = dict(self.pending_meta if self.pending_meta is not None else self.file_manifest.meta)
+        meta['retry'] = sorted(self.failed_paths)
+        meta.pop('checkpoint', None)
+        self.file_manifest.save(self.pending_manifest, meta)
+        self._commit_source_indexes(self.pending_manifest)
+        self.pending_manifest = None
+        self.pending_meta = None
+
+    def checkpoint_manifest(self) -> None:
+        """
+        Save the current run's progress to the file manifest. Call this right
+        after the store is persisted mid-run.
+
+        Only files the run has finished with are recorded as indexed; files it
+        has yet to reach keep their previous entry or are left out. The commit
+        recorded is the one the run started from (none for full indexes), so
+        if the run is interrupted, find_changed_files resumes it by diffing
+        the project against this manifest, and everything already indexed is
+        skipped.
+        """
+        if self.pending_manifest is None:
+            return
+        entries = {}
+        for relative_path, entry in self.pending_manifest.items():
+            if relative_path in self.planned_paths and relative_path not in self.recorded_paths:
+                entry = self.file_manifest.entries.get(relative_path)
+            if entry is not None:
+                entries[relative_path] = entry
+        meta = dict(self.pending_meta if self.pending_meta is not None else self.file_manifest.meta)
+        meta['git_commit'] = self.resume_commit
+        meta['retry'] = sorted(self.failed_paths)
+        meta['checkpoint'] = {'saved': time.time(), 'files': len(self.recorded_paths)}
+        self.file_manifest.checkpoint(entries, meta)
+        # Symbols and imports of the files recorded so far are saved with them, as a
+        # resumed run treats those files as unchanged and will not read them again
+        self._commit_source_indexes(entries, self.recorded_paths)
+
+    def needs_rebuild(self) -> bool:
+        """
+        Check whether the store must be cleared and the project indexed in
+        full instead of updating it in place. That is the case when there is
+        no file manifest: the store was never indexed, or was indexed before
+        documents were keyed by path, so changed files would be added beside
+        their old documents. It is also the case for stores indexed with an
+        older STORE_FORMAT, as unchanged chunks would keep their old embeddings.
+        """
+        if not self.file_manifest.exists():
+            return True
+        return self.file_manifest.meta.get('format', 1) < self.STORE_FORMAT
+
+    def has_checkpoint(self) -> bool:
+        """Check whether the last run was interrupted after saving a checkpoint."""
+        return 'checkpoint' in self.file_manifest.meta
+
+    def _start_checkpoints(self) -> None:
+        """
+        Begin checkpointing a full index. An empty checkpoint is saved at once,
+        so a run interrupted before its first store commit is also resumed
+        rather than mistaken for an up-to-date store.
+        """
+        self.recorded_paths = set()
+        self.resume_commit = None
+        self.checkpoint_manifest()
+
+    def _commit_source_indexes(self, entries: Dict[str, Dict], paths: Optional[Set[str]] = None) -> None:
+        """
+        Bring the symbol index and import graph in line with the manifest
+        entries just saved: files read in this run get the symbols and imports
+        found in them, references get their original's symbols and point to it
+        in the graph, and files no longer indexed are dropped.
+
+        Args:
+            entries: Manifest entries that were saved
+            paths: Only apply the symbols and imports found in these files,
+                e.g. those a checkpoint records; the rest stay pending
+        """
+        with self.symbols_lock:
+            if paths is None:
+                symbols, self.pending_symbols = self.pending_symbols, {}
+                imports, self.pending_imports = self.pending_imports, {}
+            else:
+                symbols = {path: self.pending_symbols.pop(path) for path in paths if path in self.pending_symbols}
+                imports = {path: self.pending_imports.pop(path) for path in paths if path in self.pending_imports}
+        aliases = {}
+        for relative_path, entry in entries.items():
+            owner = entry.get('duplicate_of')
+            if owner and relative_path not in symbols:
+                symbols[relative_path] = symbols.get(owner, self.symbol_index.files.get(owner, []))
+                aliases[relative_path] = owner
+        keep = set(entries)
+        # Saved only when changed, as a watcher of a project holding them would see every write
+        if self.symbol_index.update(symbols, keep=keep) or not self.symbol_index.exists():
+            self.symbol_index.save()
+        if (self.import_graph.update(imports, aliases, keep=keep, project_root=str(self.project_path))
+                or not self.import_graph.exists()):
+            self.import_graph.save()
+
+    def lookup_symbol(self, name: str) -> List[Dict]:
+        """
+        Where a function, class, method or variable is defined in the project.
+
+        Returns:
+            List[Dict]: {'path', 'line', 'kind', 'qualified'} for each definition
+        """
+        return self.symbol_index.lookup(name)
+
+    def _supported_files(self, start: Optional[Path] = None) -> Generator[Tuple[Path, os.stat_result], None, None]:
+        """
+        Yield each supported, non-ignored file with its stat result.
+
+        Lockfiles, minified bundles and files over their size cap are recorded
+        as skipped here, before anything opens them.
+
+        Args:
+            start: Directory inside the project to walk, or None for the whole project
+        """
+        # Walk time excludes the time the consumer spends between files
+        started = time.perf_counter()
+        for entry in self._iterate_files(start):
+            file_path = Path(entry.path)
+            if self.processor.is_supported_file(file_path):
+                stats = self._stat_entry(entry)
+                if stats is None:
+                    continue
+                self.metrics.count('files_scanned')
+                reason = self.classifier.check_path(file_path, stats)
+                if reason:
+                    self.classifier.skip(file_path, reason, stats.st_size)
+                    continue
+                self.metrics.add_time('walk', time.perf_counter() - started)
+                yield file_path, stats
+                started = time.perf_counter()
+        self.metrics.add_time('walk', time.perf_counter() - started)
+
+    def _should_index(self, file_path: Path, stats: os.stat_result) -> bool:
+        """Apply the walk's checks to a single file, for paths reported by the watcher."""
+        if not self.processor.is_supported_file(file_path):
+            return False
+        self.metrics.count('files_scanned')
+        if self._is_ignored(self._relative_path(file_path)):
+            return False
+        reason = self.classifier.check_path(file_path, stats)
+        if reason:
+            self.classifier.skip(file_path, reason, stats.st_size)
+            return False
+        return True
+
+    def _is_ignored(self, relative_path: str) -> bool:
+        """Check a path and each directory above it against .gitignore, as the walk does."""
+        started = time.perf_counter()
+        parts = relative_path.split('/')
+        ignored = any(self.gitignore.should_ignore_relative('/'.join(parts[:i]), is_dir=True)
+                      for i in range(1, len(parts)))
+        ignored = ignored or self.gitignore.should_ignore_relative(relative_path, is_dir=False)
+        self.metrics.add_time('ignore_check', time.perf_counter() - started)
+        return ignored
+
+    def _is_watched(self, path: Path, excluded: List[Path]) -> bool:
+        """
+        Filter for watcher events. Keeps supported files and anything that may
+        be a directory (existing, or deleted and so of unknown type), outside
+        excluded directories and .gitignore rules.
+        """
+        if any(path == d or d in path.parents for d in excluded):
+            return False
+        try:
+            relative_path = self._relative_path(path)
+        except ValueError:
+            return False
+        if self.processor.is_supported_file(path):
+            return not self._is_ignored(relative_path)
+        return (path.is_dir() or not path.exists()) and not self._is_ignored(relative_path)
+
+    def _relative_path(self, file_path: Path) -> str:
+        """Project-relative, '/'-separated path used as the manifest key."""
+        return file_path.relative_to(self.project_path).as_posix()
+
+    def _document_file_path(self, file_path: Path) -> str:
+        """Path recorded as a document's file_path: archive members are recorded relative to the archive root."""
+        return self._relative_path(file_path) if self.archive is not None else str(file_path)
+
+    def _load_document(self, file_path: Path, stats: Optional[os.stat_result]
+                       ) -> Tuple[Optional[Document], Optional[str]]:
+        """
+        Read, hash, decode and wrap a single file. Runs on the read pool.
+        Files on disk are classified from their first bytes, so skipped files
+        are not read in full.
+        """
+        metrics = self.metrics
+
+        def sniff(raw_data: bytes) -> bool:
+            reason = self.classifier.check_content(file_path, raw_data)
+            if reason:
+                self.classifier.skip(file_path, reason, stats.st_size if stats is not None else len(raw_data))
+            return reason is None
+
+        started = time.perf_counter()
+        sniffed = False
+        if self.archive is not None:
+            raw_data = self._read_archive_member(file_path)
+        else:
+            sha = self.git_blobs.get(str(file_path))
+            raw_data = self._read_blob(sha) if sha is not None and self.blob_reader is not None else None
+            if raw_data is None:
+                raw_data = self.processor.read_bytes(file_path, sniff)
+                sniffed = True
+        metrics.add_time('read', time.perf_counter() - started)
+        if raw_data is None:
+            if not self.classifier.was_skipped(file_path):
+                metrics.count('files_failed')
+            return None, None
+        if not sniffed and not sniff(raw_data):
+            return None, None
+        metrics.count('files_read')
+        metrics.count('bytes_read', len(raw_data))
+
+        started = time.perf_counter()
+        content = self.processor.decode(file_path, raw_data)
+        metrics.add_time('decode', time.perf_counter() - started)
+        if content is None:
+            metrics.count('files_failed')
+            return None, None
+
+        started = time.perf_counter()
+        content_hash = hash_bytes(raw_data)
+        metrics.add_time('hash', time.perf_counter() - started)
+        started = time.perf_counter()
+        metadata = self._get_file_metadata(file_path, stats)
+        document = self.processor.create_document(file_path, content, metadata, self._document_file_path(file_path))
+        metrics.add_time('build', time.perf_counter() - started)
+        self._analyze_source(file_path, content)
+        metrics.count('documents')
+        return document, content_hash
+
+    def _analyze_source(self, file_path: Path, content: str) -> None:
+        """Record a file's definitions and imports for the symbol index and import graph. Runs on the read pool."""
+        started = time.perf_counter()
+        relative_path = self._relative_path(file_path)
+        symbols = extract_symbols(content, file_path.suffix.lower())
+        imports = extract_imports(content, relative_path)
+        with self.symbols_lock:
+            self.pending_symbols[relative_path] = symbols
+            self.pending_imports[relative_path] = imports
+        self.metrics.add_time('analyze', time.perf_counter() - started)
+
+    def _forget_blobs(self) -> None:
+        """Read files from disk again, for plans not made by plan_git_index."""
+        with self.blob_lock:
+            self.git_blobs = {}
+            self.shared_blobs = {}
+            self.blob_cache = {}
+            self.archive_cache = {}
+            self.archive_wanted = set()
+            if self.archive_stream is not None:
+                self.archive_stream.close()
+                self.archive_stream = None
+
+    def _read_blob(self, sha: str) -> Optional[bytes]:
+        """Read a blob from git, fetching blobs shared by several files only once."""
+        if sha not in self.shared_blobs:
+            return self.blob_reader.read(sha)
+        with self.blob_lock:
+            raw_data = self.blob_cache.get(sha)
+            if raw_data is None:
+                raw_data = self.blob_reader.read(sha)
+                self.blob_cache[sha] = raw_data
+            self.shared_blobs[sha] -= 1
+            if self.shared_blobs[sha] == 0:
+                # Last copy read
+                self.blob_cache.pop(sha, None)
+        return raw_data
+
+    def _read_documents(self, files: Iterable[Tuple[Path, Optional[os.stat_result]]]
+                        ) -> Generator[Tuple[Path, Optional[os.stat_result], Optional[Document], Optional[str]], None, None]:
+        """
+        Read files concurrently on a thread pool, yielding documents in input order.
+
+        New reads are only submitted while the bytes being read stay under
+        max_inflight_bytes and at most four reads per worker are queued, so a
+        run of large files cannot exhaust memory. A single file larger than
+        the cap is still read, on its own.
+
+        Yields:
+            Tuple: (path, stats, document, content hash), with None for the
+            document and hash if the file could not be read
+        """
+        start = time.time()
+        files_read = 0
+        bytes_read = 0
+        inflight_bytes = 0
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.read_workers, thread_name_prefix="codestore-read") as pool:
+            for file_path, stats in files:
+                size = stats.st_size if stats else 0
+                while pending and (inflight_bytes + size > self.max_inflight_bytes
+                                   or len(pending) >= self.read_workers * 4):
+                    done_path, done_stats, future = pending.popleft()
+                    done_size = done_stats.st_size if done_stats else 0
+                    inflight_bytes -= done_size
+                    files_read += 1
+                    bytes_read += done_size
+                    yield (done_path, done_stats) + future.result()
+
+                pending.append((file_path, stats, pool.submit(self._load_document, file_path, stats)))
+                inflight_bytes += size
+
+            while pending:
+                done_path, done_stats, future = pending.popleft()
+                files_read += 1
+                bytes_read += done_stats.st_size if done_stats else 0
+                yield (done_path, done_stats) + future.result()
+
+        elapsed = max(time.time() - start, 1e-6)
+        print(f"Read {files_read} files ({bytes_read / 1e6:.1f} MB) in {elapsed:.2f}s: "
+              f"{files_read / elapsed:.0f} files/s, {bytes_read / 1e6 / elapsed:.1f} MB/s "
+              f"with {self.read_workers} workers")
+
+    def _iterate_files(self, start: Optional[Path] = None) -> Generator[os.DirEntry, None, None]:
+        """
+        Walk project files in a single os.scandir pass, respecting .gitignore rules.
+
+        Ignored directories are pruned before descending. Entries are streamed
+        as they are found, and callers reuse each DirEntry's cached type and
+        stat information instead of stat-ing paths again.
+
+        Args:
+            start: Directory inside the project to walk, or None for the whole project
+        """
+        def _scan_directory(directory: str, relative_dir: str):
             """Recursively scan directory, checking gitignore at each level."""
             try:
-                for path in directory.iterdir():
-                    # Check if this path should be ignored
-                    if self.gitignore.should_ignore(path, self.project_path):
-                        continue
-                        
-                    if path.is_file():
-                        yield path
-                    elif path.is_dir():
-                        # Recursively traverse non-ignored directories
-                        yield from _scan_directory(path)
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        relative_path = relative_dir + entry.name
+                        try:
+                            if entry.is_dir():
+                                started = time.perf_counter()
+                                ignored = self.gitignore.should_ignore_relative(relative_path, is_dir=True)
+                                self.metrics.add_time('ignore_check', time.perf_counter() - started)
+                                if not ignored:
+                                    # Recursively traverse non-ignored directories
+                                    yield from _scan_directory(entry.path, relative_path + '/')
+                            elif entry.is_file():
+                                started = time.perf_counter()
+                                ignored = self.gitignore.should_ignore_relative(relative_path, is_dir=False)
+                                self.metrics.add_time('ignore_check', time.perf_counter() - started)
+                                if not ignored:
+                                    yield entry
+                        except OSError as e:
+                            logging.warning(f"Error accessing {entry.path}: {e}")
                         
             except PermissionError:
                 # Silently skip permission errors
@@ -237,38 +1197,254 @@ class CodeStore:
             except Exception as e:
                 logging.warning(f"Error accessing directory {directory}: {e}")
 
+        start = Path(start) if start else self.project_path
+        relative_dir = '' if start == self.project_path else self._relative_path(start) + '/'
         try:
-            yield from _scan_directory(self.project_path)
+            yield from _scan_directory(str(start), relative_dir)
         except Exception as e:
             logging.error(f"Error iterating files: {e}")
             raise
 
-    def _get_file_metadata(self, file_path: Path) -> Dict:
-        """Get metadata for a file."""
+    def _stat_entry(self, entry: os.DirEntry) -> Optional[os.stat_result]:
+        """Get a walked entry's stat result, cached on the entry after the first call."""
         try:
-            stats = file_path.stat()
+            return entry.stat()
+        except OSError:
+            return None
+
+    def _scan_archive(self) -> Generator[Tuple[Path, os.stat_result, Callable[[], bytes]], None, None]:
+        """
+        Archive counterpart of _supported_files: yield each supported,
+        non-ignored member as (path below the archive, stat result, function
+        reading its contents). The function is only valid until the next member.
+        """
+        started = time.perf_counter()
+        # Read here rather than when the store is opened, as reading one member
+        # of a compressed tar may take a pass over the whole archive
+        gitignore = self.archive.read('.gitignore')
+        self.gitignore = GitignoreParser(self.project_path / '.gitignore',
+                                         text=(gitignore or b'').decode('utf-8', errors='replace'))
+        for member, read in self.archive.members():
+            file_path = self.project_path / member.name
+            if not self.processor.is_supported_file(file_path) or self._is_ignored(member.name):
+                continue
+            self.metrics.count('files_scanned')
+            stats = member.stat_result()
+            reason = self.classifier.check_path(file_path, stats)
+            if reason:
+                self.classifier.skip(file_path, reason, stats.st_size)
+                continue
+            self.metrics.add_time('walk', time.perf_counter() - started)
+            yield file_path, stats, read
+            started = time.perf_counter()
+        self.metrics.add_time('walk', time.perf_counter() - started)
+
+    def _archive_files(self) -> Generator[Tuple[Path, os.stat_result], None, None]:
+        """
+        Stream an archive's members for a full index. Members of compressed
+        tars are read as they stream past and held for _load_document, so the
+        archive is decompressed once; the pipeline's queues bound how many are
+        held at a time.
+        """
+        for file_path, stats, read in self._scan_archive():
+            if not self.archive.random_access:
+                self._hold_archive_member(file_path, self._stream_archive_member(file_path, read))
+            yield file_path, stats
+
+    def _find_changed_archive_members(self) -> List[Tuple[Path, os.stat_result]]:
+        """
+        find_changed_files for archive projects. Nothing is read if the archive
+        file's size and mtime match the manifest. Otherwise members whose size
+        and mtime match their entry are skipped, the rest are hashed as they
+        stream past, and those whose content changed are returned. Members not
+        in the archive any more are removed.
+
+        Only hashes are kept from this pass. Changed members of compressed
+        tars are streamed again, in archive order, as they are read (see
+        _read_archive_member).
+        """
+        self.classifier.reset()
+        self._forget_blobs()
+        self.archive.close()
+        stamp = self.archive.stamp()
+        self.pending_meta = {'git_commit': None, 'archive': stamp, 'format': self.file_manifest.meta.get('format', 1)}
+        self.failed_paths = set()
+        entries = dict(self.file_manifest.entries)
+        if (self.file_manifest.exists() and self.file_manifest.meta.get('archive') == stamp
+                and not self.has_checkpoint()):
+            print(f"{self.project_path.name} has not changed since it was indexed")
+            self.pending_manifest = entries
+            return self._finish_plan([], [], {})
+
+        print(f"Looking for changed files in {self.project_path.name}")
+        changed_files = []
+        known_hashes = {}
+        # Unchanged references, re-indexed below if the file they point to changes
+        references = {}
+        order = {}
+        for file_path, stats, read in self._scan_archive():
+            relative_path = self._relative_path(file_path)
+            order[relative_path] = len(order)
+            entry = entries.get(relative_path)
+            if entry and entry['size'] == stats.st_size and entry['mtime'] == stats.st_mtime:
+                if entry.get('duplicate_of'):
+                    references[relative_path] = (file_path, stats)
+                continue
+            raw_data = self._stream_archive_member(file_path, read)
+            if raw_data is None:
+                continue
+            content_hash = hash_bytes(raw_data)
+            if entry and entry['hash'] == content_hash:
+                entries[relative_path] = make_entry(stats, content_hash, entry.get('duplicate_of'))
+                if entry.get('duplicate_of'):
+                    references[relative_path] = (file_path, stats)
+                continue
+            changed_files.append((file_path, stats))
+            known_hashes[str(file_path)] = content_hash
+
+        removed_paths = [relative_path for relative_path in entries if relative_path not in order]
+        for relative_path in removed_paths:
+            entries.pop(relative_path)
+        gone = set(removed_paths) | {self._relative_path(path) for path, _ in changed_files}
+        for relative_path, (file_path, stats) in references.items():
+            if entries[relative_path]['duplicate_of'] in gone:
+                changed_files.append((file_path, stats))
+                known_hashes[str(file_path)] = entries[relative_path]['hash']
+        print(f"{len(changed_files)} changed, {len(removed_paths)} removed, "
+              f"{len(order) - len(changed_files)} unchanged")
+        if not self.archive.random_access:
+            # Kept in archive order, so re-streaming them only moves forward
+            changed_files.sort(key=lambda item: order[self._relative_path(item[0])])
+            with self.blob_lock:
+                self.archive_wanted = {self._relative_path(path) for path, _ in changed_files}
+        self.pending_manifest = entries
+        return self._finish_plan(changed_files, removed_paths, known_hashes)
+
+    def _stream_archive_member(self, file_path: Path, read: Callable[[], bytes]) -> Optional[bytes]:
+        """Read the member being streamed, recording an error if it cannot be read."""
+        started = time.perf_counter()
+        try:
+            return read()
+        except Exception as e:
+            self.processor.errors.append({
+                'path': str(file_path),
+                'error': str(e),
+                'type': 'read_error'
+            })
+            logging.error(f"Error reading {file_path}: {e}")
+            return None
+        finally:
+            self.metrics.add_time('read', time.perf_counter() - started)
+
+    def _hold_archive_member(self, file_path: Path, raw_data: Optional[bytes]) -> None:
+        """Keep a streamed member's contents until _load_document reads it."""
+        if raw_data is not None:
+            with self.blob_lock:
+                self.archive_cache[str(file_path)] = raw_data
+
+    def _release_archive_member(self, file_path: Path) -> None:
+        """Drop a member that will not be read after all, held or still to be streamed."""
+        with self.blob_lock:
+            self.archive_cache.pop(str(file_path), None)
+            self.archive_wanted.discard(self._relative_path(file_path))
+
+    def _read_archive_member(self, file_path: Path) -> Optional[bytes]:
+        """
+        Contents of an archive member: held from the stream, read on demand
+        from zips and plain tars, or streamed again from a compressed tar.
+        """
+        relative_path = self._relative_path(file_path)
+        with self.blob_lock:
+            raw_data = self.archive_cache.pop(str(file_path), None)
+            if raw_data is None and relative_path in self.archive_wanted:
+                raw_data, found = self._restream_archive_member(relative_path)
+                if not found:
+                    self.processor.errors.append({
+                        'path': str(file_path),
+                        'error': f"Not found in {self.project_path}",
+                        'type': 'read_error'
+                    })
+        if raw_data is None and self.archive.random_access:
+            raw_data = self.archive.read(relative_path)
+            if raw_data is None:
+                self.processor.errors.append({
+                    'path': str(file_path),
+                    'error': f"Could not read from {self.project_path}",
+                    'type': 'read_error'
+                })
+        # Members of compressed tars that failed while streaming were recorded then
+        return raw_data
+
+    def _restream_archive_member(self, relative_path: str) -> Tuple[Optional[bytes], bool]:
+        """
+        Advance the stream over a compressed tar to a wanted member. Wanted
+        members passed on the way, because reads arrived out of order, are
+        held. Caller holds blob_lock.
+
+        Returns:
+            Tuple[Optional[bytes], bool]: The contents, and whether the member was found
+        """
+        self.archive_wanted.discard(relative_path)
+        if self.archive_stream is None:
+            self.archive_stream = self.archive.members()
+        for member, read in self.archive_stream:
+            if member.name == relative_path:
+                return self._stream_archive_member(self.project_path / member.name, read), True
+            if member.name in self.archive_wanted:
+                self.archive_wanted.discard(member.name)
+                raw_data = self._stream_archive_member(self.project_path / member.name, read)
+                if raw_data is not None:
+                    self.archive_cache[str(self.project_path / member.name)] = raw_data
+        self.archive_stream = None
+        return None, False
+
+    def _get_file_metadata(self, file_path: Path, stats: Optional[os.stat_result] = None) -> Dict:
+        """
+        Get metadata for a file, reusing a stat result from the walk when given.
+        Times are whole seconds, since every chunk stores a copy.
+        """
+        try:
+            stats = stats or file_path.stat()
             return {
-                'creation_time': stats.st_ctime,
-                'modification_time': stats.st_mtime,
+                'creation_time': int(stats.st_ctime),
+                'modification_time': int(stats.st_mtime),
                 'size': stats.st_size
             }
         except Exception:
             # Silently return empty dict on errors
             return {}
 
-    def _is_file_modified(self, file_path: Path, last_update_time: float) -> bool:
-        """Check if a file has been modified since the last update."""
-        try:
-            return file_path.stat().st_mtime > last_update_time
-        except Exception:
-            # Silently return False on errors
-            return False
+    def _start_metrics(self) -> None:
+        """Begin metrics for a new run."""
+        self.metrics = IngestMetrics()
+        self.processor.metrics = self.metrics
+
+    def finish_metrics(self) -> Dict:
+        """Stop the current run's clock and return its metrics."""
+        self.metrics.counters['files_skipped'] = self.classifier.report()['total']
+        return self.metrics.finish().to_dict()
+
+    def _report_metrics(self, metrics_path: Optional[str]) -> None:
+        """Finish the run's metrics, then print and optionally save them."""
+        self.finish_metrics()
+        print(f"Ingestion metrics: {self.metrics.summary()}")
+        if metrics_path:
+            self.metrics.write_json(metrics_path)
+
+    def report_skipped(self) -> Dict:
+        """Print how many files were skipped, and why, during the last run."""
+        report = self.classifier.report()
+        if report['total']:
+            reasons = ', '.join(f"{count} {reason}" for reason, count in sorted(report['reasons'].items()))
+            print(f"Skipped {report['total']} files: {reasons}")
+        return report
 
     def get_error_report(self) -> Dict:
         """Get a report of all errors encountered during processing."""
         return {
             'processor_errors': self.processor.errors,
             'store_errors': self.errors,
+            'skipped_files': self.classifier.report(),
             'total_documents_processed': self.docs_processed
         }
 
@@ -0,0 +1,288 @@
+"""Syntax-aware chunking for source files.
+
+Python files are split on top-level function and class boundaries using
+`ast`, and TypeScript/JavaScript files on top-level declarations using a
+line scanner. Adjacent small declarations are packed together up to a size
+limit, and every chunk carries the symbols it defines and its line range.
+Other files, and sources that fail to parse, fall back to the generic
+sentence splitter.
+
+Chunks can be given ids derived from their text (assign_chunk_ids), so a
+re-chunked file keeps the ids of chunks whose text did not change and only
+new chunks need embedding. Line ranges are left out of the embedded text for
+the same reason: shifting a chunk down a file does not change its embedding.
+"""
+
+import re
+import ast
+import hashlib
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple, Any
+
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.node_parser import NodeParser, SentenceSplitter
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode, NodeRelationship
+from llama_index.core.settings import Settings
+
+PYTHON_EXTENSIONS = {'.py'}
+SCRIPT_EXTENSIONS = {'.ts', '.tsx', '.js', '.jsx'}
+
+# Top-level declarations in TS/JS, optionally exported
+_DECLARATION = re.compile(
+    r'^(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?'
+    r'(function\*?|class|interface|type|enum|const|let|var|namespace)\s+([A-Za-z_$][\w$]*)'
+)
+# Lines that belong to the declaration that follows them
+_LEADING = re.compile(r'^\s*(//|/\*|\*|@)')
+# Chunk metadata that changes when lines are added above a chunk
+POSITION_KEYS = ['start_line', 'end_line']
+
+
+def _span(start: int, end: int, symbol: Optional[str], kind: str) -> Dict:
+    return {'start_line': start, 'end_line': end, 'symbol': symbol, 'kind': kind}
+
+
+def _cover(spans: List[Dict], line_count: int) -> List[Dict]:
+    """
+    Stretch spans so every line belongs to exactly one: gaps (comments, blank
+    lines) join the span after them, and trailing lines the last span.
+    """
+    previous_end = 0
+    for span in spans:
+        span['start_line'] = previous_end + 1
+        previous_end = span['end_line']
+    if spans:
+        spans[-1]['end_line'] = line_count
+    return spans
+
+
+def python_spans(text: str, max_chars: int = 4000) -> Optional[List[Dict]]:
+    """
+    Split Python source into top-level spans, or None if it does not parse.
+
+    Consecutive module-level statements are grouped into one span. Classes
+    longer than max_chars are split into a header span and one span per
+    method, named 'Class.method'.
+    """
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+
+    lines = text.splitlines(keepends=True)
+    spans: List[Dict] = []
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        end = node.end_lineno
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            spans.append(_span(start, end, node.name, 'function'))
+        elif isinstance(node, ast.ClassDef):
+            size = sum(len(line) for line in lines[start - 1:end])
+            methods = [child for child in node.body if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            if size > max_chars and methods:
+                first = min([methods[0].lineno] + [d.lineno for d in methods[0].decorator_list])
+                spans.append(_span(start, first - 1, node.name, 'class'))
+                for method in methods:
+                    spans.append(_span(method.lineno, method.end_lineno, f"{node.name}.{method.name}", 'method'))
+                spans[-1]['end_line'] = end
+            else:
+                spans.append(_span(start, end, node.name, 'class'))
+        elif spans and spans[-1]['kind'] == 'module':
+            spans[-1]['end_line'] = end
+        else:
+            spans.append(_span(start, end, None, 'module'))
+    return _cover(spans, len(lines))
+
+
+def script_spans(text: str) -> Optional[List[Dict]]:
+    """
+    Split TypeScript/JavaScript source into spans at top-level declarations.
+
+    Only unindented declarations start a span, so nested functions stay with
+    their parent. Comments and decorators directly above a declaration are
+    kept with it. Returns None if no declaration is found.
+    """
+    lines = text.splitlines()
+    starts = []
+    for number, line in enumerate(lines, start=1):
+        match = _DECLARATION.match(line)
+        if match:
+            kind = match.group(1).rstrip('*')
+            starts.append((number, match.group(2), kind))
+    if not starts:
+        return None
+
+    spans: List[Dict] = []
+    first_line = starts[0][0]
+    if first_line > 1:
+        spans.append(_span(1, first_line - 1, None, 'module'))
+    for i, (number, symbol, kind) in enumerate(starts):
+        end = starts[i + 1][0] - 1 if i + 1 < len(starts) else len(lines)
+        spans.append(_span(number, end, symbol, kind))
+
+    # Hand leading comments and decorators to the declaration below them
+    for previous, span in zip(spans, spans[1:]):
+        start = span['start_line']
+        while start - 1 > previous['start_line'] and (
+                _LEADING.match(lines[start - 2]) or not lines[start - 2].strip()):
+            start -= 1
+        previous['end_line'] = start - 1
+        span['start_line'] = start
+    return [span for span in spans if span['end_line'] >= span['start_line']]
+
+
+def pack_spans(spans: List[Dict], lines: List[str], max_chars: int) -> List[Dict]:
+    """
+    Merge adjacent spans greedily while the result stays within max_chars,
+    so small declarations share a chunk without any chunk straddling one.
+    """
+    packed: List[Dict] = []
+    size = 0
+    for span in spans:
+        span_size = sum(len(line) for line in lines[span['start_line'] - 1:span['end_line']])
+        if packed and size + span_size <= max_chars:
+            current = packed[-1]
+            current['end_line'] = span['end_line']
+            current['symbols'] += [span['symbol']] if span['symbol'] else []
+            if current['kind'] != span['kind']:
+                current['kind'] = 'mixed'
+            size += span_size
+        else:
+            packed.append({'start_line': span['start_line'], 'end_line': span['end_line'],
+                           'symbols': [span['symbol']] if span['symbol'] else [], 'kind': span['kind']})
+            size = span_size
+    return packed
+
+
+def split_line_ranges(span_text: str, splits: List[str], start_line: int) -> List[Tuple[int, int]]:
+    """
+    Line range of each piece a span was split into. Pieces are found in
+    order, each at or after the previous one's start since they may overlap;
+    a piece that cannot be found is given the whole span's range.
+    """
+    span_range = (start_line, start_line + span_text.count('\n', 0, len(span_text.rstrip('\n'))))
+    ranges = []
+    position = 0
+    for split in splits:
+        found = span_text.find(split, position) if split else -1
+        if found < 0:
+            ranges.append(span_range)
+            continue
+        end = found + max(len(split) - 1, 0)
+        ranges.append((start_line + span_text.count('\n', 0, found), start_line + span_text.count('\n', 0, end)))
+        position = found + 1
+    return ranges
+
+
+def source_spans(text: str, file_type: str, max_chars: int = 4000) -> Optional[List[Dict]]:
+    """Split source text by syntax for supported file types, or return None."""
+    if file_type in PYTHON_EXTENSIONS:
+        return python_spans(text, max_chars)
+    if file_type in SCRIPT_EXTENSIONS:
+        return script_spans(text)
+    return None
+
+
+class CodeChunkParser(NodeParser):
+    """Node parser that chunks source files on syntax boundaries."""
+
+    max_chars: int = Field(default=4000, description="Spans longer than this are split further.")
+    fallback: NodeParser = Field(default_factory=SentenceSplitter,
+                                 description="Parser for non-source files and oversized spans.")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CodeChunkParser"
+
+    def _parse_nodes(self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any) -> List[BaseNode]:
+        all_nodes: List[BaseNode] = []
+        for node in nodes:
+            text = node.get_content()
+            file_type = node.metadata.get('file_type', '')
+            spans = source_spans(text, file_type, self.max_chars)
+            if not spans:
+                all_nodes.extend(self.fallback._parse_nodes([node], show_progress=show_progress, **kwargs))
+                continue
+
+            lines = text.splitlines(keepends=True)
+            for span in pack_spans(spans, lines, self.max_chars):
+                span_text = ''.join(lines[span['start_line'] - 1:span['end_line']])
+                if not span_text.strip():
+                    continue
+                splits = [span_text]
+                ranges = [(span['start_line'], span['end_line'])]
+                if len(span_text) > self.max_chars and hasattr(self.fallback, 'split_text'):
+                    splits = self.fallback.split_text(span_text)
+                    ranges = split_line_ranges(span_text, splits, span['start_line'])
+                chunks = build_nodes_from_splits(splits, node, id_func=self.id_func)
+                for chunk, (start_line, end_line) in zip(chunks, ranges):
+                    chunk.metadata.update({
+                        'symbols': ', '.join(span['symbols']),
+                        'symbol_kind': span['kind'],
+                        'start_line': start_line,
+                        'end_line': end_line,
+                    })
+                    chunk.excluded_embed_metadata_keys = chunk.excluded_embed_metadata_keys + POSITION_KEYS
+                    all_nodes.append(chunk)
+        return all_nodes
+
+
+def chunk_hash(node: BaseNode) -> str:
+    """Hash of a chunk's text, without metadata."""
+    return hashlib.sha256(node.get_content().encode('utf-8', errors='surrogatepass')).hexdigest()
+
+
+def assign_chunk_ids(doc_id: str, nodes: List[BaseNode]) -> List[BaseNode]:
+    """
+    Give a document's chunks ids built from the document id and each chunk's
+    text hash, numbering repeated chunks, and update their previous/next
+    relationships to match.
+
+    Returns:
+        List[BaseNode]: The same nodes, renamed in place
+    """
+    renamed = {}
+    seen: Dict[str, int] = {}
+    for node in nodes:
+        digest = chunk_hash(node)[:32]
+        seen[digest] = seen.get(digest, 0) + 1
+        suffix = f"-{seen[digest] - 1}" if seen[digest] > 1 else ""
+        renamed[node.node_id] = f"{doc_id}#{digest}{suffix}"
+        node.id_ = renamed[node.node_id]
+    for node in nodes:
+        for relationship in (NodeRelationship.PREVIOUS, NodeRelationship.NEXT):
+            related = node.relationships.get(relationship)
+            if related is not None and related.node_id in renamed:
+                related.node_id = renamed[related.node_id]
+    return nodes
+
+
+def diff_chunks(docstore, doc_id: str, nodes: List[BaseNode]) -> Tuple[List[BaseNode], Optional[Tuple[List[BaseNode], List[str]]]]:
+    """
+    Compare a document's new chunks, named by assign_chunk_ids, with the ones
+    a docstore holds for it.
+
+    Returns:
+        Tuple: The chunks not yet stored, and either None when the document
+            has no stored chunks (it is inserted whole) or (chunks kept, ids
+            of stored chunks that are gone)
+    """
+    info = docstore.get_ref_doc_info(doc_id)
+    if info is None:
+        return nodes, None
+    stored = set(info.node_ids)
+    current = {node.node_id for node in nodes}
+    new = [node for node in nodes if node.node_id not in stored]
+    kept = [node for node in nodes if node.node_id in stored]
+    removed = [node_id for node_id in info.node_ids if node_id not in current]
+    return new, (kept, removed)
+
+
+def init_node_parser() -> CodeChunkParser:
+    """Make syntax-aware chunking the default for documents inserted into indexes."""
+    parser = CodeChunkParser()
+    Settings.node_parser = parser
+    Settings.transformations = [parser]
+    logging.info("Syntax-aware code chunking enabled")
+    return parser
@@ -0,0 +1,191 @@
+"""Persistent embedding cache shared by every store and process.
+
+Embeddings are stored in SQLite keyed by (model fingerprint, SHA-256 of the
+exact text embedded), so rebuilding a store, recreating a corrupted one or
+indexing the same file into a second store reuses earlier work instead of
+running the model again. The cache is bounded: once it holds more than
+max_entries vectors, the least recently used are evicted.
+
+CachedEmbedding wraps any llama_index embedding model and consults the cache
+before calling it, so every path that embeds through Settings.embed_model
+(index.insert, the ingestion pipeline) benefits without changes.
+"""
+
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+DEFAULT_CACHE_PATH = Path("vector_stores") / "embedding_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 500_000
+# Evict down to this fraction of max_entries, so eviction runs rarely
+EVICT_TO = 0.9
+
+_caches: Dict[str, "EmbeddingCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def text_key(text: str) -> bytes:
+    """Cache key for a text: its SHA-256 digest."""
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).digest()
+
+
+def model_fingerprint(model: BaseEmbedding) -> str:
+    """
+    Identify an embedding model configuration. Anything that changes the
+    vectors a model produces for the same text belongs in here.
+    """
+    parts = [model.class_name(), str(getattr(model, "model_name", ""))]
+    for name in ("max_length", "normalize", "text_instruction", "dimensions"):
+        if getattr(model, name, None) is not None:
+            parts.append(f"{name}={getattr(model, name)}")
+    return "|".join(parts)
+
+
+class EmbeddingCache:
+    """SQLite table of embeddings with least-recently-used eviction."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path: SQLite database file, created if missing
+            max_entries: Vectors kept before the least recently used are evicted
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, key BLOB NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, key))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.connection.commit()
+        self.count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, keys: Sequence[bytes]) -> Dict[bytes, List[float]]:
+        """Look up keys, returning the vectors found and marking them recently used."""
+        found: Dict[bytes, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self.lock:
+            # Stay well under SQLite's limit on query parameters
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    [model, *batch]).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self.connection.executemany("UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                                            [(now, model, key) for key in found])
+                self.connection.commit()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[bytes, List[float]]) -> None:
+        """Store vectors, evicting the least recently used if the cache is full."""
+        if not items:
+            return
+        now = time.time()
+        rows = [(model, key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+        with self.lock:
+            cursor = self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector, last_used) VALUES (?, ?, ?, ?)", rows)
+            self.count += max(cursor.rowcount, 0)
+            if self.count > self.max_entries:
+                self._evict()
+            self.connection.commit()
+
+    def _evict(self) -> None:
+        """Drop the least recently used rows. Caller holds the lock."""
+        self.count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self.count - int(self.max_entries * EVICT_TO)
+        if excess <= 0:
+            return
+        self.connection.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used, rowid LIMIT ?)", (excess,))
+        self.count -= excess
+        logging.info(f"Evicted {excess} embeddings from {self.path}")
+
+    def stats(self) -> Dict:
+        """Entries, hits and misses since the cache was opened."""
+        return {"entries": self.count, "hits": self.hits, "misses": self.misses, "path": str(self.path)}
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+def get_embedding_cache(path: Union[str, Path] = DEFAULT_CACHE_PATH,
+                        max_entries: int = DEFAULT_MAX_ENTRIES) -> EmbeddingCache:
+    """Open a cache, sharing one connection per file within the process."""
+    key = str(Path(path).resolve())
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(path, max_entries)
+        return _caches[key]
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that reads and fills an EmbeddingCache for document text."""
+
+    _model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+    _fingerprint: str = PrivateAttr()
+
+    def __init__(self, model: BaseEmbedding, cache: Optional[EmbeddingCache] = None, **kwargs: Any):
+        super().__init__(model_name=getattr(model, "model_name", "unknown"),
+                         embed_batch_size=model.embed_batch_size, **kwargs)
+        self._model = model
+        self._cache = cache or get_embedding_cache()
+        self._fingerprint = model_fingerprint(model)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        # Queries are rarely repeated, so they go straight to the model
+        return self._model.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return await self._model.aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys = [text_key(text) for text in texts]
+        found = self._cache.get_many(self._fingerprint, keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = self._model.get_text_embedding_batch(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._cache.put_many(self._fingerprint, computed)
+            found.update(computed)
+        return [found[key] for key in keys]
@@ -2,15 +2,23 @@
 
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.core.settings import Settings
+from embedding_cache import CachedEmbedding
 import logging
 
 logger = logging.getLogger(__name__)
 
-def init_embedding_model():
-    """Initialize the HuggingFace embedding model."""
+def init_embedding_model(cache: bool = True):
+    """
+    Initialize the HuggingFace embedding model.
+
+    Args:
+        cache: Serve document embeddings from the persistent embedding cache
+    """
     logger.info("Initializing embedding model...")
     try:
         embed_model = HuggingFaceEmbedding(model_name="all-MiniLM-L6-v2")
+        if cache:
+            embed_model = CachedEmbedding(embed_model)
         Settings.embed_model = embed_model
         logger.info("Embedding model initialized successfully")
         return embed_model
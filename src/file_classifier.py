@@ -0,0 +1,136 @@
+"""Cheap checks that decide whether a file is worth reading and embedding.
+
+Path checks run on the walk's stat result before a file is opened: known
+lockfile and minified names, and per-extension size caps. Content checks run
+on the first few KB of the bytes read: NUL bytes mark a binary file, and very
+long lines mark minified or generated output. Each skip is recorded with its
+reason so it can be reported at the end of a run.
+"""
+
+import os
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import chardet
+
+# Bytes inspected for NUL bytes and line lengths
+SNIFF_BYTES = 8 * 1024
+# Bytes handed to chardet when a file is not valid UTF-8
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+DEFAULT_MAX_BYTES = 1024 * 1024
+MAX_BYTES_BY_EXTENSION = {
+    '.json': 256 * 1024,
+    '.yaml': 256 * 1024,
+    '.yml': 256 * 1024,
+    '.txt': 512 * 1024,
+    '.md': 512 * 1024,
+    '.sql': 512 * 1024,
+    '.html': 512 * 1024,
+    '.css': 512 * 1024,
+}
+
+LOCKFILE_NAMES = {
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml',
+    'poetry.lock', 'Pipfile.lock', 'composer.lock', 'Cargo.lock', 'bun.lockb',
+}
+GENERATED_SUFFIXES = ('.min.js', '.min.css', '.bundle.js', '.chunk.js', '.map')
+
+# A sniffed line longer than this, in a file whose lines average more than
+# MINIFIED_AVERAGE_LINE, is taken to be minified or generated
+MINIFIED_LINE_LENGTH = 1000
+MINIFIED_AVERAGE_LINE = 200
+
+
+class FileClassifier:
+    """Decides which files to skip before and after reading, and records why."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_bytes_by_extension: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            max_bytes: Size cap for extensions without their own limit
+            max_bytes_by_extension: Per-extension size caps, overriding the defaults
+        """
+        self.max_bytes = max_bytes
+        self.max_bytes_by_extension = dict(MAX_BYTES_BY_EXTENSION)
+        self.max_bytes_by_extension.update(max_bytes_by_extension or {})
+        self.skipped: List[Dict] = []
+        self.skipped_paths = set()
+        self.lock = threading.Lock()
+
+    def size_limit(self, path: Path) -> int:
+        """Largest file size indexed for this file's extension."""
+        return self.max_bytes_by_extension.get(path.suffix.lower(), self.max_bytes)
+
+    def check_path(self, path: Path, stats: Optional[os.stat_result]) -> Optional[str]:
+        """
+        Classify a file from its name and size alone, without opening it.
+
+        Returns:
+            Optional[str]: Reason to skip the file, or None to read it
+        """
+        name = path.name
+        if name in LOCKFILE_NAMES:
+            return 'lockfile'
+        if name.lower().endswith(GENERATED_SUFFIXES):
+            return 'minified'
+        if stats is not None and stats.st_size > self.size_limit(path):
+            return 'too_large'
+        return None
+
+    def check_content(self, path: Path, raw_data: bytes) -> Optional[str]:
+        """
+        Classify a file from the first SNIFF_BYTES of its contents.
+
+        Returns:
+            Optional[str]: Reason to skip the file, or None to index it
+        """
+        head = raw_data[:SNIFF_BYTES]
+        if b'\x00' in head:
+            return 'binary'
+        lines = head.split(b'\n')
+        if len(lines) > 1 and len(raw_data) > len(head):
+            # The last sniffed line is cut off, so leave it out of the average
+            lines = lines[:-1] or lines
+        longest = max(len(line) for line in lines)
+        average = sum(len(line) for line in lines) / len(lines)
+        if longest > MINIFIED_LINE_LENGTH and average > MINIFIED_AVERAGE_LINE:
+            return 'minified'
+        return None
+
+    def skip(self, path: Path, reason: str, size: Optional[int] = None) -> None:
+        """Record a skipped file. Safe to call from reader threads."""
+        with self.lock:
+            self.skipped.append({'path': str(path), 'reason': reason, 'size': size})
+            self.skipped_paths.add(str(path))
+        logging.info(f"Skipping {path}: {reason}")
+
+    def was_skipped(self, path: Path) -> bool:
+        """Check whether a file was skipped, as opposed to failing to read."""
+        with self.lock:
+            return str(path) in self.skipped_paths
+
+    def report(self) -> Dict:
+        """Summarise skipped files: total, counts per reason and the files themselves."""
+        with self.lock:
+            skipped = list(self.skipped)
+        return {
+            'total': len(skipped),
+            'reasons': dict(Counter(item['reason'] for item in skipped)),
+            'files': skipped,
+        }
+
+    def reset(self) -> None:
+        """Forget files skipped in earlier runs."""
+        with self.lock:
+            self.skipped = []
+            self.skipped_paths = set()
+
+
+def detect_encoding(raw_data: bytes) -> Optional[str]:
+    """Guess a non-UTF-8 file's encoding from a sample of its bytes."""
+    return chardet.detect(raw_data[:ENCODING_SAMPLE_BYTES])['encoding']
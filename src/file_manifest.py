@@ -0,0 +1,172 @@
+"""Per-store manifest of indexed files for content-based change detection.
+
+The manifest maps each file's project-relative path to its size, mtime and
+SHA-256 content hash. Diffing the current tree against it classifies files as
+added, modified, deleted or renamed. Size and mtime are compared first, so a
+file is only hashed when they differ, and a file whose content is unchanged
+(a checkout or `touch`) is never reported as modified.
+
+Alongside the entries the manifest keeps a small `meta` dict for scan state,
+such as the git commit that was indexed.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_bytes(data: bytes) -> str:
+    """Content hash used for manifest entries."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: Union[str, Path]) -> Optional[str]:
+    """Hash a file's contents, or return None if it cannot be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    except OSError as e:
+        logging.warning(f"Could not hash {path}: {e}")
+        return None
+    return digest.hexdigest()
+
+
+def make_entry(stats: os.stat_result, content_hash: str, duplicate_of: Optional[str] = None) -> Dict:
+    """
+    Build a manifest entry from a stat result and content hash. Files stored
+    as references to an identical file record that file's relative path.
+    """
+    entry = {"size": stats.st_size, "mtime": stats.st_mtime, "hash": content_hash}
+    if duplicate_of:
+        entry["duplicate_of"] = duplicate_of
+    return entry
+
+
+class FileManifest:
+    """Path -> (size, mtime, content hash) record of the files in a store."""
+
+    def __init__(self, manifest_path: Union[str, Path]):
+        self.manifest_path = Path(manifest_path)
+        self.meta: Dict = {}
+        self.entries: Dict[str, Dict] = self.load()
+
+    def exists(self) -> bool:
+        """Check whether the manifest has been saved before."""
+        return self.manifest_path.exists()
+
+    def load(self) -> Dict[str, Dict]:
+        """
+        Load manifest entries and meta, starting empty if the file is missing
+        or corrupt. Manifests saved as a bare path -> entry dict are still read.
+        """
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, "r") as f:
+                data = json.load(f)
+        except json.JSONDecodeError as e:
+            logging.warning(f"Ignoring corrupt file manifest at {self.manifest_path}: {e}")
+            return {}
+        if isinstance(data.get("files"), dict) and "version" in data:
+            self.meta = data.get("meta", {})
+            return data["files"]
+        return data
+
+    def save(self, entries: Optional[Dict[str, Dict]] = None, meta: Optional[Dict] = None) -> None:
+        """Atomically write the manifest, optionally replacing its entries and meta first."""
+        if entries is not None:
+            self.entries = entries
+        if meta is not None:
+            self.meta = meta
+        self._write(self.entries, self.meta)
+
+    def checkpoint(self, entries: Dict[str, Dict], meta: Dict) -> None:
+        """
+        Atomically write entries and meta without adopting them, so a run in
+        progress can save how far it got while still diffing against the
+        entries it started from.
+        """
+        self._write(entries, meta)
+
+    def _write(self, entries: Dict[str, Dict], meta: Dict) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{self.manifest_path}.tmp", "w") as f:
+            json.dump({"version": 2, "meta": meta, "files": entries}, f)
+        os.replace(f"{self.manifest_path}.tmp", self.manifest_path)
+
+    def diff(self, files: Iterable[Tuple[str, Path, os.stat_result]]) -> Dict:
+        """
+        Classify the current files against the manifest.
+
+        Args:
+            files: (relative path, absolute path, stat result) for every current file
+
+        Returns:
+            Dict with:
+                added: [(relative path, path, stats, hash)] new files
+                modified: [(relative path, path, stats, hash)] files whose content changed
+                renamed: [(old relative path, relative path, path, stats, hash)] moved files
+                deleted: [relative path] files that are gone
+                touched: [(relative path, stats, hash)] files with new mtime but same content
+                unchanged: number of files skipped on size and mtime alone
+        """
+        result = {"added": [], "modified": [], "renamed": [], "deleted": [], "touched": [], "unchanged": 0}
+        seen = set()
+
+        for relative_path, path, stats in files:
+            seen.add(relative_path)
+            entry = self.entries.get(relative_path)
+            if entry and entry["size"] == stats.st_size and entry["mtime"] == stats.st_mtime:
+                result["unchanged"] += 1
+                continue
+
+            content_hash = hash_file(path)
+            if content_hash is None:
+                continue
+            if entry is None:
+                result["added"].append((relative_path, path, stats, content_hash))
+            elif entry["hash"] == content_hash:
+                result["touched"].append((relative_path, stats, content_hash))
+            else:
+                result["modified"].append((relative_path, path, stats, content_hash))
+
+        deleted = [relative_path for relative_path in self.entries if relative_path not in seen]
+
+        # A deleted file whose content reappears under a new path is a rename
+        deleted_by_hash: Dict[str, List[str]] = {}
+        for relative_path in deleted:
+            deleted_by_hash.setdefault(self.entries[relative_path]["hash"], []).append(relative_path)
+        added = []
+        for item in result["added"]:
+            candidates = deleted_by_hash.get(item[3])
+            if candidates:
+                old_path = candidates.pop()
+                deleted.remove(old_path)
+                result["renamed"].append((old_path,) + item)
+            else:
+                added.append(item)
+        result["added"] = added
+        result["deleted"] = deleted
+        return result
+
+    def apply(self, changes: Dict) -> Dict[str, Dict]:
+        """Return the entries that result from applying a diff to this manifest."""
+        entries = dict(self.entries)
+        for relative_path in changes["deleted"]:
+            entries.pop(relative_path, None)
+        for old_path, *_ in changes["renamed"]:
+            entries.pop(old_path, None)
+        for relative_path, _, stats, content_hash in changes["added"] + changes["modified"]:
+            entries[relative_path] = make_entry(stats, content_hash)
+        for _, relative_path, _, stats, content_hash in changes["renamed"]:
+            entries[relative_path] = make_entry(stats, content_hash)
+        for relative_path, stats, content_hash in changes["touched"]:
+            entries[relative_path] = make_entry(stats, content_hash, self.entries[relative_path].get("duplicate_of"))
+        return entries
@@ -0,0 +1,161 @@
+"""Change enumeration and file listing from git for projects that are git checkouts.
+
+Instead of walking and stat-ing every file, the paths that may have changed
+since an indexed commit are read from git: `git diff --name-status` against
+that commit covers committed and uncommitted edits to tracked files, and
+`git status --porcelain` adds untracked files. The cost is proportional to
+the number of changed files rather than the size of the repository.
+
+For full indexes, `git ls-files` lists the tracked files with their blob
+SHAs, and GitBlobReader streams blob contents from the object database
+through one long-lived `git cat-file --batch` process.
+
+Every function returns None when git is unavailable or fails, so callers can
+fall back to a filesystem walk.
+"""
+
+import shutil
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Union
+
+GIT_TIMEOUT = 60
+# Index entries with this mode are submodules, whose "blob" is a commit
+_GITLINK_MODE = '160000'
+
+
+def _git(cwd: Union[str, Path], *args: str, quiet: bool = False) -> Optional[str]:
+    """
+    Run a git command, returning its stdout or None if it fails. Failures are
+    logged as warnings, or at debug level if quiet, for commands expected to
+    fail in the normal course, e.g. outside a checkout.
+    """
+    if shutil.which('git') is None:
+        return None
+    try:
+        result = subprocess.run(['git', '-C', str(cwd), *args], capture_output=True,
+                                timeout=GIT_TIMEOUT, check=True)
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.log(logging.DEBUG if quiet else logging.WARNING, f"git {' '.join(args)} failed in {cwd}: {e}")
+        return None
+    return result.stdout.decode('utf-8', errors='surrogateescape')
+
+
+def git_root(path: Union[str, Path]) -> Optional[Path]:
+    """Top-level directory of the git checkout containing path, if any."""
+    # Projects outside a checkout are common
+    output = _git(path, 'rev-parse', '--show-toplevel', quiet=True)
+    return Path(output.strip()).resolve() if output else None
+
+
+def head_commit(path: Union[str, Path]) -> Optional[str]:
+    """Commit checked out in the repository containing path, if any."""
+    # Fails quietly in a repository without commits
+    output = _git(path, 'rev-parse', '--verify', '--quiet', 'HEAD', quiet=True)
+    return output.strip() if output else None
+
+
+def changed_paths(root: Path, since_commit: str) -> Optional[Set[Path]]:
+    """
+    Absolute paths that may differ from since_commit in the working tree.
+
+    Renames are reported as a deletion plus an addition, so both paths are
+    included. Files ignored by git are not reported, even if the caller
+    indexes them, and neither are untracked files that were deleted; callers
+    must check the untracked and ignored files they index themselves.
+
+    Args:
+        root: Top-level directory of the checkout
+        since_commit: Commit the caller last indexed
+
+    Returns:
+        Optional[Set[Path]]: Added, modified and deleted paths, or None if
+        git failed (for example because since_commit no longer exists)
+    """
+    diff = _git(root, 'diff', '--name-status', '--no-renames', '-z', since_commit, '--')
+    if diff is None:
+        return None
+    status = _git(root, 'status', '--porcelain', '-z', '--untracked-files=all', '--no-renames')
+    if status is None:
+        return None
+
+    paths: List[str] = []
+    # --name-status -z: status NUL path NUL
+    fields = diff.split('\0')
+    paths += [fields[i + 1] for i in range(0, len(fields) - 1, 2)]
+    # --porcelain -z: "XY path" NUL
+    paths += [entry[3:] for entry in status.split('\0') if len(entry) > 3]
+    return {root / path for path in paths}
+
+
+def tracked_blobs(path: Union[str, Path]) -> Optional[Dict[str, str]]:
+    """
+    Tracked files under path with the blob SHA staged for each.
+
+    Returns:
+        Optional[Dict[str, str]]: '/'-separated path relative to path -> blob
+        SHA, or None if git failed
+    """
+    output = _git(path, 'ls-files', '--stage', '-z')
+    if output is None:
+        return None
+    blobs = {}
+    # --stage -z: "mode SHA stage<TAB>path" NUL
+    for entry in output.split('\0'):
+        if not entry:
+            continue
+        info, _, relative_path = entry.partition('\t')
+        mode, sha, _ = info.split(' ')
+        if mode != _GITLINK_MODE:
+            blobs[relative_path] = sha
+    return blobs
+
+
+def worktree_changes(path: Union[str, Path]) -> Optional[Set[str]]:
+    """Tracked files under path whose working copy differs from the staged blob."""
+    output = _git(path, 'diff', '--name-only', '--relative', '-z')
+    return None if output is None else {p for p in output.split('\0') if p}
+
+
+def untracked_files(path: Union[str, Path]) -> Optional[List[str]]:
+    """Untracked, non-ignored files under path, relative to path."""
+    output = _git(path, 'ls-files', '--others', '--exclude-standard', '-z')
+    return None if output is None else [p for p in output.split('\0') if p]
+
+
+class GitBlobReader:
+    """
+    Reads blob contents through one `git cat-file --batch` process.
+
+    Requests are serialized, so a reader can be shared by threads; git
+    answers each one from its pack files without spawning a process per file.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.process = subprocess.Popen(['git', '-C', str(self.path), 'cat-file', '--batch'],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.lock = threading.Lock()
+
+    def read(self, sha: str) -> Optional[bytes]:
+        """Return a blob's contents, or None if the object is missing."""
+        with self.lock:
+            self.process.stdin.write(sha.encode('ascii') + b'\n')
+            self.process.stdin.flush()
+            # Header: "<sha> <type> <size>", or "<sha> missing"
+            header = self.process.stdout.readline().split()
+            if len(header) != 3:
+                logging.warning(f"git cat-file could not find {sha} in {self.path}")
+                return None
+            data = self.process.stdout.read(int(header[2]))
+            self.process.stdout.read(1)
+            return data
+
+    def close(self) -> None:
+        """Stop the cat-file process."""
+        with self.lock:
+            if self.process.poll() is None:
+                self.process.stdin.close()
+                self.process.wait()
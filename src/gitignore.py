@@ -10,11 +10,19 @@ from typing import List, Dict, Optional, Union, Tuple
 class GitignoreParser:
     """Handles parsing and matching of .gitignore patterns."""
     
-    def __init__(self, gitignore_path: Union[str, Path]):
+    def __init__(self, gitignore_path: Union[str, Path], text: Optional[str] = None):
+        """
+        Args:
+            gitignore_path: The .gitignore file; paths are matched relative to its directory
+            text: Its contents when they do not come from disk, e.g. from an archive member
+        """
         self.gitignore_path = Path(gitignore_path)
         self.patterns: List[str] = []
         self.negation_patterns: List[str] = []
-        self._load_patterns(self.gitignore_path)
+        if text is None:
+            self._load_patterns(self.gitignore_path)
+        else:
+            self._add_patterns(text.splitlines())
 
     def _load_patterns(self, gitignore_path: Path) -> None:
         """Load patterns from .gitignore file."""
@@ -24,21 +32,25 @@ class GitignoreParser:
 
         try:
             with gitignore_path.open('r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#'):
-                        if line.startswith('!'):
-                            pattern = line[1:]
-                            self.negation_patterns.append(pattern)
-                            logging.debug(f"Added negation pattern: {pattern}")
-                        else:
-                            self.patterns.append(line)
-                            logging.debug(f"Added ignore pattern: {line}")
-            logging.info(f"Loaded {len(self.patterns)} ignore patterns and {len(self.negation_patterns)} negation patterns")
+                self._add_patterns(f)
         except Exception as e:
             logging.error(f"Error reading .gitignore: {e}")
             raise
 
+    def _add_patterns(self, lines) -> None:
+        """Add the patterns of .gitignore lines."""
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                if line.startswith('!'):
+                    pattern = line[1:]
+                    self.negation_patterns.append(pattern)
+                    logging.debug(f"Added negation pattern: {pattern}")
+                else:
+                    self.patterns.append(line)
+                    logging.debug(f"Added ignore pattern: {line}")
+        logging.info(f"Loaded {len(self.patterns)} ignore patterns and {len(self.negation_patterns)} negation patterns")
+
     def _normalize_path(self, path: str) -> str:
         """Normalize a path for matching."""
         # Convert Windows path separators to Unix style
@@ -86,28 +98,37 @@ class GitignoreParser:
             relative_path = str(path.relative_to(relative_to))
             relative_path = self._normalize_path(relative_path)
             is_dir = path.is_dir() if path.exists() else False
-            
-            if is_dir and not relative_path.endswith('/'):
-                relative_path += '/'
-
-            # Check negation patterns first
-            for pattern in self.negation_patterns:
-                if self._match_pattern(relative_path, pattern):
-                    logging.debug(f"Path {relative_path} matched negation pattern {pattern}, including")
-                    return False
-
-            # Then check ignore patterns
-            for pattern in self.patterns:
-                if self._match_pattern(relative_path, pattern):
-                    logging.debug(f"Path {relative_path} matched ignore pattern {pattern}, ignoring")
-                    return True
-
-            return False
+            return self.should_ignore_relative(relative_path, is_dir)
 
         except Exception as e:
             logging.error(f"Error checking ignore status for {path}: {e}")
             return False
 
+    def should_ignore_relative(self, relative_path: str, is_dir: bool) -> bool:
+        """
+        Determine if a path should be ignored, given its '/'-separated path
+        relative to the project root and whether it is a directory.
+
+        Unlike should_ignore this never touches the filesystem, so walkers that
+        already know the entry type can check paths without extra syscalls.
+        """
+        if is_dir and not relative_path.endswith('/'):
+            relative_path += '/'
+
+        # Check negation patterns first
+        for pattern in self.negation_patterns:
+            if self._match_pattern(relative_path, pattern):
+                logging.debug(f"Path {relative_path} matched negation pattern {pattern}, including")
+                return False
+
+        # Then check ignore patterns
+        for pattern in self.patterns:
+            if self._match_pattern(relative_path, pattern):
+                logging.debug(f"Path {relative_path} matched ignore pattern {pattern}, ignoring")
+                return True
+
+        return False
+
 def setup_test_environment() -> Tuple[Path, Path]:
     """Set up a test environment with a .gitignore file."""
     test_dir = Path("test_gitignore")
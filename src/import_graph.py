@@ -0,0 +1,325 @@
+"""Persistent import graph for expanding retrieval hits with related modules.
+
+While a store is ingested, CodeStore records the imports of each source file:
+Python `import` / `from ... import` through `ast`, and TS/JS `import ... from`,
+`export ... from` and `require()` through a line scanner. Imports are resolved
+to project files when the graph is loaded, so a file's 1-hop neighbours are
+the files it imports plus the files importing it.
+
+ImportExpandingRetriever uses the graph after a normal retrieval: for each
+hit it looks at the chunks of the hit file's neighbours and adds those
+defining a symbol the hit mentions, until a token budget is spent. No extra
+embedding or similarity query is made.
+"""
+
+import os
+import re
+import ast
+import json
+import logging
+import posixpath
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Union
+
+from llama_index.core import QueryBundle
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore
+
+from code_chunker import PYTHON_EXTENSIONS, SCRIPT_EXTENSIONS
+
+DEFAULT_IMPORTS_DIR = "vector_stores/imports"
+DEFAULT_TOKEN_BUDGET = 1500
+# Neighbour chunks rank below the hit that brought them in
+NEIGHBOR_SCORE_FACTOR = 0.9
+
+_SCRIPT_IMPORT = re.compile(
+    r'''(?:^\s*(?:import|export)\b[^'"]*?\bfrom\s*|^\s*import\s*|\brequire\s*\(\s*|\bimport\s*\(\s*)['"]([^'"]+)['"]''',
+    re.MULTILINE,
+)
+_SCRIPT_RESOLVE_SUFFIXES = ['', '.ts', '.tsx', '.js', '.jsx', '/index.ts', '/index.tsx', '/index.js', '/index.jsx']
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, at about four characters per token."""
+    return len(text) // 4 + 1
+
+
+def _module_name(relative_path: str) -> str:
+    """Dotted module name of a Python file relative to the project root."""
+    parts = relative_path[:-len('.py')].split('/')
+    if parts[-1] == '__init__':
+        parts = parts[:-1]
+    return '.'.join(parts)
+
+
+def python_imports(text: str, relative_path: str) -> List[str]:
+    """
+    Modules a Python file imports, as 'module:<dotted name>' specs. Relative
+    imports are made absolute from the file's location; `from a import b`
+    yields both a.b and a, since b may be a submodule or an attribute.
+    """
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return []
+    package = _module_name(relative_path).split('.')
+    if not relative_path.endswith('__init__.py'):
+        package = package[:-1]
+
+    specs = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            specs += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ''
+            if node.level:
+                parent = package[:len(package) - node.level + 1] if node.level <= len(package) + 1 else []
+                base = '.'.join(filter(None, ['.'.join(parent), base]))
+            if not base and not node.level:
+                continue
+            specs += [f"{base}.{alias.name}" if base else alias.name for alias in node.names if alias.name != '*']
+            if base:
+                specs.append(base)
+    return [f"module:{spec}" for spec in dict.fromkeys(specs)]
+
+
+def script_imports(text: str, relative_path: str) -> List[str]:
+    """Project files a TS/JS file imports by relative path, as 'path:<base path>' specs."""
+    directory = posixpath.dirname(relative_path)
+    specs = []
+    for match in _SCRIPT_IMPORT.finditer(text):
+        target = match.group(1)
+        if not target.startswith('.'):
+            # Packages from node_modules are not part of the project
+            continue
+        specs.append(f"path:{posixpath.normpath(posixpath.join(directory, target))}")
+    return list(dict.fromkeys(specs))
+
+
+def extract_imports(text: str, relative_path: str) -> List[str]:
+    """Import specs of a source file, or [] for unsupported file types."""
+    suffix = posixpath.splitext(relative_path)[1].lower()
+    if suffix in PYTHON_EXTENSIONS:
+        return python_imports(text, relative_path)
+    if suffix in SCRIPT_EXTENSIONS:
+        return script_imports(text, relative_path)
+    return []
+
+
+class ImportGraph:
+    """Project-relative path -> import specs, resolved into a file adjacency index."""
+
+    def __init__(self, graph_path: Union[str, Path]):
+        self.graph_path = Path(graph_path)
+        self.files: Dict[str, List[str]] = {}
+        # Files stored as references -> the identical file holding their nodes
+        self.aliases: Dict[str, str] = {}
+        self.project_root: Optional[str] = None
+        self.edges: Dict[str, Set[str]] = {}
+        self.loaded_mtime: Optional[float] = None
+        self.lock = threading.Lock()
+        self.load()
+
+    @classmethod
+    def for_store(cls, store_name: str, imports_dir: Union[str, Path] = DEFAULT_IMPORTS_DIR) -> "ImportGraph":
+        """Open the import graph saved for a vector store."""
+        return cls(Path(imports_dir) / f"{store_name}.json")
+
+    def exists(self) -> bool:
+        """Check whether the graph has been saved before."""
+        return self.graph_path.exists()
+
+    def load(self) -> None:
+        """Load the saved graph, starting empty if the file is missing or corrupt."""
+        data = {}
+        mtime = None
+        if self.graph_path.exists():
+            try:
+                mtime = self.graph_path.stat().st_mtime
+                with open(self.graph_path, "r") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"Ignoring corrupt import graph at {self.graph_path}: {e}")
+                data = {}
+        with self.lock:
+            self.files = data.get("files", {})
+            self.aliases = data.get("aliases", {})
+            self.project_root = data.get("project_root")
+            self.loaded_mtime = mtime
+            self._resolve()
+
+    def refresh(self) -> None:
+        """Reload the graph if it was saved since it was loaded."""
+        try:
+            mtime = self.graph_path.stat().st_mtime
+        except OSError:
+            return
+        if mtime != self.loaded_mtime:
+            self.load()
+
+    def save(self) -> None:
+        """Atomically write the graph."""
+        self.graph_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            with open(f"{self.graph_path}.tmp", "w") as f:
+                json.dump({"version": 1, "project_root": self.project_root, "files": self.files,
+                           "aliases": self.aliases}, f)
+            os.replace(f"{self.graph_path}.tmp", self.graph_path)
+            self.loaded_mtime = self.graph_path.stat().st_mtime
+
+    def update(self, imports_by_file: Dict[str, List[str]], aliases: Dict[str, str],
+               keep: Optional[Set[str]] = None, project_root: Optional[str] = None) -> None:
+        """
+        Replace the imports of the given files and the aliases of references.
+
+        Args:
+            imports_by_file: Relative path -> import specs, for files read in this run
+            aliases: Relative path of each reference -> relative path of its original
+            keep: If given, every other file not in this set is dropped
+            project_root: Absolute project path, for mapping document ids to files
+
+        Returns:
+            bool: Whether the graph changed, i.e. it needs saving
+        """
+        with self.lock:
+            files, known_aliases = dict(self.files), dict(self.aliases)
+            if keep is not None:
+                files = {path: specs for path, specs in files.items() if path in keep}
+                known_aliases = {path: owner for path, owner in known_aliases.items() if path in keep}
+            for path in aliases:
+                files.pop(path, None)
+            for path in imports_by_file:
+                known_aliases.pop(path, None)
+            files.update(imports_by_file)
+            known_aliases.update(aliases)
+            root = project_root if project_root is not None else self.project_root
+            if (files, known_aliases, root) == (self.files, self.aliases, self.project_root):
+                return False
+            self.files, self.aliases, self.project_root = files, known_aliases, root
+            self._resolve()
+            return True
+
+    def neighbors(self, relative_path: str) -> List[str]:
+        """Files that relative_path imports or is imported by, as the files holding their nodes."""
+        relative_path = self.aliases.get(relative_path, relative_path)
+        with self.lock:
+            return sorted(self.edges.get(relative_path, set()))
+
+    def relative_path(self, file_path: str) -> Optional[str]:
+        """Map a document's file_path to its key in the graph."""
+        if self.project_root is None:
+            return None
+        if file_path and not Path(file_path).is_absolute():
+            # Members of archive projects are recorded relative to the archive root
+            return Path(file_path).as_posix()
+        try:
+            return Path(file_path).relative_to(self.project_root).as_posix()
+        except ValueError:
+            return None
+
+    def document_id(self, relative_path: str) -> str:
+        """Document id (absolute file path) of a file in the graph."""
+        return str(Path(self.project_root) / relative_path)
+
+    def _resolve(self) -> None:
+        """Resolve import specs to files and build the undirected adjacency. Caller holds the lock."""
+        modules: Dict[str, List[str]] = {}
+        for path in list(self.files) + list(self.aliases):
+            if path.endswith('.py'):
+                parts = _module_name(path).split('.')
+                # Any suffix may be importable, depending on which directory is on sys.path
+                for start in range(len(parts)):
+                    modules.setdefault('.'.join(parts[start:]), []).append(path)
+        known = set(self.files) | set(self.aliases)
+
+        edges: Dict[str, Set[str]] = {}
+        for path, specs in self.files.items():
+            for spec in specs:
+                target = self._resolve_spec(spec, path, modules, known)
+                if target is None:
+                    continue
+                target = self.aliases.get(target, target)
+                if target != path:
+                    edges.setdefault(path, set()).add(target)
+                    edges.setdefault(target, set()).add(path)
+        self.edges = edges
+
+    @staticmethod
+    def _resolve_spec(spec: str, importer: str, modules: Dict[str, List[str]], known: Set[str]) -> Optional[str]:
+        kind, _, target = spec.partition(':')
+        if kind == 'path':
+            for suffix in _SCRIPT_RESOLVE_SUFFIXES:
+                if target + suffix in known:
+                    return target + suffix
+            # TS sources are often imported with the extension of their compiled output
+            base, extension = posixpath.splitext(target)
+            if extension in ('.js', '.jsx'):
+                for suffix in ('.ts', '.tsx'):
+                    if base + suffix in known:
+                        return base + suffix
+            return None
+        candidates = modules.get(target)
+        if not candidates:
+            return None
+        # Prefer the candidate closest to the importer in the directory tree
+        return max(candidates, key=lambda candidate: len(os.path.commonprefix([candidate, importer])))
+
+
+class ImportExpandingRetriever(BaseRetriever):
+    """
+    Wraps a retriever, adding chunks from the hits' 1-hop import neighbours
+    that define symbols the hits mention, within a token budget.
+    """
+
+    def __init__(self, retriever: BaseRetriever, graph: ImportGraph,
+                 document_nodes: Callable[[str], List[BaseNode]], token_budget: int = DEFAULT_TOKEN_BUDGET):
+        """
+        Args:
+            retriever: Retriever producing the hits
+            graph: Import graph of the store
+            document_nodes: Returns the stored chunks of a document id
+            token_budget: Estimated tokens that neighbour chunks may add in total
+        """
+        super().__init__()
+        self.retriever = retriever
+        self.graph = graph
+        self.document_nodes = document_nodes
+        self.token_budget = token_budget
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        hits = self.retriever.retrieve(query_bundle)
+        self.graph.refresh()
+        seen = {hit.node.node_id for hit in hits}
+        budget = self.token_budget
+        added = []
+        for hit in hits:
+            if budget <= 0:
+                break
+            relative_path = self.graph.relative_path(hit.node.metadata.get('file_path', ''))
+            if relative_path is None:
+                continue
+            text = hit.node.get_content()
+            for neighbor in self.graph.neighbors(relative_path):
+                for node in self._mentioned_chunks(text, self.graph.document_id(neighbor)):
+                    tokens = estimate_tokens(node.get_content())
+                    if node.node_id in seen or tokens > budget:
+                        continue
+                    seen.add(node.node_id)
+                    budget -= tokens
+                    added.append(NodeWithScore(node=node, score=(hit.score or 0.0) * NEIGHBOR_SCORE_FACTOR))
+        if added:
+            logging.info(f"Added {len(added)} chunks from imported modules "
+                         f"({self.token_budget - budget} of {self.token_budget} tokens)")
+        return hits + added
+
+    def _mentioned_chunks(self, text: str, doc_id: str) -> List[BaseNode]:
+        """A neighbour's chunks defining symbols that text mentions, most mentioned first."""
+        ranked = []
+        for node in self.document_nodes(doc_id):
+            symbols = [s.strip().split('.')[-1] for s in str(node.metadata.get('symbols', '')).split(',')]
+            mentions = sum(1 for symbol in symbols if symbol and re.search(rf'\b{re.escape(symbol)}\b', text))
+            if mentions:
+                ranked.append((mentions, node))
+        ranked.sort(key=lambda item: -item[0])
+        return [node for _, node in ranked]
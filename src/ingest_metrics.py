@@ -0,0 +1,77 @@
+"""Counters and stage timings for one CodeStore ingestion run.
+
+A fresh IngestMetrics is started whenever CodeStore plans a run. The walk,
+the reader threads and the decoder add to it as files flow through, and
+finish() stamps the wall-clock time so throughput can be derived. Stage
+times are busy seconds summed over all threads, so with parallel readers
+they can add up to more than the elapsed time.
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Union
+
+STAGES = ("walk", "ignore_check", "read", "decode", "hash", "build", "analyze")
+COUNTERS = ("files_scanned", "files_skipped", "files_read", "files_failed",
+            "bytes_read", "decode_fallbacks", "documents")
+
+
+class IngestMetrics:
+    """Thread-safe counters and per-stage busy time for an ingestion run."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.elapsed = 0.0
+        self.counters: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self.stage_seconds: Dict[str, float] = {name: 0.0 for name in STAGES}
+        self.lock = threading.Lock()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to a counter."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        """Add busy time to a stage."""
+        with self.lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def finish(self) -> "IngestMetrics":
+        """Record the wall-clock time since the run started."""
+        self.elapsed = time.time() - self.started
+        return self
+
+    def to_dict(self) -> Dict:
+        """Counters, stage seconds and throughput as a JSON-ready dict."""
+        with self.lock:
+            counters = dict(self.counters)
+            stage_seconds = {stage: round(seconds, 4) for stage, seconds in self.stage_seconds.items()}
+        elapsed = self.elapsed or time.time() - self.started
+        seconds = max(elapsed, 1e-6)
+        return {
+            **counters,
+            "stage_seconds": stage_seconds,
+            "elapsed": round(elapsed, 4),
+            "files_per_second": round(counters["files_read"] / seconds, 1),
+            "mb_per_second": round(counters["bytes_read"] / 1e6 / seconds, 2),
+        }
+
+    def write_json(self, path: Union[str, Path]) -> None:
+        """Write the metrics to a JSON file, replacing it atomically."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def summary(self) -> str:
+        """One-line summary for progress output."""
+        metrics = self.to_dict()
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in metrics["stage_seconds"].items())
+        return (f"{metrics['files_scanned']} scanned, {metrics['files_skipped']} skipped, "
+                f"{metrics['files_read']} read ({metrics['bytes_read'] / 1e6:.1f} MB), "
+                f"{metrics['decode_fallbacks']} decode fallbacks in {metrics['elapsed']:.2f}s: "
+                f"{metrics['files_per_second']:.0f} files/s, {metrics['mb_per_second']:.1f} MB/s; {stages}")
@@ -0,0 +1,447 @@
+"""Streaming ingestion from a CodeStore into a vector store.
+
+Files flow through walk -> read -> chunk -> embed -> insert stages that run
+concurrently on their own worker threads, connected by bounded queues. A full
+queue blocks the stage feeding it, so a slow embedder throttles reading and
+memory stays flat no matter how large the repository is.
+
+Files are deduplicated by content hash: the first file with given contents
+is chunked, embedded and inserted, and every identical file is stored as a
+lightweight reference to it carrying only its own metadata. When the hash is
+known before reading (from the file manifest), duplicates are not even read.
+This holds for a remote service too, which is sent references instead of
+documents. Hits list the paths of their duplicates in metadata['duplicates'].
+
+Modified files are updated chunk by chunk: chunk ids are derived from their
+text, so re-chunking a file and comparing ids with the ones stored for it
+gives the chunks to embed and insert, the chunks to delete, and the chunks
+that are unchanged and keep their embeddings.
+"""
+
+import time
+import queue
+import contextlib
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from llama_index.core.schema import MetadataMode
+from llama_index.core.settings import Settings
+
+import vectorstore
+from code_chunker import assign_chunk_ids, diff_chunks
+
+# Sentinel passed downstream once a stage has no more work
+_DONE = object()
+
+
+class IngestionPipeline:
+    """Walk -> read -> chunk -> embed -> insert, with bounded queues between stages."""
+
+    def __init__(self, code_store, manager, store_name: str,
+                 read_workers: int = 4, chunk_workers: int = 2, embed_workers: int = 1,
+                 queue_size: int = 32, embed_batch_size: int = 64, persist_every: int = 0,
+                 persist_growth: float = 0.25,
+                 progress: Optional[Callable[[Dict], None]] = None, progress_every: int = 100,
+                 publish_first: int = 0, on_publish: Optional[Callable[[Dict], None]] = None):
+        """
+        Args:
+            code_store: CodeStore providing files, reading and the file manifest
+            manager: VectorStoreManager, or a VectorStoreClient for the shared service
+            store_name: Vector store to insert into
+            read_workers: Threads reading and decoding files
+            chunk_workers: Threads splitting documents into nodes
+            embed_workers: Threads computing embeddings
+            queue_size: Maximum items waiting between two stages
+            embed_batch_size: Nodes embedded per model call, or documents sent
+                per request to a remote service
+            persist_every: Persist after this many inserted documents, 0 for only
+                at the end; a remote service is asked to persist by the same rules
+            persist_growth: Also wait until the documents inserted since the last
+                persist are this fraction of the store's files, as each persist
+                writes the whole store; keeps the total written linear in its size
+            progress: Called with a copy of the stats every progress_every documents
+            progress_every: Documents between progress callbacks
+            publish_first: Persist after this many inserted documents, so the
+                store is queryable before the rest are indexed; 0 to not
+            on_publish: Called with a copy of the stats each time the store
+                is persisted, e.g. to rebuild a query engine over it
+        """
+        self.code_store = code_store
+        self.manager = manager
+        self.store_name = store_name
+        self.read_workers = read_workers
+        self.chunk_workers = chunk_workers
+        self.embed_workers = embed_workers
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.persist_every = persist_every
+        self.persist_growth = persist_growth
+        self.progress = progress
+        self.progress_every = progress_every
+        self.publish_first = publish_first
+        self.on_publish = on_publish
+
+        # A remote service embeds on its side, so documents are sent as-is
+        self.remote = not isinstance(manager, vectorstore.VectorStoreManager)
+        self.stop = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.lock = threading.Lock()
+        # Held for a whole run, so a pipeline reused by a watcher never runs twice at once
+        self.run_lock = threading.Lock()
+        self.stats: Dict = {}
+        self.started = 0.0
+        self.index = None
+        # Content hash -> id of the document whose nodes hold that content
+        self.owners: Dict[str, str] = {}
+
+    def run(self, files: Iterable[Tuple[Path, object]]) -> Dict:
+        """
+        Ingest files into the vector store.
+
+        Args:
+            files: (path, stat result) pairs, e.g. from CodeStore.plan_full_index,
+                CodeStore.plan_git_index or CodeStore.find_changed_files
+
+        Returns:
+            Dict: Counts (including files skipped by the classifier) and busy
+                seconds per stage, plus total elapsed time and the CodeStore's
+                read-side metrics under "ingest"
+        """
+        # A remote service serializes writes itself
+        store_lock = contextlib.nullcontext() if self.remote else self.manager.store_lock(self.store_name)
+        with self.run_lock, store_lock:
+            try:
+                return self._run(files)
+            finally:
+                if not self.remote:
+                    # Queries read the store's exports, so its docstore need not stay loaded
+                    self.index = None
+                    self.manager.release_vector_store(self.store_name)
+
+    def _run(self, files: Iterable[Tuple[Path, object]]) -> Dict:
+        self.stop.clear()
+        self.error = None
+        self.owners = self.code_store.content_owners()
+        self.index = None if self.remote else self.manager.get_vector_store(self.store_name)
+        self.stats = {"files": 0, "failed": 0, "skipped": 0, "documents": 0, "duplicates": 0, "nodes": 0,
+                      "reused_nodes": 0, "removed_nodes": 0,
+                      "stage_seconds": {"walk": 0.0, "read": 0.0, "chunk": 0.0, "embed": 0.0, "insert": 0.0}}
+        start = self.started = time.time()
+
+        read_queue = queue.Queue(maxsize=self.queue_size)
+        chunk_queue = queue.Queue(maxsize=self.queue_size)
+        embed_queue = queue.Queue(maxsize=self.queue_size)
+        insert_queue = queue.Queue(maxsize=self.queue_size)
+
+        threads = [threading.Thread(target=self._guard, args=(self._walk, files, read_queue, self.read_workers),
+                                    name="ingest-walk", daemon=True)]
+        threads += self._start_stage("read", self._read, self.read_workers, read_queue, chunk_queue, self.chunk_workers)
+        threads += self._start_stage("chunk", self._chunk, self.chunk_workers, chunk_queue, embed_queue, self.embed_workers)
+        threads += self._start_stage("embed", self._embed_worker, self.embed_workers, embed_queue, insert_queue, 1,
+                                     batched=True)
+        threads[0].start()
+
+        # Inserting happens on the calling thread, the only one touching the index
+        self._guard(self._insert, insert_queue)
+        self.stop.set()
+        for thread in threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+        self.stats["elapsed"] = time.time() - start
+        print(f"Ingested {self.stats['documents']} documents ({self.stats['nodes']} nodes embedded, "
+              f"{self.stats['reused_nodes']} unchanged nodes kept, "
+              f"{self.stats['duplicates']} duplicates stored as references) from "
+              f"{self.stats['files']} files in {self.stats['elapsed']:.2f}s; "
+              f"{self.stats['failed']} files could not be read")
+        self.stats["skipped"] = self.code_store.report_skipped()["total"]
+        self.stats["ingest"] = self.code_store.finish_metrics()
+        return self.stats
+
+    def _guard(self, fn: Callable, *args) -> None:
+        """Run a stage function, stopping the whole pipeline if it fails."""
+        try:
+            fn(*args)
+        except BaseException as e:
+            logging.error(f"Ingestion pipeline failed: {e}")
+            with self.lock:
+                if self.error is None:
+                    self.error = e
+            self.stop.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Put with backpressure, giving up if the pipeline is stopping."""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        """Get the next item, or _DONE if the pipeline is stopping."""
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _add_time(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            self.stats["stage_seconds"][stage] += seconds
+
+    def _start_stage(self, name: str, fn: Callable, workers: int, inbox: queue.Queue,
+                     outbox: queue.Queue, downstream_workers: int, batched: bool = False) -> List[threading.Thread]:
+        """
+        Start a stage's worker threads. The last worker to finish sends one
+        _DONE per downstream worker.
+        """
+        remaining = [workers]
+
+        def worker():
+            try:
+                if batched:
+                    fn(inbox, outbox)
+                else:
+                    while True:
+                        item = self._get(inbox)
+                        if item is _DONE:
+                            break
+                        started = time.time()
+                        result = fn(item)
+                        self._add_time(name, time.time() - started)
+                        if result is not None and not self._put(outbox, result):
+                            break
+            finally:
+                with self.lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    for _ in range(downstream_workers):
+                        self._put(outbox, _DONE)
+
+        threads = [threading.Thread(target=self._guard, args=(worker,), name=f"ingest-{name}-{i}", daemon=True)
+                   for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _walk(self, files: Iterable, outbox: queue.Queue, downstream_workers: int) -> None:
+        """Feed files into the read stage."""
+        try:
+            started = time.time()
+            for file_path, stats in files:
+                self._add_time("walk", time.time() - started)
+                if not self._put(outbox, (file_path, stats)):
+                    return
+                with self.lock:
+                    self.stats["files"] += 1
+                started = time.time()
+        finally:
+            for _ in range(downstream_workers):
+                self._put(outbox, _DONE)
+
+    def _claim(self, content_hash: str, doc_id: str) -> str:
+        """Make doc_id the owner of content_hash unless another document already is."""
+        with self.lock:
+            return self.owners.setdefault(content_hash, doc_id)
+
+    def _read(self, item: Tuple) -> Optional[Tuple]:
+        """Read and decode one file into a Document, or a reference if its content is already indexed."""
+        file_path, stats = item
+        known_hash = self.code_store.known_hashes.get(str(file_path))
+        if known_hash is not None and self.owners.get(known_hash, str(file_path)) != str(file_path):
+            return file_path, stats, self.code_store.reference_document(file_path, stats), known_hash
+
+        doc, content_hash = self.code_store._load_document(file_path, stats)
+        if doc is None:
+            if self.code_store.classifier.was_skipped(file_path):
+                # Passed on so the insert stage can drop what the store holds for it
+                return file_path, stats, None, None
+            with self.lock:
+                self.stats["failed"] += 1
+            self.code_store.record_failed_file(file_path)
+            return None
+        self._claim(content_hash, doc.doc_id)
+        return file_path, stats, doc, content_hash
+
+    def _owner(self, item: Tuple) -> Optional[str]:
+        """Id of the document holding this item's content, if that is not the item itself."""
+        owner = self.owners.get(item[3])
+        return owner if owner is not None and owner != item[2].doc_id else None
+
+    def _chunk(self, item: Tuple) -> Tuple:
+        """
+        Split a document into nodes, adding to the item the nodes to embed and
+        insert plus the chunk-level change, if any (see _diff_chunks).
+        Duplicates of indexed content and skipped files get no nodes.
+        """
+        if item[2] is None or self.remote or self._owner(item):
+            return item + ([], None)
+        doc = item[2]
+        nodes = assign_chunk_ids(doc.doc_id, Settings.node_parser.get_nodes_from_documents([doc]))
+        return item + self._diff_chunks(doc.doc_id, nodes)
+
+    def _diff_chunks(self, doc_id: str, nodes: list) -> Tuple[list, Optional[Tuple[list, list]]]:
+        """Compare a document's new chunks with the ones stored for it (see code_chunker.diff_chunks)."""
+        return diff_chunks(self.index.docstore, doc_id, nodes)
+
+    def _embed_worker(self, inbox: queue.Queue, outbox: queue.Queue) -> None:
+        """Embed nodes from several documents per model call, then pass each document on."""
+        batch = []
+        node_count = 0
+        while True:
+            item = self._get(inbox)
+            if item is not _DONE:
+                batch.append(item)
+                node_count += len(item[4])
+            if batch and (item is _DONE or node_count >= self.embed_batch_size):
+                started = time.time()
+                self._embed([node for item_ in batch for node in item_[4]])
+                self._add_time("embed", time.time() - started)
+                for item_ in batch:
+                    if not self._put(outbox, item_):
+                        return
+                batch = []
+                node_count = 0
+            if item is _DONE:
+                return
+
+    def _embed(self, nodes: list) -> None:
+        """Compute embeddings for nodes that do not have one yet."""
+        nodes = [node for node in nodes if node.embedding is None]
+        if not nodes:
+            return
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        embeddings = Settings.embed_model.get_text_embedding_batch(texts)
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+
+    def _insert(self, inbox: queue.Queue) -> None:
+        """Insert embedded nodes into the store, one document at a time."""
+        index = self.index
+        handler = None
+        if not self.remote:
+            store_info = self.manager.vs_index[self.store_name]
+            handler = self.manager.get_handler(store_info["type"], store_info["path"])
+
+        remote_batch = []
+        # (reference, owner) pairs, sent after remote_batch since their owners may be in it
+        remote_references = []
+        # record_file arguments of the files in the unsent batches, recorded once the service has them
+        remote_records = []
+        since_persist = 0
+        # Files the store held before this run
+        stored = len(self.code_store.file_manifest.entries)
+        published = False
+        while True:
+            item = self._get(inbox)
+            if item is _DONE:
+                break
+            started = time.time()
+            persisted = False
+            file_path, stats, doc, content_hash, nodes, changes = item
+            if doc is None:
+                self._drop_skipped(file_path, handler)
+                self._add_time("insert", time.time() - started)
+                continue
+            owner = self._owner(item)
+            kept, removed = changes or ([], [])
+            if self.remote:
+                if owner:
+                    remote_references.append((doc, owner))
+                else:
+                    remote_batch.append(doc)
+                remote_records.append((file_path, stats, content_hash, owner))
+                if len(remote_batch) + len(remote_references) >= self.embed_batch_size:
+                    self._send_remote(remote_batch, remote_references, remote_records)
+                    remote_batch, remote_references, remote_records = [], [], []
+            else:
+                if owner:
+                    handler.remove_document(index, doc.doc_id)
+                    handler.add_reference(index, doc, owner)
+                elif changes is not None:
+                    handler.update_nodes(index, nodes, kept, removed)
+                    index.docstore.set_document_hash(doc.doc_id, doc.hash)
+                else:
+                    handler.remove_document(index, doc.doc_id)
+                    index.insert_nodes(nodes)
+                    index.docstore.set_document_hash(doc.doc_id, doc.hash)
+                self.code_store.record_file(file_path, stats, content_hash, duplicate_of=owner)
+            with self.lock:
+                self.stats["documents"] += 1
+                self.stats["duplicates"] += 1 if owner else 0
+                self.stats["nodes"] += len(nodes)
+                self.stats["reused_nodes"] += len(kept)
+                self.stats["removed_nodes"] += len(removed)
+            # A service persists the whole store too, so it is asked to by the same rule
+            since_persist += 1
+            first = self.publish_first and not published and self.stats["documents"] >= self.publish_first
+            due = self.persist_every and since_persist >= max(
+                self.persist_every, self.persist_growth * (stored + self.stats["documents"]))
+            if first or due:
+                if self.remote:
+                    self._send_remote(remote_batch, remote_references, remote_records)
+                    remote_batch, remote_references, remote_records = [], [], []
+                    self.manager.persist_vector_store(self.store_name)
+                else:
+                    handler.persist(index)
+                since_persist = 0
+                published = persisted = True
+            if persisted:
+                # Everything recorded so far is now persisted (remote files are only
+                # recorded once their batch is sent), so a restart can resume from here
+                self.code_store.checkpoint_manifest()
+            self._add_time("insert", time.time() - started)
+            if persisted:
+                self._published()
+            if self.progress and self.stats["documents"] % self.progress_every == 0:
+                self.progress(dict(self.stats, elapsed=time.time() - self.started))
+
+        if self.stop.is_set():
+            return
+        started = time.time()
+        if self.remote:
+            self._send_remote(remote_batch, remote_references, remote_records)
+            if since_persist:
+                self.manager.persist_vector_store(self.store_name)
+        else:
+            handler.persist(index)
+            self.manager.update_store_timestamp(self.store_name)
+        self._add_time("insert", time.time() - started)
+        self._published()
+
+    def _send_remote(self, documents: list, references: list, records: list) -> None:
+        """
+        Send a batch of documents, then the references to them and earlier
+        documents, to the service, which holds them without persisting. Their
+        files are recorded in the manifest only once the service has accepted
+        both, so a failed send leaves them to be indexed again; the manifest
+        is only checkpointed once the service has persisted them.
+        """
+        if documents:
+            self.manager.add_to_vector_store(self.store_name, documents, persist=False)
+        if references:
+            self.manager.add_references(self.store_name, references, persist=False)
+        for file_path, stats, content_hash, owner in records:
+            self.code_store.record_file(file_path, stats, content_hash, duplicate_of=owner)
+
+    def _drop_skipped(self, file_path: Path, handler) -> None:
+        """Forget a file the classifier skipped, deleting the version the store holds, if any."""
+        if not self.code_store.record_failed_file(file_path):
+            return
+        logging.info(f"Removing {file_path} from {self.store_name}: it is now skipped")
+        if self.remote:
+            self.manager.delete_from_vector_store(self.store_name, [str(file_path)])
+        else:
+            handler.remove_document(self.index, str(file_path))
+
+    def _published(self) -> None:
+        """Tell on_publish that the store's persisted state has advanced."""
+        if self.on_publish:
+            self.on_publish(dict(self.stats, elapsed=time.time() - self.started))
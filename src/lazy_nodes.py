@@ -0,0 +1,347 @@
+"""Lazy node loading for basic vector stores.
+
+Node text and metadata are exported to a blob file with an index beside it
+giving each node's offset, length and payload digest. Retrieval scores the
+on-disk embedding export and only reads the blobs for the final top-k nodes,
+so the docstore never has to be held in memory.
+
+The index also maps each document to the paths of files stored as
+references to it, so hits can name every copy of their content.
+
+Like the embedding export, the blob only grows: a persist appends the nodes
+that are new or whose payload changed, and the index, replaced last, says
+which bytes are live. Once dead bytes pass COMPACT_FRACTION of the blob, the
+live payloads are copied into a new generation of the blob. Readers check
+the index before each lookup and reload it when a persist has replaced it.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from llama_index.core import QueryBundle
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore
+from llama_index.core.settings import Settings
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+
+from streaming_search import COMPACT_FRACTION, StreamingSearcher
+
+# NODES_OFFSETS_FILE is the index; the other two names are the layout written before blobs were appended to
+NODES_BLOB_FILE = "nodes.blob"
+NODES_OFFSETS_FILE = "nodes_offsets.json"
+NODES_BY_DOC_FILE = "nodes_by_doc.json"
+
+_EXPORT_FILE = re.compile(r"^(nodes\.blob|nodes_by_doc\.json|nodes-\d+\.blob)$")
+
+
+def node_blob_exists(index_path: Union[str, Path]) -> bool:
+    """Check whether a node blob export exists for a store."""
+    return (Path(index_path) / NODES_OFFSETS_FILE).exists()
+
+
+def read_node_index(index_path: Union[str, Path]) -> Optional[Dict]:
+    """
+    Load a node export's index, or None if there is none. Indexes in the old
+    layout (a bare id -> [offset, length] map) are converted, without digests.
+    """
+    index_path = Path(index_path)
+    offsets_path = index_path / NODES_OFFSETS_FILE
+    if not offsets_path.exists():
+        return None
+    with open(offsets_path, "r") as f:
+        data = json.load(f)
+    if isinstance(data.get("blob"), str):
+        return data
+
+    by_doc = {}
+    by_doc_path = index_path / NODES_BY_DOC_FILE
+    if by_doc_path.exists():
+        with open(by_doc_path, "r") as f:
+            by_doc = json.load(f)
+    nodes = {node_id: [offset, length, None] for node_id, (offset, length) in data.items()}
+    return {"generation": 0, "blob": NODES_BLOB_FILE, "blob_bytes": None, "nodes": nodes, "by_doc": by_doc,
+            "legacy": True}
+
+
+def _payload(node: BaseNode) -> Tuple[bytes, str]:
+    payload = json.dumps(doc_to_json(node)).encode("utf-8")
+    return payload, hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+def write_node_blob(index_path: Union[str, Path], nodes: Iterable[BaseNode],
+                    duplicates: Optional[Dict[str, List[str]]] = None) -> int:
+    """
+    Bring the node export in line with a store's nodes.
+
+    Nodes whose serialized payload is unchanged keep their bytes; new and
+    changed nodes are appended. Nothing is written if nothing changed.
+
+    Args:
+        index_path: Store directory to write into
+        nodes: Every node the store holds
+        duplicates: Document id -> paths of the files stored as references to it
+
+    Returns:
+        int: Number of nodes in the export
+    """
+    index_path = Path(index_path)
+    index_path.mkdir(parents=True, exist_ok=True)
+    previous = read_node_index(index_path)
+    duplicates = duplicates or {}
+    if previous is None or previous.get("legacy"):
+        return _rewrite(index_path, previous, nodes, duplicates)
+
+    blob_path = index_path / previous["blob"]
+    entries: Dict[str, List] = {}
+    by_doc: Dict[str, List[str]] = {}
+    appended = 0
+    with open(blob_path, "r+b") as f:
+        # Drop anything a failed write left past the live bytes
+        f.truncate(previous["blob_bytes"])
+        f.seek(0, os.SEEK_END)
+        for node in nodes:
+            payload, digest = _payload(node)
+            entry = previous["nodes"].get(node.node_id)
+            if entry is None or entry[2] != digest:
+                entry = [f.tell(), len(payload), digest]
+                f.write(payload)
+                appended += 1
+            entries[node.node_id] = entry
+            if node.ref_doc_id:
+                by_doc.setdefault(node.ref_doc_id, []).append(node.node_id)
+        blob_bytes = f.tell()
+
+    if (not appended and entries.keys() == previous["nodes"].keys() and by_doc == previous["by_doc"]
+            and duplicates == previous.get("duplicates", {})):
+        return len(entries)
+
+    live_bytes = sum(length for _, length, _ in entries.values())
+    if blob_bytes - live_bytes > COMPACT_FRACTION * blob_bytes:
+        return _compact(index_path, previous, entries, by_doc, duplicates)
+
+    index = dict(previous, blob_bytes=blob_bytes, nodes=entries, by_doc=by_doc, duplicates=duplicates)
+    _publish(index_path, index, previous)
+    logging.info(f"Appended {appended} nodes to {blob_path} ({len(entries)} live)")
+    return len(entries)
+
+
+def _rewrite(index_path: Path, previous: Optional[Dict], nodes: Iterable[BaseNode],
+             duplicates: Dict[str, List[str]]) -> int:
+    """Write every node to a new generation of the blob and publish it."""
+    generation = (previous["generation"] if previous else 0) + 1
+    blob_name = f"nodes-{generation}.blob"
+    entries: Dict[str, List] = {}
+    by_doc: Dict[str, List[str]] = {}
+    with open(index_path / blob_name, "wb") as f:
+        for node in nodes:
+            payload, digest = _payload(node)
+            entries[node.node_id] = [f.tell(), len(payload), digest]
+            f.write(payload)
+            if node.ref_doc_id:
+                by_doc.setdefault(node.ref_doc_id, []).append(node.node_id)
+        blob_bytes = f.tell()
+
+    index = {"generation": generation, "blob": blob_name, "blob_bytes": blob_bytes, "nodes": entries,
+             "by_doc": by_doc, "duplicates": duplicates}
+    _publish(index_path, index, previous)
+    logging.info(f"Exported {len(entries)} nodes to {index_path / blob_name}")
+    return len(entries)
+
+
+def _compact(index_path: Path, previous: Dict, entries: Dict[str, List], by_doc: Dict[str, List[str]],
+             duplicates: Dict[str, List[str]]) -> int:
+    """Copy the live payloads into a new generation of the blob, in file order, and publish it."""
+    generation = previous["generation"] + 1
+    blob_name = f"nodes-{generation}.blob"
+    compacted: Dict[str, List] = {}
+    with open(index_path / previous["blob"], "rb") as source, open(index_path / blob_name, "wb") as f:
+        for node_id, (offset, length, digest) in sorted(entries.items(), key=lambda item: item[1][0]):
+            source.seek(offset)
+            compacted[node_id] = [f.tell(), length, digest]
+            f.write(source.read(length))
+        blob_bytes = f.tell()
+
+    index = {"generation": generation, "blob": blob_name, "blob_bytes": blob_bytes, "nodes": compacted,
+             "by_doc": by_doc, "duplicates": duplicates}
+    _publish(index_path, index, previous)
+    logging.info(f"Compacted {len(compacted)} nodes into {index_path / blob_name}")
+    return len(compacted)
+
+
+def _publish(index_path: Path, index: Dict, previous: Optional[Dict]) -> None:
+    """
+    Atomically replace the index, then delete blobs that neither it nor the
+    previous index use. Readers that loaded the previous index can still
+    read its blob.
+    """
+    offsets_path = index_path / NODES_OFFSETS_FILE
+    with open(f"{offsets_path}.tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(f"{offsets_path}.tmp", offsets_path)
+
+    keep = {index["blob"]}
+    if previous is not None:
+        keep.add(previous["blob"])
+        if previous.get("legacy"):
+            keep.add(NODES_BY_DOC_FILE)
+    for path in index_path.iterdir():
+        if _EXPORT_FILE.match(path.name) and path.name not in keep:
+            try:
+                path.unlink()
+            except OSError as e:
+                logging.warning(f"Could not remove old export file {path}: {e}")
+
+
+class NodeBlobStore:
+    """Reads nodes from a blob export on demand, with a small LRU cache."""
+
+    def __init__(self, index_path: Union[str, Path], cache_size: int = 256):
+        self.index_path = Path(index_path)
+        self.cache_size = cache_size
+        # node id -> (payload digest, node)
+        self.cache: "OrderedDict[str, Tuple[Optional[str], BaseNode]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.index: Dict = {}
+        self.index_stamp: Optional[Tuple[int, int, int]] = None
+        if not self.refresh():
+            raise FileNotFoundError(f"No node blob export found at {self.index_path}")
+
+    def refresh(self) -> bool:
+        """
+        Reload the index if a persist replaced it since it was read. Cached
+        nodes whose payload digest is unchanged stay cached.
+
+        Returns:
+            bool: False if there is no export at all
+        """
+        try:
+            stats = (self.index_path / NODES_OFFSETS_FILE).stat()
+        except FileNotFoundError:
+            return False
+        stamp = (stats.st_ino, stats.st_mtime_ns, stats.st_size)
+        with self.lock:
+            if stamp == self.index_stamp:
+                return True
+            index = read_node_index(self.index_path)
+            if index is None:
+                return False
+            nodes = index["nodes"]
+            for node_id in [node_id for node_id, (digest, _) in self.cache.items()
+                            if digest is None or node_id not in nodes or nodes[node_id][2] != digest]:
+                del self.cache[node_id]
+            self.index = index
+            self.index_stamp = stamp
+            return True
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.index["nodes"]
+
+    def __len__(self) -> int:
+        return len(self.index["nodes"])
+
+    def duplicates(self, doc_id: str) -> List[str]:
+        """Paths of the files stored as references to a document."""
+        return self.index.get("duplicates", {}).get(doc_id, [])
+
+    def get_document_nodes(self, doc_id: str) -> List[BaseNode]:
+        """Fetch every exported node of a document."""
+        self.refresh()
+        return self.get_many(self.index["by_doc"].get(doc_id, []))
+
+    def get(self, node_id: str) -> BaseNode:
+        """Fetch a single node by id, raising KeyError if it is not in the export."""
+        nodes = self.get_many([node_id])
+        if not nodes:
+            raise KeyError(node_id)
+        return nodes[0]
+
+    def get_many(self, node_ids: List[str]) -> List[BaseNode]:
+        """
+        Fetch nodes by id, reading only those not already cached. Ids not in
+        the current export, e.g. removed by a persist since they were found,
+        are left out.
+        """
+        self.refresh()
+        try:
+            return self._read(node_ids)
+        except FileNotFoundError:
+            # The blob was compacted away between loading the index and reading it
+            self.refresh()
+            return self._read(node_ids)
+
+    def _read(self, node_ids: List[str]) -> List[BaseNode]:
+        with self.lock:
+            index = self.index
+            entries = index["nodes"]
+            node_ids = [node_id for node_id in node_ids if node_id in entries]
+            missing = [node_id for node_id in node_ids if node_id not in self.cache]
+            if missing:
+                with open(self.index_path / index["blob"], "rb") as f:
+                    # Read in file order so the seeks only move forward
+                    for node_id in sorted(missing, key=lambda n: entries[n][0]):
+                        offset, length, digest = entries[node_id]
+                        f.seek(offset)
+                        self.cache[node_id] = (digest, json_to_doc(json.loads(f.read(length))))
+
+            nodes = []
+            for node_id in node_ids:
+                self.cache.move_to_end(node_id)
+                nodes.append(self.cache[node_id][1])
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return nodes
+
+
+class LazyNodeRetriever(BaseRetriever):
+    """
+    Retriever over a basic store's exports that never loads the docstore.
+    It follows the exports as the store is persisted, so it can be kept for
+    the life of a query engine.
+    """
+
+    def __init__(self, index_path: Union[str, Path], similarity_top_k: int = 10,
+                 cache_size: int = 256, block_rows: int = 16384, max_workers: int = 2,
+                 searcher: Optional[StreamingSearcher] = None, node_store: Optional[NodeBlobStore] = None):
+        """
+        Args:
+            searcher, node_store: Already open readers of the exports at
+                index_path to share, e.g. those of a warmed retriever
+        """
+        super().__init__()
+        self.similarity_top_k = similarity_top_k
+        self.searcher = searcher or StreamingSearcher(index_path, block_rows=block_rows, max_workers=max_workers)
+        self.node_store = node_store or NodeBlobStore(index_path, cache_size=cache_size)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        query_embedding = query_bundle.embedding
+        if query_embedding is None:
+            query_embedding = Settings.embed_model.get_query_embedding(query_bundle.query_str)
+
+        hits = self.searcher.query(query_embedding, self.similarity_top_k)
+        nodes = {node.node_id: node for node in self.node_store.get_many([node_id for node_id, _ in hits])}
+        return annotate_duplicates([NodeWithScore(node=nodes[node_id], score=score)
+                                    for node_id, score in hits if node_id in nodes], self.node_store.duplicates)
+
+
+def annotate_duplicates(hits: List[NodeWithScore], duplicates: Callable[[str], List[str]]) -> List[NodeWithScore]:
+    """
+    Add metadata['duplicates'], the paths of files with the same content, to
+    hits whose document has references. Annotated nodes are copies, so
+    cached nodes are left as they are.
+    """
+    annotated = []
+    for hit in hits:
+        paths = duplicates(hit.node.ref_doc_id) if hit.node.ref_doc_id else []
+        if paths:
+            node = hit.node.model_copy()
+            node.metadata = {**hit.node.metadata, "duplicates": list(paths)}
+            hit = NodeWithScore(node=node, score=hit.score)
+        annotated.append(hit)
+    return annotated
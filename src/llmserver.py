@@ -11,6 +11,8 @@ import vectorstore
 from codeStore import CodeStore
 import logging
 from embedding_model import init_embedding_model
+from code_chunker import init_node_parser
+from symbol_index import SymbolIndex
 
 # Load environment variables at module level
 load_dotenv(override=True)
@@ -30,8 +32,9 @@ class BaseServer:
         self.instructions = ""
         self._conversation_id = None
         
-        # Initialize embedding model
+        # Initialize embedding model and syntax-aware chunking
         init_embedding_model()
+        init_node_parser()
 
 
 class SimpleServer(BaseServer):
@@ -84,6 +87,8 @@ class LLMServer(BaseServer):
         self.vector_store_manager = vectorstore.getManager()
         self.path = path
         self.name = name
+        # Definitions in the queried store, consulted before retrieval
+        self.symbol_index = None
 
     def makeQueryEngine(self, config):
         try:
@@ -94,12 +99,13 @@ class LLMServer(BaseServer):
             instructions = config.get("instructions", "")
             model_name = config.get("model", self.models[0])
 
-            vector_store = self.vector_store_manager.get_vector_store(index_name)
-            if not vector_store:
+            if not self.vector_store_manager.vector_store_exists(index_name):
                 raise ValueError(f"Vector store '{index_name}' not found")
 
             Settings.llm = OpenAI(model=model_name, temperature=0)
-            retriever = VectorIndexRetriever(index=vector_store, similarity_top_k=30)
+            retriever = self.vector_store_manager.get_retriever(
+                index_name, similarity_top_k=30, expand_imports=config.get("expand_imports", False))
+            self.symbol_index = SymbolIndex.for_store(index_name)
             
             self.query_engine = RetrieverQueryEngine.from_args(
                 retriever,
@@ -117,6 +123,11 @@ class LLMServer(BaseServer):
         if not self.query_engine:
             raise ValueError("Query engine not initialized. Call makeQueryEngine first.")
 
+        # "Where is X defined?" is answered from the symbol index, without retrieval
+        answer = self.lookupSymbol(prompt)
+        if answer:
+            return answer
+
         full_prompt = f"{self.instructions}\n\n{prompt}" if self.instructions else prompt
         query_bundle = QueryBundle(query_str=full_prompt)
 
@@ -128,6 +139,19 @@ class LLMServer(BaseServer):
             logger.error(error_message)
             return error_message
 
+    def lookupSymbol(self, prompt):
+        """Answer a navigation question from the symbol index, or return None to fall back to RAG."""
+        if self.symbol_index is None:
+            return None
+        try:
+            answer = self.symbol_index.answer(prompt)
+        except Exception as e:
+            logger.warning(f"Symbol lookup failed: {e}")
+            return None
+        if answer:
+            logger.info(f"Answered from the symbol index: {prompt}")
+        return answer
+
 def makeServer(sio):
     """Factory function to create a server instance."""
     logger.info("Making LLMServer")
@@ -34,48 +34,89 @@ class Application:
             # Initialize vector store manager first
             import vectorstore
             vector_store_manager = vectorstore.getManager()
+            # Warm the query path of registered stores in the background while files are scanned
+            vector_store_manager.warm_up()
             store_exists = vector_store_manager.vector_store_exists("test_store")
             
             # Initialize CodeStore and process files
             from codeStore import CodeStore
-            code_store = CodeStore(".", "test_store")
-            
-            if store_exists:
-                last_update_time = vector_store_manager.get_store_timestamp("test_store")
-                if last_update_time > 0:
-                    # Only process files changed since last update
-                    documents = code_store.process_changed_files(last_update_time)
-                    if documents:
-                        print(f"Processing {len(documents)} changed files...")
-                        vector_store_manager.add_to_vector_store("test_store", documents)
-                    else:
-                        print("No files have changed since last update")
-                else:
-                    # Invalid timestamp, reprocess all
-                    print("Processing all project files...")
-                    documents = code_store.process_project()
-                    vector_store_manager.add_to_vector_store("test_store", documents)
-            else:
-                # Process all files for new store
-                print("Processing all project files...")
-                documents = code_store.process_project()
-                vector_store_manager.add_vector_store("test_store", "basic")
-                vector_store_manager.add_to_vector_store("test_store", documents)
-            
-            # Update store timestamp
-            vector_store_manager.update_store_timestamp("test_store")
-            
-            # Configure query engine
-            self.llm_server.makeQueryEngine({
+            from ingest_pipeline import IngestionPipeline
+            pinned_dirs = [d.strip() for d in os.environ.get('INDEX_PINNED_DIRS', '').split(',') if d.strip()]
+            code_store = CodeStore(".", "test_store", pinned_dirs=pinned_dirs)
+            self.code_store = code_store
+            self.vector_store_manager = vector_store_manager
+            self.query_config = {
                 "index": "test_store",
                 "instructions": "You are an AI assistant helping with code-related questions.",
-                "model": "gpt-3.5-turbo"
-            })
+                "model": "gpt-3.5-turbo",
+                "expand_imports": True
+            }
+
+            rebuild = store_exists and code_store.needs_rebuild()
+            if rebuild:
+                # Indexed by an older version: its documents cannot be updated in place
+                print("Store was built by an older version, rebuilding it...")
+                vector_store_manager.clear_vector_store("test_store")
+            last_update_time = vector_store_manager.get_store_timestamp("test_store") if store_exists else 0
+            if store_exists and last_update_time > 0 and not rebuild:
+                pipeline = IngestionPipeline(code_store, vector_store_manager, "test_store", persist_every=500,
+                                             on_publish=self._publish_store)
+                if code_store.has_checkpoint():
+                    print("Resuming an interrupted index from its last checkpoint...")
+                # Only process files changed since last update
+                changed_files = code_store.find_changed_files(last_update_time)
+                if code_store.removed_document_ids:
+                    print(f"Removing {len(code_store.removed_document_ids)} deleted or renamed files...")
+                    vector_store_manager.delete_from_vector_store("test_store", code_store.removed_document_ids)
+                if changed_files:
+                    print(f"Processing {len(changed_files)} changed files...")
+                    pipeline.run(code_store.prioritize(changed_files))
+                else:
+                    print("No files have changed since last update")
+                self._finish_indexing(pipeline)
+            else:
+                # New, rebuilt or invalid timestamp store: index everything in the background,
+                # most important files first, and answer queries once the first batch is in
+                if not store_exists:
+                    vector_store_manager.add_vector_store("test_store", "basic")
+                pipeline = IngestionPipeline(code_store, vector_store_manager, "test_store",
+                                             publish_first=200, persist_every=2000,
+                                             on_publish=self._publish_store)
+                threading.Thread(target=self._index_all, args=(pipeline,), name="initial-index",
+                                 daemon=True).start()
             print("Initialization complete")
             
         except Exception as e:
             print(f"Error initializing LLM server: {str(e)}")
             raise  # Re-raise the exception instead of falling back
+
+    def _index_all(self, pipeline):
+        """Index the whole project, publishing the store as batches land."""
+        try:
+            print("Processing all project files...")
+            pipeline.run(self.code_store.prioritize(self.code_store.plan_git_index()))
+            self._finish_indexing(pipeline)
+        except Exception as e:
+            print(f"Error indexing project files: {str(e)}")
+
+    def _publish_store(self, stats):
+        """Point the query engine at the store's latest persisted state."""
+        self.llm_server.makeQueryEngine(self.query_config)
+        print(f"Store published with {stats['documents']} documents, queries enabled")
+
+    def _finish_indexing(self, pipeline):
+        """Record what is indexed, start watching for changes and configure the query engine."""
+        # Update store timestamp and record what is now indexed
+        self.vector_store_manager.update_store_timestamp("test_store")
+        self.code_store.commit_manifest()
+
+        # Keep the index fresh while the monitor runs
+        self.code_store.start_watching(self.vector_store_manager, pipeline)
+
+        # Configure query engine
+        self.llm_server.makeQueryEngine(self.query_config)
+        print("Indexing complete")
+
     def run(self): 
         self.checkCallback()
         
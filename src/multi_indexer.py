@@ -0,0 +1,200 @@
+"""Index several projects at once, one worker process per project.
+
+Each project is ingested into its own vector store by a CodeStore and an
+IngestionPipeline running in a separate process, so parsing, chunking and
+embedding of different repositories proceed in parallel and total wall time
+approaches that of the slowest project. A shared CPU budget is divided
+between the processes for their reader, chunker and embedding threads.
+
+The parent process owns the vector store registry: it creates missing stores
+before starting the workers and records each store's timestamp as its worker
+finishes. Progress from every worker is printed as it arrives.
+
+Usage:
+    python multi_indexer.py ~/src/app:app ~/src/shared:shared --processes 4
+"""
+
+import os
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+
+_DONE = None
+
+
+def _init_worker(threads: int) -> None:
+    """
+    Limit a worker's native thread pools before torch is imported. Values
+    inherited from the parent's environment are overridden, since they were
+    not chosen for a share of the budget.
+    """
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+
+def split_budget(project_count: int, processes: Optional[int] = None,
+                 cpu_budget: Optional[int] = None) -> Tuple[int, int, int, int]:
+    """
+    Divide a CPU budget between worker processes.
+
+    Args:
+        project_count: Projects to index
+        processes: Worker processes wanted, by default one per project up to the budget
+        cpu_budget: Threads shared by all workers, by default the CPU count
+
+    Returns:
+        Tuple[int, int, int, int]: Worker processes, threads per process, and
+        each process's reader and chunker threads
+    """
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    processes = max(1, min(processes or cpu_budget, project_count))
+    threads = max(1, cpu_budget // processes)
+    return processes, threads, max(1, threads // 2), max(1, threads // 4)
+
+
+def _index_project(project_path: str, store_name: str, full: bool, read_workers: int,
+                   chunk_workers: int, progress_queue) -> Dict:
+    """Index one project into its store. Runs in a worker process."""
+    from codeStore import CodeStore
+    from ingest_pipeline import IngestionPipeline
+    import vectorstore
+
+    def report(stats: Dict) -> None:
+        progress_queue.put((store_name, stats))
+
+    # The parent owns the registry, so workers never write it
+    manager = vectorstore.VectorStoreManager(save_index=False)
+    code_store = CodeStore(project_path, store_name, read_workers=read_workers)
+    # Persisting every so often checkpoints progress, so an interrupted run resumes
+    pipeline = IngestionPipeline(code_store, manager, store_name, read_workers=read_workers,
+                                 chunk_workers=chunk_workers, progress=report, persist_every=1000)
+    try:
+        if code_store.needs_rebuild():
+            # New, or indexed by an older version: start from an empty store
+            manager.clear_vector_store(store_name)
+            full = True
+        if full:
+            stats = pipeline.run(code_store.plan_git_index())
+        else:
+            changed_files = code_store.find_changed_files(manager.get_store_timestamp(store_name))
+            if code_store.removed_document_ids:
+                manager.delete_from_vector_store(store_name, code_store.removed_document_ids)
+            stats = pipeline.run(changed_files)
+            stats["removed"] = len(code_store.removed_document_ids)
+        code_store.commit_manifest()
+        return stats
+    finally:
+        code_store.close()
+
+
+def _print_progress(progress_queue) -> None:
+    """Print worker progress until _DONE arrives."""
+    while True:
+        item = progress_queue.get()
+        if item is _DONE:
+            return
+        store_name, stats = item
+        rate = stats["documents"] / max(stats.get("elapsed", 0.0), 1e-6)
+        print(f"[{store_name}] {stats['documents']} documents, {stats['nodes']} nodes "
+              f"from {stats['files']} files ({rate:.0f} documents/s)")
+
+
+def index_projects(projects: Sequence[Tuple[str, str]], processes: Optional[int] = None,
+                   cpu_budget: Optional[int] = None, store_type: str = "basic") -> Dict[str, Dict]:
+    """
+    Index several projects concurrently, each into its own vector store.
+
+    Args:
+        projects: (project path, store name) pairs
+        processes: Worker processes, by default one per project up to the CPU count
+        cpu_budget: Threads shared by all workers for reading, chunking and
+            embedding, by default the CPU count
+        store_type: Type of store created for projects without one
+
+    Returns:
+        Dict[str, Dict]: Pipeline stats per store name, or {"error": message}
+        for projects that failed
+    """
+    from embedding_model import init_embedding_model
+    import vectorstore
+
+    processes, threads, read_workers, chunk_workers = split_budget(len(projects), processes, cpu_budget)
+
+    # Create missing stores here so workers only ever open existing ones
+    manager = vectorstore.VectorStoreManager()
+    full = {}
+    model_ready = False
+    for project_path, store_name in projects:
+        full[store_name] = not manager.vector_store_exists(store_name)
+        if full[store_name]:
+            if not model_ready:
+                init_embedding_model()
+                model_ready = True
+            manager.add_vector_store(store_name, store_type)
+
+    print(f"Indexing {len(projects)} projects with {processes} processes, {threads} threads each")
+    start = time.time()
+    results: Dict[str, Dict] = {}
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as sync_manager:
+        progress_queue = sync_manager.Queue()
+        printer = threading.Thread(target=_print_progress, args=(progress_queue,), daemon=True)
+        printer.start()
+
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=_init_worker, initargs=(threads,)) as pool:
+            futures = {
+                pool.submit(_index_project, str(project_path), store_name, full[store_name],
+                            read_workers, chunk_workers, progress_queue): store_name
+                for project_path, store_name in projects
+            }
+            for future in as_completed(futures):
+                store_name = futures[future]
+                try:
+                    results[store_name] = future.result()
+                    manager.update_store_timestamp(store_name)
+                    print(f"[{store_name}] done: {results[store_name]['documents']} documents "
+                          f"in {results[store_name]['elapsed']:.1f}s")
+                except Exception as e:
+                    logging.error(f"Indexing {store_name} failed: {e}")
+                    results[store_name] = {"error": str(e)}
+
+        progress_queue.put(_DONE)
+        printer.join()
+
+    print(f"Indexed {len(projects)} projects in {time.time() - start:.1f}s")
+    return results
+
+
+def parse_projects(specs: List[str]) -> List[Tuple[str, str]]:
+    """Parse 'path[:store]' arguments; the store name defaults to the directory name."""
+    projects = []
+    for spec in specs:
+        path, _, store_name = spec.rpartition(":") if ":" in spec else (spec, "", "")
+        path = os.path.abspath(os.path.expanduser(path))
+        projects.append((path, store_name or os.path.basename(path.rstrip(os.sep))))
+    store_names = [store_name for _, store_name in projects]
+    if len(set(store_names)) != len(store_names):
+        raise ValueError(f"Store names must be unique: {store_names}")
+    return projects
+
+
+def main():
+    """Index the projects given on the command line."""
+    parser = argparse.ArgumentParser(description="Index several projects concurrently")
+    parser.add_argument("projects", nargs="+", help="project path, optionally followed by :store_name")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--cpu-budget", type=int, default=None)
+    parser.add_argument("--store-type", default="basic")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    index_projects(parse_projects(args.projects), args.processes, args.cpu_budget, args.store_type)
+
+if __name__ == "__main__":
+    main()
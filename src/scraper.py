@@ -188,7 +188,10 @@ def save_to_vector_db(index, scraped_page):
         # Create a document with metadata including the URL and hash
         doc = Document(
             text=content,
-            metadata={"url": url, "hash": content_hash}
+            metadata={"url": url, "hash": content_hash},
+            # The hash is only for change detection; keep it out of embedded and LLM text
+            excluded_embed_metadata_keys=["hash"],
+            excluded_llm_metadata_keys=["hash"]
         )
         # Insert document into the index with the metadata
         index.insert(doc)
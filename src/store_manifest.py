@@ -0,0 +1,151 @@
+"""Checksummed manifests for persisted vector stores.
+
+A manifest records the size and per-chunk SHA-256 digests of every file in a
+store directory. A shallow check only stats the files, so it runs in
+milliseconds regardless of store size; a deep check re-hashes the chunks in
+parallel and compares digests. Rewriting a manifest only hashes the files
+whose size or mtime changed since the previous one.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+MANIFEST_FILE = "manifest.json"
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def _hash_chunk(path: Path, offset: int, length: int) -> str:
+    """Hash one chunk of a file."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def _hash_files(index_path: Path, sizes: Dict[str, int], chunk_size: int, max_workers: int) -> Dict[str, List[str]]:
+    """Hash every chunk of the given files on a thread pool."""
+    tasks: List[Tuple[str, int]] = []
+    for name, size in sizes.items():
+        tasks.extend((name, offset) for offset in range(0, size, chunk_size))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        digests = pool.map(lambda task: _hash_chunk(index_path / task[0], task[1], chunk_size), tasks)
+        chunks: Dict[str, List[str]] = {name: [] for name in sizes}
+        for (name, _), digest in zip(tasks, digests):
+            chunks[name].append(digest)
+    return chunks
+
+
+def _store_files(index_path: Path) -> Dict[str, os.stat_result]:
+    """List a store's files, relative to the store directory, with their stat results."""
+    stats = {}
+    for root, _, files in os.walk(index_path):
+        for file_name in files:
+            path = Path(root) / file_name
+            name = path.relative_to(index_path).as_posix()
+            if name == MANIFEST_FILE or name.endswith(".tmp"):
+                continue
+            stats[name] = path.stat()
+    return stats
+
+
+def _read_manifest(index_path: Path) -> Optional[Dict]:
+    """Load a store's manifest, or None if it is missing or unreadable."""
+    try:
+        with open(index_path / MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def write_manifest(index_path: Union[str, Path], chunk_size: int = CHUNK_SIZE, max_workers: int = 4) -> Dict:
+    """
+    Write a manifest describing the current contents of a store directory.
+    Files whose size and mtime match the previous manifest keep its digests.
+
+    Args:
+        index_path: Store directory
+        chunk_size: Bytes covered by each digest
+        max_workers: Threads used for hashing
+
+    Returns:
+        Dict: The manifest that was written
+    """
+    index_path = Path(index_path)
+    stats = _store_files(index_path)
+    previous = _read_manifest(index_path) or {}
+    previous_files = previous.get("files", {}) if previous.get("chunk_size") == chunk_size else {}
+
+    files = {}
+    for name, file_stats in stats.items():
+        entry = previous_files.get(name)
+        if entry and entry["size"] == file_stats.st_size and entry.get("mtime_ns") == file_stats.st_mtime_ns:
+            files[name] = entry
+    stale = {name: stats[name].st_size for name in stats if name not in files}
+    chunks = _hash_files(index_path, stale, chunk_size, max_workers)
+    for name, size in stale.items():
+        files[name] = {"size": size, "mtime_ns": stats[name].st_mtime_ns, "chunks": chunks[name]}
+    manifest = {
+        "created": time.time(),
+        "chunk_size": chunk_size,
+        "files": {name: files[name] for name in sorted(files)},
+    }
+
+    manifest_path = index_path / MANIFEST_FILE
+    with open(f"{manifest_path}.tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    logging.info(f"Wrote manifest for {len(files)} files ({len(stale)} hashed) at {manifest_path}")
+    return manifest
+
+
+def verify_manifest(index_path: Union[str, Path], deep: bool = False, max_workers: int = 4) -> Dict:
+    """
+    Check a store directory against its manifest.
+
+    Args:
+        index_path: Store directory
+        deep: Re-hash file contents instead of only comparing sizes
+        max_workers: Threads used for hashing in deep mode
+
+    Returns:
+        Dict: Report with 'ok' plus lists of missing, resized and corrupted files
+    """
+    index_path = Path(index_path)
+    report = {"ok": False, "deep": deep, "missing": [], "size_mismatch": [], "checksum_mismatch": []}
+
+    manifest_path = index_path / MANIFEST_FILE
+    if not manifest_path.exists():
+        report["error"] = "manifest not found"
+        return report
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except json.JSONDecodeError as e:
+        report["error"] = f"manifest unreadable: {e}"
+        return report
+
+    present = {}
+    for name, entry in manifest["files"].items():
+        try:
+            size = (index_path / name).stat().st_size
+        except FileNotFoundError:
+            report["missing"].append(name)
+            continue
+        if size != entry["size"]:
+            report["size_mismatch"].append(name)
+        else:
+            present[name] = size
+
+    if deep and present:
+        chunks = _hash_files(index_path, present, manifest["chunk_size"], max_workers)
+        report["checksum_mismatch"] = [name for name in present
+                                       if chunks[name] != manifest["files"][name]["chunks"]]
+
+    report["ok"] = not (report["missing"] or report["size_mismatch"] or report["checksum_mismatch"])
+    return report
@@ -0,0 +1,335 @@
+"""Out-of-core exact search over on-disk embedding files.
+
+Embeddings are exported next to a persisted store as a flat, row-major
+float32 matrix (one L2-normalised row per node) plus a newline-delimited id
+file. Queries walk the matrix in fixed-size blocks through ``np.memmap`` so
+memory stays bounded no matter how large the store is.
+
+The matrix and id files only ever grow: a persist appends the rows of new
+nodes and lists the rows of removed nodes as dead, and once dead rows pass
+COMPACT_FRACTION of the matrix the export is rewritten under a new
+generation of file names. The meta file, replaced last, names the files and
+how many of their rows are valid, so a reader never sees a matrix and id
+file that disagree. Searchers check the meta file before each query and
+reload it when a persist has replaced it.
+"""
+
+import os
+import re
+import json
+import heapq
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+# File names of generation 0, the layout written before exports were appended to
+EMBEDDINGS_FILE = "embeddings.f32"
+EMBEDDING_IDS_FILE = "embedding_ids.txt"
+EMBEDDING_META_FILE = "embeddings_meta.json"
+# Dead rows, as a fraction of all rows, above which the export is rewritten
+COMPACT_FRACTION = 0.25
+
+_EXPORT_FILE = re.compile(r"^(embeddings\.f32|embedding_ids\.txt|embeddings(_dead)?-\d+\.(f32|npy)|embedding_ids-\d+\.txt)$")
+
+
+def embedding_file_exists(index_path: Union[str, Path]) -> bool:
+    """Check whether an embedding export exists for a store."""
+    return (Path(index_path) / EMBEDDING_META_FILE).exists()
+
+
+def read_embedding_meta(index_path: Union[str, Path]) -> Optional[Dict]:
+    """
+    Load an export's meta file, or None if there is no export. Exports
+    written before generations existed get the file names they used.
+    """
+    meta_path = Path(index_path) / EMBEDDING_META_FILE
+    if not meta_path.exists():
+        return None
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    meta.setdefault("generation", 0)
+    meta.setdefault("version", 0)
+    meta.setdefault("matrix", EMBEDDINGS_FILE)
+    meta.setdefault("ids", EMBEDDING_IDS_FILE)
+    meta.setdefault("dead", None)
+    meta.setdefault("live", meta["count"])
+    return meta
+
+
+def read_dead_rows(index_path: Union[str, Path], meta: Dict) -> np.ndarray:
+    """Sorted row numbers of removed nodes in an export."""
+    if not meta.get("dead"):
+        return np.zeros(0, dtype=np.int64)
+    return np.load(Path(index_path) / meta["dead"])
+
+
+def write_embedding_file(index_path: Union[str, Path], embedding_dict: Dict[str, Sequence[float]]) -> int:
+    """
+    Bring the export in line with a store's embeddings.
+
+    Rows are normalised on write so a query is a plain dot product. Rows of
+    nodes already exported are kept, since a node id always names the same
+    text; only new nodes are appended and removed ones marked dead. The
+    export is rewritten when there is no appendable export yet, the
+    dimension changed, or too many rows are dead.
+
+    Args:
+        index_path: Store directory to write into
+        embedding_dict: Mapping of node id to embedding
+
+    Returns:
+        int: Number of live rows in the export
+    """
+    index_path = Path(index_path)
+    index_path.mkdir(parents=True, exist_ok=True)
+    meta = read_embedding_meta(index_path)
+
+    if meta is not None and "ids_bytes" in meta:
+        rows = _read_ids(index_path / meta["ids"], meta["ids_bytes"])
+        previous_dead = set(read_dead_rows(index_path, meta).tolist())
+        live = {node_id: row for row, node_id in enumerate(rows) if row not in previous_dead}
+        added = [node_id for node_id in embedding_dict if node_id not in live]
+        dead = previous_dead | {row for node_id, row in live.items() if node_id not in embedding_dict}
+        if not added and dead == previous_dead:
+            return meta["live"]
+        same_dim = not added or meta["dim"] in (0, len(embedding_dict[added[0]]))
+        if meta["count"] and same_dim and len(dead) <= COMPACT_FRACTION * (len(rows) + len(added)):
+            return _append_rows(index_path, meta, embedding_dict, added, dead, dead != previous_dead)
+
+    return _rewrite(index_path, meta, embedding_dict)
+
+
+def _normalized_row(node_id: str, embedding: Sequence[float], dim: int) -> np.ndarray:
+    row = np.asarray(embedding, dtype=np.float32)
+    if dim and row.shape[0] != dim:
+        raise ValueError(f"Embedding for node {node_id} has dimension {row.shape[0]}, expected {dim}")
+    norm = np.linalg.norm(row)
+    return row / norm if norm > 0 else row
+
+
+def _read_ids(ids_path: Path, ids_bytes: int) -> List[str]:
+    """Node id of each row, from the valid part of an id file."""
+    with open(ids_path, "rb") as f:
+        return f.read(ids_bytes).decode("utf-8").split("\n")[:-1]
+
+
+def _append_rows(index_path: Path, meta: Dict, embedding_dict: Dict[str, Sequence[float]],
+                 added: List[str], dead: Set[int], dead_changed: bool) -> int:
+    """Append new rows to the current generation's files and publish them with the dead rows."""
+    dim = meta["dim"] or (len(embedding_dict[added[0]]) if added else 0)
+    count = meta["count"]
+    with open(index_path / meta["matrix"], "r+b") as matrix_file, open(index_path / meta["ids"], "r+b") as ids_file:
+        # Drop anything a failed write left past the valid rows
+        matrix_file.truncate(count * dim * 4)
+        ids_file.truncate(meta["ids_bytes"])
+        matrix_file.seek(0, os.SEEK_END)
+        ids_file.seek(0, os.SEEK_END)
+        for node_id in added:
+            matrix_file.write(_normalized_row(node_id, embedding_dict[node_id], dim).tobytes())
+            ids_file.write(f"{node_id}\n".encode("utf-8"))
+        ids_bytes = ids_file.tell()
+
+    version = meta["version"] + 1
+    dead_file = meta["dead"]
+    if dead_changed:
+        dead_file = f"embeddings_dead-{version}.npy"
+        np.save(index_path / dead_file, np.array(sorted(dead), dtype=np.int64))
+    new_meta = dict(meta, version=version, count=count + len(added), dim=dim,
+                    live=count + len(added) - len(dead), ids_bytes=ids_bytes, dead=dead_file)
+    _publish(index_path, new_meta, previous=meta)
+    logging.info(f"Appended {len(added)} embeddings to {index_path / meta['matrix']} "
+                 f"({len(dead)} dead rows of {new_meta['count']})")
+    return new_meta["live"]
+
+
+def _rewrite(index_path: Path, meta: Optional[Dict], embedding_dict: Dict[str, Sequence[float]]) -> int:
+    """Write every embedding under a new generation of file names and publish it."""
+    generation = (meta["generation"] if meta else 0) + 1
+    version = (meta["version"] if meta else 0) + 1
+    matrix_name = f"embeddings-{generation}.f32"
+    ids_name = f"embedding_ids-{generation}.txt"
+
+    dim = 0
+    count = 0
+    with open(index_path / matrix_name, "wb") as matrix_file, open(index_path / ids_name, "wb") as ids_file:
+        for node_id, embedding in embedding_dict.items():
+            row = _normalized_row(node_id, embedding, dim)
+            dim = dim or row.shape[0]
+            matrix_file.write(row.tobytes())
+            ids_file.write(f"{node_id}\n".encode("utf-8"))
+            count += 1
+        ids_bytes = ids_file.tell()
+
+    new_meta = {"count": count, "live": count, "dim": dim, "dtype": "float32", "normalized": True,
+                "generation": generation, "version": version, "matrix": matrix_name, "ids": ids_name,
+                "ids_bytes": ids_bytes, "dead": None}
+    _publish(index_path, new_meta, previous=meta)
+    logging.info(f"Exported {count} embeddings to {index_path / matrix_name}")
+    return count
+
+
+def _publish(index_path: Path, meta: Dict, previous: Optional[Dict]) -> None:
+    """
+    Atomically replace the meta file, then delete export files that neither
+    it nor the previous meta use. Readers that loaded the previous meta can
+    still open its files.
+    """
+    meta_path = index_path / EMBEDDING_META_FILE
+    with open(f"{meta_path}.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+    keep = {meta["matrix"], meta["ids"], meta["dead"]}
+    if previous is not None:
+        keep |= {previous["matrix"], previous["ids"], previous["dead"]}
+    for path in index_path.iterdir():
+        if _EXPORT_FILE.match(path.name) and path.name not in keep:
+            try:
+                path.unlink()
+            except OSError as e:
+                logging.warning(f"Could not remove old export file {path}: {e}")
+
+
+class StreamingSearcher:
+    """Exact top-k cosine search over an embedding export, one block at a time."""
+
+    def __init__(self, index_path: Union[str, Path], block_rows: int = 16384, max_workers: int = 2):
+        self.index_path = Path(index_path)
+        self.block_rows = block_rows
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.meta_stamp: Optional[Tuple[int, int, int]] = None
+        if not self.refresh():
+            raise FileNotFoundError(f"No embedding export found at {self.index_path}")
+
+    def refresh(self) -> bool:
+        """
+        Reload the export if a persist replaced its meta file since it was read.
+
+        Returns:
+            bool: False if there is no export at all
+        """
+        try:
+            stats = (self.index_path / EMBEDDING_META_FILE).stat()
+        except FileNotFoundError:
+            return False
+        stamp = (stats.st_ino, stats.st_mtime_ns, stats.st_size)
+        with self.lock:
+            if stamp != self.meta_stamp:
+                self._load()
+                self.meta_stamp = stamp
+        return True
+
+    def _load(self) -> None:
+        """Read the export's meta file and dead rows, checking the matrix holds every row it lists."""
+        meta = read_embedding_meta(self.index_path)
+        if meta is None:
+            raise FileNotFoundError(f"No embedding export found at {self.index_path}")
+        matrix_path = self.index_path / meta["matrix"]
+        expected = meta["count"] * meta["dim"] * 4
+        size = matrix_path.stat().st_size if matrix_path.exists() else 0
+        if size < expected:
+            raise ValueError(f"Embedding export at {self.index_path} is incomplete: "
+                             f"{matrix_path.name} has {size} bytes, meta lists {expected}")
+        self.meta = meta
+        self.dead = read_dead_rows(self.index_path, meta)
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+
+    def query(self, query_embedding: Sequence[float], top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Find the top_k most similar nodes to a query embedding.
+
+        Blocks are read on a thread pool, at most max_workers ahead of the block
+        being scored, so disk reads overlap the matmul while resident memory
+        stays at roughly (max_workers + 1) * block_rows * dim * 4 bytes.
+
+        Args:
+            query_embedding: Query vector with the same dimension as the store
+            top_k: Number of results to return
+
+        Returns:
+            List[Tuple[str, float]]: (node_id, score) pairs, best first
+        """
+        self.refresh()
+        try:
+            return self._search(query_embedding, top_k)
+        except FileNotFoundError:
+            # The export was compacted away between loading its meta and reading it
+            self.refresh()
+            return self._search(query_embedding, top_k)
+
+    def _search(self, query_embedding: Sequence[float], top_k: int) -> List[Tuple[str, float]]:
+        # A consistent view of the export, even if it is reloaded meanwhile
+        with self.lock:
+            meta, dead, count, dim = self.meta, self.dead, self.count, self.dim
+        if count == 0 or top_k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape[0] != dim:
+            raise ValueError(f"Query has dimension {query.shape[0]}, store has {dim}")
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        matrix = np.memmap(self.index_path / meta["matrix"], dtype=np.float32, mode="r", shape=(count, dim))
+        heap: List[Tuple[float, int]] = []  # min-heap of (score, row)
+        starts = iter(range(0, count, self.block_rows))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = deque()
+            for _ in range(self.max_workers):
+                start = next(starts, None)
+                if start is None:
+                    break
+                pending.append(pool.submit(self._read_block, matrix, start))
+
+            while pending:
+                start, block = pending.popleft().result()
+                next_start = next(starts, None)
+                if next_start is not None:
+                    pending.append(pool.submit(self._read_block, matrix, next_start))
+
+                scores = block @ query
+                # Rows of removed nodes can never be returned
+                first, last = np.searchsorted(dead, [start, start + scores.shape[0]])
+                scores[dead[first:last] - start] = -np.inf
+                k = min(top_k, scores.shape[0])
+                candidates = np.argpartition(-scores, k - 1)[:k]
+                for i in candidates:
+                    if scores[i] == -np.inf:
+                        continue
+                    item = (float(scores[i]), start + int(i))
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, item)
+                    elif item[0] > heap[0][0]:
+                        heapq.heapreplace(heap, item)
+
+        del matrix
+        best = sorted(heap, reverse=True)
+        if not best:
+            return []
+        ids = self._resolve_ids(meta, {row for _, row in best})
+        return [(ids[row], score) for score, row in best]
+
+    def _read_block(self, matrix: np.memmap, start: int) -> Tuple[int, np.ndarray]:
+        """Copy one block out of the memmap, forcing the read on a worker thread."""
+        return start, np.array(matrix[start:start + self.block_rows])
+
+    def _resolve_ids(self, meta: Dict, rows: set) -> Dict[int, str]:
+        """Map row numbers to node ids by streaming the id file."""
+        ids = {}
+        last_row = max(rows)
+        with open(self.index_path / meta["ids"], "r", encoding="utf-8", newline="\n") as f:
+            for row, line in enumerate(f):
+                if row in rows:
+                    ids[row] = line.rstrip("\n")
+                if row >= last_row:
+                    break
+        return ids
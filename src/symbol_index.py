@@ -0,0 +1,256 @@
+"""Persistent table of symbol definitions for instant "where is X" answers.
+
+While a store is ingested, CodeStore extracts the definitions in each source
+file: Python through `ast`, and TypeScript/JavaScript through a line scanner
+for declarations. The table maps every name to the files, lines and kinds
+that define it and is saved beside the file manifest, so navigation questions
+can be answered from it without embedding or retrieval.
+"""
+
+import os
+import re
+import ast
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from code_chunker import PYTHON_EXTENSIONS, SCRIPT_EXTENSIONS
+
+DEFAULT_SYMBOLS_DIR = "vector_stores/symbols"
+
+# Declarations in TS/JS. Variables only count at the top level; functions,
+# classes and types may be nested or indented inside a namespace.
+_SCRIPT_DECLARATION = re.compile(
+    r'^(?P<indent>\s*)(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?'
+    r'(?P<keyword>function\*?|class|interface|type|enum|const|let|var|namespace)\s+(?P<name>[A-Za-z_$][\w$]*)'
+    r'(?P<rest>.*)$'
+)
+# Methods inside a class body: name(args) { or name(args): Type {
+_SCRIPT_METHOD = re.compile(
+    r'^(?P<indent>\s+)(?:(?:public|private|protected|static|readonly|override|async|get|set)\s+)*'
+    r'(?P<name>[A-Za-z_$][\w$]*)\s*(?:<[^>]*>)?\s*\([^)]*\)\s*(?::[^{;]*)?\{\s*$'
+)
+_ARROW_FUNCTION = re.compile(r'^\s*(?::[^=]*)?=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*(?::[^=]*)?=>|[\w$]+\s*=>)')
+_NOT_METHODS = {'if', 'for', 'while', 'switch', 'catch', 'function', 'return', 'with', 'constructor'}
+
+# Questions that only ask where something is defined
+_NAVIGATION_QUESTION = re.compile(
+    r"^\s*(?:where\s+(?:is|are)|where's|find|locate|show\s+me|go\s+to|jump\s+to|"
+    r"which\s+file\s+(?:defines|declares|contains|has))\s+"
+    r"(?:the\s+)?(?:(?:definition|declaration|source)\s+(?:of|for)\s+)?(?:the\s+)?"
+    r"(?:(?:function|class|method|type|interface|enum|variable|constant|const|symbol)\s+)?"
+    r"[`'\"]?(?P<name>[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*)(?:\(\))?[`'\"]?"
+    r"(?:\s+(?:function|class|method|type|interface|enum|variable|constant|symbol))?"
+    r"(?:\s+(?:is\s+|are\s+|being\s+)?(?:defined|declared|implemented|located|written))?"
+    r"(?:\s+in\s+(?:the\s+)?(?:code(?:base)?|project|repo(?:sitory)?))?\s*[?.!]*\s*$",
+    re.IGNORECASE,
+)
+
+
+def _symbol(name: str, qualified: str, kind: str, line: int) -> Dict:
+    return {'name': name, 'qualified': qualified, 'kind': kind, 'line': line}
+
+
+def python_symbols(text: str) -> List[Dict]:
+    """Functions, classes, methods and module-level variables defined in Python source."""
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return []
+
+    symbols = []
+
+    def visit(body: List[ast.stmt], prefix: str, in_class: bool) -> None:
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                symbols.append(_symbol(node.name, prefix + node.name, 'method' if in_class else 'function',
+                                       node.lineno))
+                visit(node.body, f"{prefix}{node.name}.", False)
+            elif isinstance(node, ast.ClassDef):
+                symbols.append(_symbol(node.name, prefix + node.name, 'class', node.lineno))
+                visit(node.body, f"{prefix}{node.name}.", True)
+            elif not prefix and isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        kind = 'constant' if target.id.isupper() else 'variable'
+                        symbols.append(_symbol(target.id, target.id, kind, node.lineno))
+
+    visit(tree.body, '', False)
+    return symbols
+
+
+def script_symbols(text: str) -> List[Dict]:
+    """Declarations and class methods in TypeScript/JavaScript source, found line by line."""
+    symbols = []
+    # (indent, name) of the class whose body is being scanned
+    current_class: Optional[tuple] = None
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        indent = len(line) - len(line.lstrip())
+        if current_class is not None and indent <= current_class[0] and line.strip() != '}':
+            current_class = None
+
+        match = _SCRIPT_DECLARATION.match(line)
+        if match:
+            keyword, name = match.group('keyword').rstrip('*'), match.group('name')
+            if keyword in ('const', 'let', 'var'):
+                if indent:
+                    continue
+                kind = 'function' if _ARROW_FUNCTION.match(match.group('rest')) else 'variable'
+            else:
+                kind = keyword
+            symbols.append(_symbol(name, name, kind, number))
+            if keyword == 'class':
+                current_class = (indent, name)
+            continue
+
+        if current_class is not None:
+            match = _SCRIPT_METHOD.match(line)
+            if match and match.group('name') not in _NOT_METHODS:
+                name = match.group('name')
+                symbols.append(_symbol(name, f"{current_class[1]}.{name}", 'method', number))
+    return symbols
+
+
+def extract_symbols(text: str, file_type: str) -> List[Dict]:
+    """Symbols defined in a source file, or [] for unsupported file types."""
+    if file_type in PYTHON_EXTENSIONS:
+        return python_symbols(text)
+    if file_type in SCRIPT_EXTENSIONS:
+        return script_symbols(text)
+    return []
+
+
+def navigation_target(question: str) -> Optional[str]:
+    """The name asked about if question only asks where something is defined, else None."""
+    match = _NAVIGATION_QUESTION.match(question)
+    return match.group('name') if match else None
+
+
+class SymbolIndex:
+    """Project-relative path -> symbols defined in it, with a name -> definitions lookup."""
+
+    def __init__(self, index_path: Union[str, Path]):
+        self.index_path = Path(index_path)
+        self.files: Dict[str, List[Dict]] = {}
+        self.by_name: Dict[str, List[Dict]] = {}
+        self.by_lower_name: Dict[str, List[Dict]] = {}
+        self.loaded_mtime: Optional[float] = None
+        self.lock = threading.Lock()
+        self.load()
+
+    @classmethod
+    def for_store(cls, store_name: str, symbols_dir: Union[str, Path] = DEFAULT_SYMBOLS_DIR) -> "SymbolIndex":
+        """Open the symbol index saved for a vector store."""
+        return cls(Path(symbols_dir) / f"{store_name}.json")
+
+    def exists(self) -> bool:
+        """Check whether the index has been saved before."""
+        return self.index_path.exists()
+
+    def load(self) -> None:
+        """Load the saved index, starting empty if the file is missing or corrupt."""
+        files = {}
+        mtime = None
+        if self.index_path.exists():
+            try:
+                mtime = self.index_path.stat().st_mtime
+                with open(self.index_path, "r") as f:
+                    files = json.load(f).get("files", {})
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"Ignoring corrupt symbol index at {self.index_path}: {e}")
+                files = {}
+        with self.lock:
+            self.files = files
+            self.loaded_mtime = mtime
+            self._rebuild_lookup()
+
+    def refresh(self) -> None:
+        """Reload the index if another process or CodeStore saved it since it was loaded."""
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except OSError:
+            return
+        if mtime != self.loaded_mtime:
+            self.load()
+
+    def save(self) -> None:
+        """Atomically write the index."""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            with open(f"{self.index_path}.tmp", "w") as f:
+                json.dump({"version": 1, "files": self.files}, f)
+            os.replace(f"{self.index_path}.tmp", self.index_path)
+            self.loaded_mtime = self.index_path.stat().st_mtime
+
+    def update(self, symbols_by_file: Dict[str, List[Dict]], keep: Optional[set] = None) -> bool:
+        """
+        Replace the symbols of the given files.
+
+        Args:
+            symbols_by_file: Relative path -> symbols, for files read in this run
+            keep: If given, every other file not in this set is dropped
+
+        Returns:
+            bool: Whether any file's symbols changed, i.e. the index needs saving
+        """
+        with self.lock:
+            files = self.files
+            if keep is not None:
+                files = {path: symbols for path, symbols in files.items() if path in keep}
+            files = {**files, **symbols_by_file}
+            if files == self.files:
+                return False
+            self.files = files
+            self._rebuild_lookup()
+            return True
+
+    def lookup(self, name: str) -> List[Dict]:
+        """
+        Definitions of a name, matched against plain and qualified names
+        ("method" or "Class.method"), falling back to a case-insensitive match.
+
+        Returns:
+            List[Dict]: {'path', 'line', 'kind', 'qualified'} for each definition
+        """
+        with self.lock:
+            matches = self.by_name.get(name) or self.by_lower_name.get(name.lower(), [])
+            return sorted(matches, key=lambda match: (match['path'], match['line']))
+
+    def answer(self, question: str) -> Optional[str]:
+        """
+        Answer a "where is X defined" question from the index.
+
+        Returns:
+            Optional[str]: The definitions found, or None if the question is
+            not a navigation question or the name is not in the index
+        """
+        name = navigation_target(question)
+        if not name:
+            return None
+        self.refresh()
+        matches = self.lookup(name)
+        if not matches:
+            return None
+        lines = [f"`{name}` is defined in:"]
+        lines += [f"- {match['path']}:{match['line']} ({match['kind']} {match['qualified']})" for match in matches]
+        return "\n".join(lines)
+
+    def _rebuild_lookup(self) -> None:
+        """Index definitions by plain and qualified name, as written and lower-cased. Caller holds the lock."""
+        by_name: Dict[str, List[Dict]] = {}
+        by_lower_name: Dict[str, List[Dict]] = {}
+        for path, symbols in self.files.items():
+            for symbol in symbols:
+                definition = {'path': path, 'line': symbol['line'], 'kind': symbol['kind'],
+                              'qualified': symbol['qualified']}
+                for key in {symbol['name'], symbol['qualified']}:
+                    by_name.setdefault(key, []).append(definition)
+                for key in {symbol['name'].lower(), symbol['qualified'].lower()}:
+                    by_lower_name.setdefault(key, []).append(definition)
+        self.by_name = by_name
+        self.by_lower_name = by_lower_name
@@ -0,0 +1,101 @@
+import unittest
+import sys
+import io
+import tarfile
+import zipfile
+import tempfile
+from pathlib import Path
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from archive_source import ArchiveSource, archive_kind, is_archive, member_path
+
+FILES = {'pkg/a.py': b'def a():\n    return 1\n', 'README.md': b'# Project\n'}
+
+class TestArchiveSource(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_dir = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _zip(self) -> Path:
+        path = self.test_dir / 'project.zip'
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('pkg/', '')
+            for name, data in FILES.items():
+                archive.writestr(name, data)
+        return path
+
+    def _tar(self, name: str, mode: str) -> Path:
+        path = self.test_dir / name
+        with tarfile.open(path, mode) as archive:
+            for member, data in FILES.items():
+                info = tarfile.TarInfo(f"./{member}")
+                info.size = len(data)
+                info.mtime = 1700000000
+                archive.addfile(info, io.BytesIO(data))
+            link = tarfile.TarInfo('./link.py')
+            link.type = tarfile.SYMTYPE
+            link.linkname = 'pkg/a.py'
+            archive.addfile(link)
+        return path
+
+    def test_archive_kind(self):
+        """Test that archive formats are recognised by their suffixes"""
+        self.assertEqual(archive_kind('src.tar.gz'), 'tar.gz')
+        self.assertEqual(archive_kind('src.TGZ'), 'tar.gz')
+        self.assertEqual(archive_kind('src.tar.zst'), 'tar.zst')
+        self.assertEqual(archive_kind('src.zip'), 'zip')
+        self.assertIsNone(archive_kind('src.gz'))
+        self.assertFalse(is_archive(self.test_dir / 'missing.zip'))
+
+    def test_member_path(self):
+        """Test that member names are made relative and names leaving the root are dropped"""
+        self.assertEqual(member_path('./pkg/a.py'), 'pkg/a.py')
+        self.assertEqual(member_path('/pkg//a.py'), 'pkg/a.py')
+        self.assertIsNone(member_path('../outside.py'))
+        self.assertIsNone(member_path('./'))
+
+    def test_stream_zip(self):
+        """Test that zip members stream without directories and can be read one at a time"""
+        source = ArchiveSource(self._zip())
+        self.assertTrue(source.random_access)
+        streamed = {member.name: read() for member, read in source.members()}
+        self.assertEqual(streamed, FILES)
+        self.assertEqual(source.read('pkg/a.py'), FILES['pkg/a.py'])
+        self.assertIsNone(source.read('missing.py'))
+        source.close()
+
+    def test_stream_tar(self):
+        """Test that plain and gzipped tar members stream as regular files only"""
+        for name, mode in (('project.tar', 'w'), ('project.tar.gz', 'w:gz')):
+            source = ArchiveSource(self._tar(name, mode))
+            self.assertEqual(source.stem, 'project')
+            members = []
+            for member, read in source.members():
+                members.append((member.name, member.size, read()))
+            self.assertEqual(members, [(member, len(data), data) for member, data in FILES.items()])
+            self.assertEqual(source.read('README.md'), FILES['README.md'])
+            source.close()
+
+    def test_skipped_members_are_not_read(self):
+        """Test that a compressed stream can skip members without reading them"""
+        source = ArchiveSource(self._tar('project.tgz', 'w:gz'))
+        self.assertFalse(source.random_access)
+        streamed = {member.name: read() for member, read in source.members() if member.name.endswith('.md')}
+        self.assertEqual(streamed, {'README.md': FILES['README.md']})
+
+    def test_member_stat_result(self):
+        """Test that members get a stat result with their size and mtime"""
+        source = ArchiveSource(self._tar('project.tar', 'w'))
+        member, _ = next(source.members())
+        stats = member.stat_result()
+        self.assertEqual(stats.st_size, len(FILES['pkg/a.py']))
+        self.assertEqual(stats.st_mtime, 1700000000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llama_index.core import Document
+from llama_index.core.node_parser import SentenceSplitter
+from code_chunker import CodeChunkParser, assign_chunk_ids, python_spans, script_spans, source_spans
+
+PYTHON_SOURCE = '''import os
+
+CONSTANT = 1
+
+
+def first():
+    return 1
+
+
+@decorator
+class Second:
+    def method(self):
+        return 2
+'''
+
+SCRIPT_SOURCE = '''import { x } from './x';
+
+// Adds numbers
+export function add(a: number, b: number) {
+  const inner = () => a;
+  return a + b;
+}
+
+export const value = 3;
+'''
+
+class TestCodeChunker(unittest.TestCase):
+
+    def _ranges(self, spans):
+        return [(span['symbol'], span['start_line'], span['end_line']) for span in spans]
+
+    def test_python_spans(self):
+        """Test that Python splits on top-level definitions and covers every line"""
+        spans = python_spans(PYTHON_SOURCE)
+        self.assertEqual(self._ranges(spans), [(None, 1, 3), ('first', 4, 7), ('Second', 8, 13)])
+        self.assertEqual(spans[2]['kind'], 'class')
+
+    def test_large_python_class_splits_into_methods(self):
+        """Test that an oversized class is split per method"""
+        spans = python_spans(PYTHON_SOURCE, max_chars=10)
+        self.assertIn('Second.method', [span['symbol'] for span in spans])
+
+    def test_python_syntax_error(self):
+        """Test that unparseable Python falls back"""
+        self.assertIsNone(python_spans("def broken(:\n"))
+
+    def test_script_spans(self):
+        """Test that TS/JS splits on top-level declarations, keeping leading comments"""
+        spans = script_spans(SCRIPT_SOURCE)
+        self.assertEqual(self._ranges(spans), [(None, 1, 1), ('add', 2, 7), ('value', 8, 9)])
+
+    def test_unsupported_type(self):
+        """Test that other file types are left to the generic splitter"""
+        self.assertIsNone(source_spans("# Title\n", ".md"))
+
+    def test_chunk_ids_follow_text(self):
+        """Test that unchanged chunks keep their ids when lines are added above them"""
+        parser = CodeChunkParser(max_chars=40)
+        def chunk_ids(text):
+            doc = Document(id_='a.py', text=text, metadata={'file_type': '.py'})
+            return [node.node_id for node in assign_chunk_ids(doc.doc_id, parser.get_nodes_from_documents([doc]))]
+
+        before = chunk_ids(PYTHON_SOURCE)
+        after = chunk_ids('import sys\n' + PYTHON_SOURCE)
+        self.assertEqual(len(set(before)), len(before))
+        self.assertEqual(before[1:], after[1:])
+        self.assertNotEqual(before[0], after[0])
+
+    def test_split_span_pieces_get_their_own_lines(self):
+        """Test that pieces of an oversized span carry the lines they come from"""
+        body = ''.join(f"    value_{i} = {i}  # padding to make the line longer\n" for i in range(200))
+        text = 'import os\n\n' + 'def big():\n' + body + '    return value_0\n'
+        parser = CodeChunkParser(max_chars=2000, fallback=SentenceSplitter(chunk_size=200, chunk_overlap=20))
+        doc = Document(id_='a.py', text=text, metadata={'file_type': '.py'})
+        chunks = [node for node in parser.get_nodes_from_documents([doc]) if node.metadata['symbols'] == 'big']
+        self.assertGreater(len(chunks), 1)
+        lines = text.splitlines()
+        for chunk in chunks:
+            start, end = chunk.metadata['start_line'], chunk.metadata['end_line']
+            content = chunk.get_content().splitlines()
+            self.assertIn(chunk.get_content(), '\n'.join(lines[start - 1:end]))
+            self.assertIn(content[0], lines[start - 1])
+            self.assertIn(content[-1], lines[end - 1])
+        self.assertEqual(chunks[0].metadata['start_line'], 3)
+        self.assertEqual(chunks[-1].metadata['end_line'], len(lines))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,472 @@
+import unittest
+import io
+import os
+import sys
+import time
+import tarfile
+import zipfile
+import tempfile
+import subprocess
+import importlib.util
+from pathlib import Path
+from unittest import mock
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import codeStore
+from codeStore import CodeStore
+from code_chunker import CodeChunkParser
+from file_manifest import hash_file
+from llama_index.core.schema import MetadataMode
+
+class RecordingPipeline:
+    """Stands in for an IngestionPipeline, recording the files of each run."""
+
+    def __init__(self):
+        self.runs = []
+
+    def run(self, files):
+        self.runs.append(sorted(path.name for path, _ in files))
+
+class ReadingPipeline(RecordingPipeline):
+    """A RecordingPipeline that also reads and records the files, as a real run would."""
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def run(self, files):
+        files = list(files)
+        super().run(files)
+        for path, stats, doc, content_hash in self.store._read_documents(files):
+            if doc is not None:
+                self.store.record_file(path, stats, content_hash)
+
+class RecordingManager:
+    """Stands in for a VectorStoreManager, recording deletions."""
+
+    def __init__(self):
+        self.deleted = []
+
+    def delete_from_vector_store(self, name, ref_doc_ids):
+        self.deleted.append(sorted(ref_doc_ids))
+
+    def update_store_timestamp(self, name):
+        pass
+
+class CodeStoreTestCase(unittest.TestCase):
+    """Creates a project directory and a CodeStore whose state lives beside it."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base = Path(self.temp_dir.name).resolve()
+        self.project = self.base / 'project'
+        self.project.mkdir()
+        (self.project / '.gitignore').write_text('')
+        patcher = mock.patch.object(codeStore, 'init_embedding_model')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_store(self, project=None, **kwargs) -> CodeStore:
+        store = CodeStore(str(project or self.project), 'test', manifest_dir=str(self.base / 'manifests'),
+                          symbols_dir=str(self.base / 'symbols'), imports_dir=str(self.base / 'imports'), **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def write(self, relative_path: str, text: str) -> Path:
+        path = self.project / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        return path
+
+    def index_all(self, store: CodeStore, duplicates=None) -> None:
+        """Record every file as indexed, as a successful full run would."""
+        duplicates = duplicates or {}
+        for path, stats in store.plan_full_index():
+            owner = duplicates.get(path.name)
+            store.record_file(path, stats, hash_file(path), duplicate_of=str(self.project / owner) if owner else None)
+        store.commit_manifest()
+
+class TestPlanChanges(CodeStoreTestCase):
+
+    def test_modified_and_touched_files(self):
+        """Test that only files whose contents changed are planned"""
+        self.write('a.py', 'a = 1\n')
+        touched = self.write('b.py', 'b = 1\n')
+        store = self.make_store()
+        self.index_all(store)
+
+        modified = self.write('a.py', 'a = 2\n')
+        touched.write_text('b = 1\n')
+        changed = store.plan_changes([modified, touched])
+        self.assertEqual([path for path, _ in changed], [modified])
+        self.assertEqual(store.removed_document_ids, [])
+        # The touched file's new mtime is recorded, so it is not hashed again
+        self.assertEqual(store.pending_manifest['b.py']['mtime'], touched.stat().st_mtime)
+
+    def test_removed_file_and_directory(self):
+        """Test that deleted files and everything below a deleted directory are removed"""
+        self.write('a.py', 'a = 1\n')
+        self.write('pkg/b.py', 'b = 1\n')
+        self.write('pkg/sub/c.py', 'c = 1\n')
+        store = self.make_store()
+        self.index_all(store)
+
+        (self.project / 'a.py').unlink()
+        for path in sorted((self.project / 'pkg').rglob('*'), reverse=True):
+            path.unlink() if path.is_file() else path.rmdir()
+        (self.project / 'pkg').rmdir()
+        changed = store.plan_changes([self.project / 'a.py', self.project / 'pkg'])
+        self.assertEqual(changed, [])
+        self.assertEqual(sorted(store.removed_document_ids),
+                         [str(self.project / p) for p in ('a.py', 'pkg/b.py', 'pkg/sub/c.py')])
+        self.assertEqual(store.pending_manifest, {})
+
+    def test_new_directory_is_walked(self):
+        """Test that a directory moved into the project has its files planned"""
+        store = self.make_store()
+        self.index_all(store)
+        self.write('moved/x.py', 'x = 1\n')
+        self.write('moved/notes.bin', 'not source')
+        changed = store.plan_changes([self.project / 'moved'])
+        self.assertEqual([path.name for path, _ in changed], ['x.py'])
+
+    def test_file_in_new_directory_is_planned_once(self):
+        """Test that a file reported along with the new directory holding it is planned once"""
+        store = self.make_store()
+        self.index_all(store)
+        self.write('pkg/x.py', 'x = 1\n')
+        changed = store.plan_changes([self.project / 'pkg', self.project / 'pkg' / 'x.py'])
+        self.assertEqual([path.name for path, _ in changed], ['x.py'])
+
+    def test_references_of_changed_owner_are_replanned(self):
+        """Test that files stored as references to a changing file are read again"""
+        self.write('a.py', 'same = 1\n')
+        self.write('copy.py', 'same = 1\n')
+        store = self.make_store()
+        self.index_all(store, duplicates={'copy.py': 'a.py'})
+
+        owner = self.write('a.py', 'changed = 1\n')
+        changed = store.plan_changes([owner])
+        self.assertEqual(sorted(path.name for path, _ in changed), ['a.py', 'copy.py'])
+
+class TestGitChanges(CodeStoreTestCase):
+
+    def git(self, *args: str) -> None:
+        subprocess.run(['git', '-C', str(self.project), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                        *args], check=True, capture_output=True)
+
+    def test_untracked_and_ignored_files_are_checked(self):
+        """Test that deleted untracked files and changed git-ignored files are found without a walk"""
+        self.git('init', '-q')
+        (self.project / '.git' / 'info' / 'exclude').write_text('ignored.py\n')
+        self.write('tracked.py', 't = 1\n')
+        untracked = self.write('untracked.py', 'u = 1\n')
+        ignored = self.write('ignored.py', 'i = 1\n')
+        self.write('kept.py', 'k = 1\n')
+        self.git('add', 'tracked.py', '.gitignore')
+        self.git('commit', '-q', '-m', 'initial')
+        store = self.make_store()
+        self.index_all(store)
+        self.assertIsNotNone(store.file_manifest.meta.get('git_commit'))
+
+        untracked.unlink()
+        ignored.write_text('i = 22\n')
+        with mock.patch.object(store, '_supported_files', side_effect=AssertionError('walked')):
+            changed = store.find_changed_files(0)
+        self.assertEqual([path.name for path, _ in changed], ['ignored.py'])
+        self.assertEqual(store.removed_document_ids, [str(untracked)])
+
+class TestResume(CodeStoreTestCase):
+
+    def test_resume_after_checkpoint(self):
+        """Test that a run killed after a checkpoint resumes with the rest and keeps what it indexed"""
+        self.write('a.py', 'def alpha():\n    return 1\n')
+        self.write('b.py', 'import a\n\ndef beta():\n    return a.alpha()\n')
+        self.write('c.py', 'def gamma():\n    return 3\n')
+        store = self.make_store()
+        read = {path.name: (path, stats, content_hash)
+                for path, stats, _, content_hash in store._read_documents(list(store.plan_full_index()))}
+        for name in ('a.py', 'b.py'):
+            store.record_file(*read[name])
+        store.checkpoint_manifest()
+        # Killed here: c.py was read but never stored
+
+        resumed = self.make_store()
+        self.assertTrue(resumed.has_checkpoint())
+        changed = resumed.find_changed_files(0)
+        self.assertEqual([path.name for path, _ in changed], ['c.py'])
+        self.assertEqual([match['path'] for match in resumed.lookup_symbol('alpha')], ['a.py'])
+        self.assertEqual(resumed.lookup_symbol('gamma'), [])
+        self.assertEqual(resumed.import_graph.neighbors('b.py'), ['a.py'])
+
+        for path, stats, _, content_hash in resumed._read_documents(changed):
+            resumed.record_file(path, stats, content_hash)
+        resumed.commit_manifest()
+        self.assertFalse(resumed.has_checkpoint())
+        self.assertEqual([match['path'] for match in resumed.lookup_symbol('gamma')], ['c.py'])
+        self.assertEqual([match['path'] for match in resumed.lookup_symbol('beta')], ['b.py'])
+
+class TestDocuments(CodeStoreTestCase):
+
+    def test_volatile_metadata_stays_out_of_text(self):
+        """Test that a file's chunks embed the same text whatever its mtime and size metadata"""
+        path = self.write('a.py', 'def alpha():\n    return 1\n')
+        store = self.make_store()
+
+        def chunk_texts(mtime):
+            os.utime(path, (mtime, mtime))
+            [(_, _, doc, _)] = store._read_documents(list(store.plan_full_index()))
+            node = CodeChunkParser().get_nodes_from_documents([doc])[0]
+            self.assertIn('modification_time', node.metadata)
+            self.assertIn('size', node.metadata)
+            return node.get_content(MetadataMode.EMBED), node.get_content(MetadataMode.LLM)
+
+        embed_text, llm_text = chunk_texts(1700000000)
+        self.assertEqual(chunk_texts(1800000000), (embed_text, llm_text))
+        self.assertIn(f'file_path: {path}', embed_text)
+        for key in ('creation_time', 'modification_time', 'size', 'file_type', 'file_name'):
+            self.assertNotIn(key, embed_text + llm_text)
+        self.assertNotIn('start_line', embed_text)
+        self.assertIn('start_line', llm_text)
+
+    def test_stores_of_older_formats_need_rebuild(self):
+        """Test that a store without a manifest or of an older format stays flagged until fully re-indexed"""
+        self.write('a.py', 'a = 1\n')
+        store = self.make_store()
+        self.assertTrue(store.needs_rebuild())
+        self.index_all(store)
+        self.assertFalse(store.needs_rebuild())
+        del store.file_manifest.meta['format']
+        store.file_manifest.save()
+
+        store = self.make_store()
+        self.assertTrue(store.needs_rebuild())
+        self.write('a.py', 'a = 2\n')
+        for path, stats in store.find_changed_files(0):
+            store.record_file(path, stats, hash_file(path))
+        store.commit_manifest()
+        self.assertTrue(self.make_store().needs_rebuild())
+
+        self.index_all(store)
+        self.assertFalse(self.make_store().needs_rebuild())
+
+class TestProcessing(CodeStoreTestCase):
+
+    def test_documents_are_returned_and_metrics_kept(self):
+        """Test that process_* return documents only and leave the run's metrics on the store"""
+        self.write('a.py', 'a = 1\n')
+        self.write('b.py', 'b = 1\n')
+        store = self.make_store()
+        metrics_path = self.base / 'metrics.json'
+        documents = store.process_project(metrics_path=str(metrics_path))
+        self.assertIsInstance(documents, list)
+        self.assertEqual(sorted(Path(doc.doc_id).name for doc in documents), ['a.py', 'b.py'])
+        self.assertEqual(store.metrics.to_dict()['files_read'], 2)
+        self.assertTrue(metrics_path.exists())
+        store.commit_manifest()
+
+        self.write('b.py', 'b = 2\n')
+        documents = store.process_changed_files(0)
+        self.assertEqual([Path(doc.doc_id).name for doc in documents], ['b.py'])
+        self.assertEqual(store.metrics.to_dict()['files_read'], 1)
+
+class TestSkippedFiles(CodeStoreTestCase):
+
+    def test_skipped_files_are_sniffed_before_reading(self):
+        """Test that only the first bytes of a file the classifier skips are read"""
+        path = self.project / 'data.py'
+        path.write_bytes(b'\x00' * (codeStore.SNIFF_BYTES * 8))
+        store = self.make_store()
+        heads = []
+        self.assertIsNone(store.processor.read_bytes(path, lambda head: heads.append(len(head)) and False))
+        self.assertEqual(heads, [codeStore.SNIFF_BYTES + 1])
+
+        self.assertEqual(store._load_document(path, path.stat()), (None, None))
+        self.assertTrue(store.classifier.was_skipped(path))
+        self.assertEqual(store.metrics.to_dict()['bytes_read'], 0)
+
+    def test_indexed_file_now_skipped_is_removed(self):
+        """Test that an indexed file the classifier now skips loses its document and manifest entry"""
+        self.write('a.py', 'a = 1\n')
+        binary = self.write('b.py', 'b = 1\n')
+        store = self.make_store()
+        self.index_all(store)
+
+        binary.write_bytes(b'b = \x00\x01\n')
+        self.assertEqual(store.process_changed_files(0), [])
+        self.assertEqual(store.removed_document_ids, [str(binary)])
+        store.commit_manifest()
+        self.assertEqual(sorted(store.file_manifest.entries), ['a.py'])
+        self.assertEqual(store.file_manifest.meta['retry'], [])
+
+def write_archive(path: Path, files: dict, mtime: float = 1700000000) -> None:
+    """Write files into a zip, tar, tar.gz or tar.zst archive, chosen by the path's suffix."""
+    if path.suffix == '.zip':
+        with zipfile.ZipFile(path, 'w') as archive:
+            for name, text in files.items():
+                archive.writestr(zipfile.ZipInfo(name, time.localtime(mtime)[:6]), text)
+        return
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz' if path.name.endswith('.tar.gz') else 'w') as archive:
+        for name, text in files.items():
+            data = text.encode('utf-8')
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = mtime
+            archive.addfile(info, io.BytesIO(data))
+    data = buffer.getvalue()
+    if path.name.endswith('.tar.zst'):
+        import zstandard
+        data = zstandard.ZstdCompressor().compress(data)
+    path.write_bytes(data)
+
+class TestArchiveProjects(CodeStoreTestCase):
+
+    FILES = {'pkg/a.py': 'def alpha():\n    return 1\n', 'pkg/copy.py': 'def alpha():\n    return 1\n',
+             'b.py': 'def beta():\n    return 2\n', 'c.py': 'def gamma():\n    return 3\n'}
+
+    def index_archive(self, store: CodeStore, files) -> dict:
+        """Read planned members as the pipeline does, storing identical content as references."""
+        texts, owners = {}, {}
+        for path, stats, doc, content_hash in store._read_documents(files):
+            owner = owners.setdefault(content_hash, doc.doc_id)
+            store.record_file(path, stats, content_hash, duplicate_of=owner if owner != doc.doc_id else None)
+            texts[doc.metadata['file_path']] = doc.text + '\n'
+        store.commit_manifest()
+        return texts
+
+    def check_kind(self, suffix: str) -> None:
+        archive = self.base / f'project{suffix}'
+        write_archive(archive, self.FILES)
+        store = self.make_store(project=archive)
+        self.assertEqual(self.index_archive(store, list(store.plan_full_index())), self.FILES)
+        self.assertEqual(store.file_manifest.entries['pkg/copy.py']['duplicate_of'], 'pkg/a.py')
+
+        self.assertEqual(store.find_changed_files(0), [])
+
+        changed = dict(self.FILES, **{'pkg/a.py': 'def alpha():\n    return 10\n', 'd.py': 'd = 4\n'})
+        del changed['c.py']
+        write_archive(archive, changed, mtime=1700000100)
+        planned = store.find_changed_files(0)
+        self.assertEqual(sorted(path.name for path, _ in planned), ['a.py', 'copy.py', 'd.py'])
+        self.assertEqual(store.removed_document_ids, [str(archive / 'c.py')])
+        self.assertEqual(store.archive_cache, {})
+
+        texts = self.index_archive(store, planned)
+        self.assertEqual(texts, {'pkg/a.py': changed['pkg/a.py'], 'pkg/copy.py': changed['pkg/copy.py'],
+                                 'd.py': 'd = 4\n'})
+        self.assertEqual((store.archive_cache, store.archive_wanted), ({}, set()))
+
+    def test_zip(self):
+        """Test full and incremental indexing of a zip project"""
+        self.check_kind('.zip')
+
+    def test_tar(self):
+        """Test full and incremental indexing of a plain tar project"""
+        self.check_kind('.tar')
+
+    def test_tar_gz(self):
+        """Test full and incremental indexing of a gzipped tar project, which is only streamed"""
+        self.check_kind('.tar.gz')
+
+    @unittest.skipUnless(importlib.util.find_spec('zstandard'), 'zstandard is not installed')
+    def test_tar_zst(self):
+        """Test full and incremental indexing of a zstandard tar project"""
+        self.check_kind('.tar.zst')
+
+    def test_archive_gitignore_is_read_from_the_archive(self):
+        """Test that an archive's own .gitignore applies to its members and none is looked for on disk"""
+        for suffix in ('.zip', '.tar.gz'):
+            archive = self.base / f'ignoring{suffix}'
+            write_archive(archive, dict(self.FILES, **{'.gitignore': 'pkg/\n'}))
+            with self.assertNoLogs(level='ERROR'):
+                store = self.make_store(project=archive)
+                planned = list(store.plan_full_index())
+            self.assertEqual(sorted(path.name for path, _ in planned), ['b.py', 'c.py'])
+
+    def test_unread_members_are_released(self):
+        """Test that a changed member stored as a reference without reading it is not held"""
+        archive = self.base / 'project.tar.gz'
+        write_archive(archive, self.FILES)
+        store = self.make_store(project=archive)
+        self.index_archive(store, list(store.plan_full_index()))
+
+        write_archive(archive, dict(self.FILES, **{'e.py': 'e = 5\n', 'f.py': 'f = 6\n'}), mtime=1700000100)
+        planned = store.find_changed_files(0)
+        self.assertEqual([path.name for path, _ in planned], ['e.py', 'f.py'])
+        store.reference_document(*planned[0])
+        self.assertEqual(store._read_archive_member(planned[1][0]), b'f = 6\n')
+        self.assertEqual((store.archive_cache, store.archive_wanted), ({}, set()))
+
+class TestWatch(CodeStoreTestCase):
+
+    def wait_for(self, condition, timeout: float = 10.0) -> None:
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            time.sleep(0.05)
+
+    def test_bursts_are_coalesced(self):
+        """Test that a burst of edits is indexed as one batch and a later edit as another"""
+        self.write('seed.py', 'seed = 1\n')
+        store = self.make_store()
+        self.index_all(store)
+        manager, pipeline = RecordingManager(), RecordingPipeline()
+        store.start_watching(manager, pipeline, debounce_ms=3000, step_ms=400)
+        time.sleep(1.0)
+
+        for name in ('a.py', 'b.py', 'c.py'):
+            self.write(name, f'{name[0]} = 1\n')
+            time.sleep(0.05)
+        self.wait_for(lambda: pipeline.runs)
+        self.write('d.py', 'd = 1\n')
+        self.wait_for(lambda: len(pipeline.runs) > 1)
+        store.stop_watching()
+
+        self.assertEqual(pipeline.runs, [['a.py', 'b.py', 'c.py'], ['d.py']])
+
+    def test_deletions_and_excluded_directories(self):
+        """Test that deletions reach the manager and writes to the manifest directory are ignored"""
+        seed = self.write('seed.py', 'seed = 1\n')
+        store = self.make_store(project=self.project)
+        self.index_all(store)
+        manager, pipeline = RecordingManager(), RecordingPipeline()
+        store.start_watching(manager, pipeline, debounce_ms=2000, step_ms=300,
+                             exclude_dirs=[self.project / 'state'])
+        time.sleep(1.0)
+
+        self.write('state/cache.py', 'x = 1\n')
+        seed.unlink()
+        self.wait_for(lambda: manager.deleted)
+        time.sleep(0.5)
+        store.stop_watching()
+
+        self.assertEqual(manager.deleted, [[str(seed)]])
+        self.assertEqual(pipeline.runs, [])
+
+    def test_own_state_inside_project_is_not_watched(self):
+        """Test that the store's manifest, symbols and imports saved inside the project do not re-trigger it"""
+        self.write('seed.py', 'seed = 1\n')
+        state = self.project / 'state'
+        store = CodeStore(str(self.project), 'test', manifest_dir=str(state / 'manifests'),
+                          symbols_dir=str(state / 'symbols'), imports_dir=str(state / 'imports'))
+        self.addCleanup(store.close)
+        self.index_all(store)
+        # Like a service client, the manager has no local store directory to exclude
+        manager, pipeline = RecordingManager(), ReadingPipeline(store)
+        store.start_watching(manager, pipeline, debounce_ms=1000, step_ms=200)
+        time.sleep(1.0)
+
+        self.write('a.py', 'import seed\n\ndef alpha():\n    return seed.seed\n')
+        self.wait_for(lambda: pipeline.runs)
+        time.sleep(1.5)
+        store.stop_watching()
+
+        self.assertEqual(pipeline.runs, [['a.py']])
+
+if __name__ == '__main__':
+    unittest.main()
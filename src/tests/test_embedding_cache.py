@@ -0,0 +1,62 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llama_index.core.embeddings import MockEmbedding
+from embedding_cache import EmbeddingCache, CachedEmbedding, text_key
+
+class CountingEmbedding(MockEmbedding):
+    """Mock embedding that counts the texts it embeds"""
+    embedded: list = []
+
+    def _get_text_embeddings(self, texts):
+        self.embedded.extend(texts)
+        return super()._get_text_embeddings(texts)
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.test_dir.name) / 'cache.sqlite'
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_cached_texts_are_not_embedded_again(self):
+        """Test that only texts missing from the cache reach the model, across cache instances"""
+        cache = EmbeddingCache(self.path)
+        model = CachedEmbedding(CountingEmbedding(embed_dim=4, embedded=[]), cache=cache)
+        first = model.get_text_embedding_batch(['a', 'b', 'a'])
+        self.assertEqual(len(first), 3)
+        self.assertEqual(first[0], first[2])
+        cache.close()
+
+        inner = CountingEmbedding(embed_dim=4, embedded=[])
+        model = CachedEmbedding(inner, cache=EmbeddingCache(self.path))
+        second = model.get_text_embedding_batch(['b', 'c'])
+        self.assertEqual(inner.embedded, ['c'])
+        self.assertEqual(second[0], first[1])
+        self.assertEqual(model.cache.stats()['hits'], 1)
+
+    def test_least_recently_used_are_evicted(self):
+        """Test that eviction keeps the cache bounded and drops the oldest entries first"""
+        cache = EmbeddingCache(self.path, max_entries=10)
+        for i in range(10):
+            cache.put_many('model', {text_key(str(i)): [float(i)]})
+        cache.get_many('model', [text_key('0')])
+        cache.put_many('model', {text_key('new'): [1.0]})
+
+        self.assertLessEqual(cache.stats()['entries'], 10)
+        found = cache.get_many('model', [text_key('0'), text_key('1'), text_key('new')])
+        self.assertIn(text_key('0'), found)
+        self.assertIn(text_key('new'), found)
+        self.assertNotIn(text_key('1'), found)
+        self.assertEqual(cache.get_many('other', [text_key('0')]), {})
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
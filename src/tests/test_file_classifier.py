@@ -0,0 +1,57 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from file_classifier import FileClassifier, detect_encoding
+
+class TestFileClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.test_dir.name)
+        self.classifier = FileClassifier(max_bytes=100, max_bytes_by_extension={'.json': 10})
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def _write(self, name, data):
+        path = self.root / name
+        path.write_bytes(data)
+        return path, os.stat(path)
+
+    def test_path_checks(self):
+        """Test lockfile, minified-name and per-extension size checks"""
+        self.assertEqual(self.classifier.check_path(*self._write('package-lock.json', b'{}')), 'lockfile')
+        self.assertEqual(self.classifier.check_path(*self._write('app.min.js', b'x')), 'minified')
+        self.assertEqual(self.classifier.check_path(*self._write('data.json', b'{"a": 12345}')), 'too_large')
+        self.assertIsNone(self.classifier.check_path(*self._write('main.py', b'{"a": 12345}')))
+
+    def test_content_checks(self):
+        """Test NUL sniffing and the long-line heuristic"""
+        path = self.root / 'file.js'
+        self.assertEqual(self.classifier.check_content(path, b'abc\x00def'), 'binary')
+        self.assertEqual(self.classifier.check_content(path, b'var a=1;' * 500), 'minified')
+        self.assertIsNone(self.classifier.check_content(path, b'const a = 1;\n' * 500))
+
+    def test_report(self):
+        """Test that skips are counted per reason"""
+        self.classifier.skip(self.root / 'a.js', 'binary')
+        self.classifier.skip(self.root / 'b.js', 'binary')
+        self.classifier.skip(self.root / 'c.json', 'too_large')
+        report = self.classifier.report()
+        self.assertEqual(report['total'], 3)
+        self.assertEqual(report['reasons'], {'binary': 2, 'too_large': 1})
+        self.assertTrue(self.classifier.was_skipped(self.root / 'a.js'))
+
+    def test_detect_encoding_on_sample(self):
+        """Test that encoding detection works from a sample of the file"""
+        data = ('café crème ' * 20000).encode('latin-1')
+        self.assertIsNotNone(detect_encoding(data))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import os
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from file_manifest import FileManifest, hash_file, make_entry
+
+class TestFileManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.project = Path(self.test_dir.name) / "project"
+        self.project.mkdir()
+        for name in ("a.py", "b.py", "c.py", "d.py"):
+            (self.project / name).write_text(f"# {name}\n")
+
+        self.manifest = FileManifest(Path(self.test_dir.name) / "manifest.json")
+        self.manifest.save({name: make_entry(os.stat(self.project / name), hash_file(self.project / name))
+                            for name in ("a.py", "b.py", "c.py", "d.py")})
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def _current_files(self):
+        return [(path.name, path, path.stat()) for path in sorted(self.project.iterdir())]
+
+    def test_unchanged_files_are_not_hashed(self):
+        """Test that matching size and mtime skips a file without reporting it"""
+        changes = self.manifest.diff(self._current_files())
+        self.assertEqual(changes["unchanged"], 4)
+        self.assertEqual(changes["added"] + changes["modified"] + changes["deleted"], [])
+
+    def test_classifies_changes(self):
+        """Test added, modified, deleted, renamed and touched classification"""
+        (self.project / "a.py").write_text("# a.py changed\n")
+        stats = (self.project / "b.py").stat()
+        os.utime(self.project / "b.py", (stats.st_atime, stats.st_mtime + 10))
+        (self.project / "c.py").unlink()
+        (self.project / "d.py").rename(self.project / "e.py")
+        (self.project / "f.py").write_text("# new\n")
+
+        changes = FileManifest(self.manifest.manifest_path).diff(self._current_files())
+
+        self.assertEqual([item[0] for item in changes["modified"]], ["a.py"])
+        self.assertEqual([item[0] for item in changes["touched"]], ["b.py"])
+        self.assertEqual(changes["deleted"], ["c.py"])
+        self.assertEqual([(item[0], item[1]) for item in changes["renamed"]], [("d.py", "e.py")])
+        self.assertEqual([item[0] for item in changes["added"]], ["f.py"])
+
+        entries = self.manifest.apply(changes)
+        self.assertEqual(sorted(entries), ["a.py", "b.py", "e.py", "f.py"])
+
+    def test_meta_round_trip_and_legacy_format(self):
+        """Test that meta is saved with the entries and bare entry dicts still load"""
+        self.manifest.save(meta={"git_commit": "abc"})
+        reloaded = FileManifest(self.manifest.manifest_path)
+        self.assertEqual(reloaded.meta, {"git_commit": "abc"})
+        self.assertEqual(sorted(reloaded.entries), ["a.py", "b.py", "c.py", "d.py"])
+
+        with open(self.manifest.manifest_path, "w") as f:
+            json.dump(self.manifest.entries, f)
+        legacy = FileManifest(self.manifest.manifest_path)
+        self.assertEqual(legacy.meta, {})
+        self.assertEqual(sorted(legacy.entries), ["a.py", "b.py", "c.py", "d.py"])
+
+    def test_checkpoint_is_saved_but_not_adopted(self):
+        """Test that a checkpoint is written to disk while the in-memory entries stay as they were"""
+        self.manifest.checkpoint({"a.py": self.manifest.entries["a.py"]}, {"checkpoint": {"files": 1}})
+        self.assertEqual(sorted(self.manifest.entries), ["a.py", "b.py", "c.py", "d.py"])
+
+        reloaded = FileManifest(self.manifest.manifest_path)
+        self.assertEqual(sorted(reloaded.entries), ["a.py"])
+        self.assertEqual(reloaded.meta, {"checkpoint": {"files": 1}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from git_changes import (GitBlobReader, changed_paths, git_root, head_commit, tracked_blobs, untracked_files,
+                         worktree_changes)
+
+@unittest.skipIf(shutil.which('git') is None, 'git is not installed')
+class TestGitChanges(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name).resolve()
+        self.git('init', '-q')
+        (self.root / '.gitignore').write_text('*.log\n')
+        self.write('a.py', 'a = 1\n')
+        self.write('pkg/b.py', 'b = 1\n')
+        self.git('add', '.')
+        self.git('commit', '-q', '-m', 'initial')
+        self.commit = head_commit(self.root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def git(self, *args: str) -> None:
+        subprocess.run(['git', '-C', str(self.root), '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+                        *args], check=True, capture_output=True)
+
+    def write(self, relative_path: str, text: str) -> Path:
+        path = self.root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        return path
+
+    def test_checkout(self):
+        """Test that the checkout root and HEAD commit are found from a subdirectory"""
+        self.assertEqual(git_root(self.root / 'pkg'), self.root)
+        self.assertEqual(len(self.commit), 40)
+        with self.assertNoLogs(level='WARNING'):
+            self.assertIsNone(git_root(Path(tempfile.gettempdir()) / 'does-not-exist'))
+
+    def test_changed_paths(self):
+        """Test that committed, uncommitted and untracked changes are reported, but not ignored files"""
+        self.write('a.py', 'a = 2\n')
+        self.git('commit', '-q', '-am', 'edit')
+        (self.root / 'pkg' / 'b.py').unlink()
+        self.write('new.py', 'n = 1\n')
+        self.write('debug.log', 'noise\n')
+        self.assertEqual(changed_paths(self.root, self.commit),
+                         {self.root / 'a.py', self.root / 'pkg' / 'b.py', self.root / 'new.py'})
+        self.assertIsNone(changed_paths(self.root, '0' * 40))
+
+    def test_file_lists(self):
+        """Test tracked blobs, working tree edits and untracked files, relative to a subdirectory"""
+        self.write('pkg/b.py', 'b = 2\n')
+        self.write('pkg/c.py', 'c = 1\n')
+        self.write('pkg/debug.log', 'noise\n')
+        blobs = tracked_blobs(self.root / 'pkg')
+        self.assertEqual(list(blobs), ['b.py'])
+        self.assertEqual(worktree_changes(self.root / 'pkg'), {'b.py'})
+        self.assertEqual(untracked_files(self.root / 'pkg'), ['c.py'])
+
+        reader = GitBlobReader(self.root)
+        try:
+            self.assertEqual(reader.read(blobs['b.py']), b'b = 1\n')
+            self.assertIsNone(reader.read('0' * 40))
+        finally:
+            reader.close()
+
+if __name__ == '__main__':
+    unittest.main()
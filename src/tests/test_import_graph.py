@@ -0,0 +1,61 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llama_index.core import QueryBundle
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+from import_graph import ImportExpandingRetriever, ImportGraph, python_imports, script_imports
+
+class FixedRetriever(BaseRetriever):
+    """Retriever returning the same hits for every query"""
+    def __init__(self, hits):
+        super().__init__()
+        self.hits = hits
+
+    def _retrieve(self, query_bundle):
+        return self.hits
+
+class TestImportGraph(unittest.TestCase):
+
+    def test_python_imports(self):
+        """Test that absolute and relative imports are made absolute module specs"""
+        specs = python_imports("import os\nfrom . import helpers\nfrom ..server import make\n", "src/pkg/util.py")
+        self.assertEqual(specs, ['module:os', 'module:src.pkg.helpers', 'module:src.pkg',
+                                 'module:src.server.make', 'module:src.server'])
+
+    def test_script_imports(self):
+        """Test that relative TS/JS imports are kept and package imports dropped"""
+        source = "import { a } from './lib/a';\nimport React from 'react';\nconst b = require('../b');\n"
+        self.assertEqual(script_imports(source, "web/app.ts"), ['path:web/lib/a', 'path:b'])
+
+    def test_neighbors_and_expansion(self):
+        """Test that imports resolve to files and hits gain the neighbour chunks they mention"""
+        with tempfile.TemporaryDirectory() as test_dir:
+            graph = ImportGraph(Path(test_dir) / 'graph.json')
+            graph.update({'src/monitor.py': ['module:llmserver'], 'src/llmserver.py': [], 'src/other.py': []},
+                         {}, project_root='/project')
+            graph.save()
+            graph = ImportGraph(Path(test_dir) / 'graph.json')
+            self.assertEqual(graph.neighbors('src/llmserver.py'), ['src/monitor.py'])
+            self.assertFalse(graph.update({'src/other.py': []}, {}, project_root='/project'))
+            self.assertTrue(graph.update({}, {'src/copy.py': 'src/other.py'}))
+
+            hit = TextNode(id_='hit', text='server = llmserver.makeServer(sio)',
+                           metadata={'file_path': '/project/src/monitor.py'})
+            chunks = {'/project/src/llmserver.py': [
+                TextNode(id_='unrelated', text='def other(): pass', metadata={'symbols': 'other'}),
+                TextNode(id_='wanted', text='def makeServer(sio): pass', metadata={'symbols': 'makeServer'}),
+            ]}
+            retriever = ImportExpandingRetriever(FixedRetriever([NodeWithScore(node=hit, score=0.5)]), graph,
+                                                 lambda doc_id: chunks.get(doc_id, []), token_budget=100)
+            results = retriever.retrieve(QueryBundle('start'))
+            self.assertEqual([result.node.node_id for result in results], ['hit', 'wanted'])
+            self.assertLess(results[1].score, results[0].score)
+
+if __name__ == '__main__':
+    unittest.main()
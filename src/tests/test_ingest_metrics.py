@@ -0,0 +1,37 @@
+import unittest
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ingest_metrics import IngestMetrics
+
+class TestIngestMetrics(unittest.TestCase):
+
+    def test_counts_times_and_json(self):
+        """Test that counters and stage times are reported with throughput and saved as JSON"""
+        metrics = IngestMetrics()
+        metrics.count('files_read', 4)
+        metrics.count('bytes_read', 2_000_000)
+        metrics.add_time('read', 0.5)
+        metrics.add_time('read', 0.25)
+        metrics.finish()
+        metrics.elapsed = 2.0
+
+        report = metrics.to_dict()
+        self.assertEqual(report['files_read'], 4)
+        self.assertEqual(report['stage_seconds']['read'], 0.75)
+        self.assertEqual(report['files_per_second'], 2.0)
+        self.assertEqual(report['mb_per_second'], 1.0)
+
+        with tempfile.TemporaryDirectory() as test_dir:
+            path = Path(test_dir) / 'metrics.json'
+            metrics.write_json(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f), report)
+
+if __name__ == '__main__':
+    unittest.main()
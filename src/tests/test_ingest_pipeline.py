@@ -0,0 +1,211 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.settings import Settings
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import codeStore
+import vectorstore
+from codeStore import CodeStore
+from ingest_pipeline import IngestionPipeline
+
+class RemoteManager:
+    """Stands in for a VectorStoreClient, recording what is sent to the service."""
+
+    def __init__(self):
+        self.sent = []
+
+    def add_to_vector_store(self, name, documents, persist=True):
+        self.sent.append(('documents', sorted(Path(doc.doc_id).name for doc in documents)))
+
+    def add_references(self, name, references, persist=True):
+        self.sent.append(('references', sorted((Path(doc.doc_id).name, Path(owner).name)
+                                               for doc, owner in references)))
+
+    def persist_vector_store(self, name):
+        self.sent.append(('persisted',))
+
+    def delete_from_vector_store(self, name, ref_doc_ids):
+        self.sent.append(('deleted', sorted(Path(doc_id).name for doc_id in ref_doc_ids)))
+
+class InMemoryHandler(vectorstore.BasicHandler):
+    """Basic store handler that keeps the store in memory, counting persists."""
+
+    persists = 0
+
+    def persist(self, index):
+        InMemoryHandler.persists += 1
+
+class InMemoryManager(vectorstore.VectorStoreManager):
+    """VectorStoreManager whose stores are never written to disk."""
+
+    def __init__(self):
+        super().__init__(save_index=False)
+
+    def get_handler(self, store_type, index_path):
+        return InMemoryHandler(store_type, index_path)
+
+    def release_vector_store(self, name):
+        """The stores exist only in memory, so they are kept."""
+
+def function(name: str, value: int) -> str:
+    """Source of a function too large to share a chunk with another."""
+    body = ''.join(f"    {name}_{i} = {value + i}\n" for i in range(120))
+    return f"def {name}():\n{body}    return {name}_0\n\n"
+
+class PipelineTestCase(unittest.TestCase):
+    """Indexes a project into a basic store, both kept in an empty directory."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base = Path(self.temp_dir.name).resolve()
+        self.cwd = os.getcwd()
+        os.chdir(self.base)
+        self.project = self.base / 'project'
+        self.project.mkdir()
+        (self.project / '.gitignore').write_text('')
+        patcher = mock.patch.object(codeStore, 'init_embedding_model')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Settings.embed_model = MockEmbedding(embed_dim=8)
+
+        self.store = CodeStore(str(self.project), 'test', manifest_dir=str(self.base / 'manifests'),
+                               symbols_dir=str(self.base / 'symbols'), imports_dir=str(self.base / 'imports'))
+        self.manager = vectorstore.VectorStoreManager()
+        self.manager.add_vector_store('test', 'basic')
+
+    def tearDown(self):
+        self.store.close()
+        os.chdir(self.cwd)
+        self.temp_dir.cleanup()
+
+    def write(self, relative_path: str, text: str) -> Path:
+        path = self.project / relative_path
+        path.write_text(text)
+        return path
+
+    def run_pipeline(self, files, manager=None) -> dict:
+        pipeline = IngestionPipeline(self.store, manager or self.manager, 'test', read_workers=1, chunk_workers=1)
+        stats = pipeline.run(files)
+        self.store.commit_manifest()
+        return stats
+
+    def hits(self) -> dict:
+        """file name -> metadata['duplicates'] of its hits, as file names"""
+        retriever = self.manager.get_retriever('test', similarity_top_k=10)
+        return {Path(hit.node.metadata['file_path']).name:
+                sorted(Path(path).name for path in hit.node.metadata.get('duplicates', []))
+                for hit in retriever.retrieve('value')}
+
+class TestStages(PipelineTestCase):
+
+    def batches(self, embed) -> list:
+        """Sizes of the embedding calls made; inserting already embedded nodes makes empty ones."""
+        return [len(call.args[1]) for call in embed.call_args_list if call.args[1]]
+
+    def test_chunks_are_embedded_in_batches_and_reused(self):
+        """Test that chunks of several files share embedding calls and unchanged chunks are not embedded again"""
+        for name in ('a', 'b', 'c'):
+            self.write(f'{name}.py', function(f'{name}_first', 1) + function(f'{name}_second', 1))
+        manager = InMemoryManager()
+        manager.add_vector_store('test', 'basic')
+        InMemoryHandler.persists = 0
+        embed = mock.patch.object(MockEmbedding, 'get_text_embedding_batch', autospec=True,
+                                  side_effect=lambda model, texts, **kwargs: [[0.5] * 8 for _ in texts])
+        with embed as embed_batch:
+            pipeline = IngestionPipeline(self.store, manager, 'test', read_workers=2, chunk_workers=2,
+                                         embed_batch_size=64)
+            stats = pipeline.run(self.store.plan_full_index())
+            self.store.commit_manifest()
+            self.assertEqual((stats['documents'], stats['nodes']), (3, 6))
+            self.assertEqual(self.batches(embed_batch), [6])
+            self.assertEqual(InMemoryHandler.persists, 1)
+
+            embed_batch.reset_mock()
+            self.write('b.py', function('b_first', 1) + function('b_second', 2))
+            stats = pipeline.run(self.store.find_changed_files(0))
+            self.assertEqual((stats['documents'], stats['nodes'], stats['reused_nodes'], stats['removed_nodes']),
+                             (1, 1, 1, 1))
+            self.assertEqual(self.batches(embed_batch), [1])
+        self.assertEqual(len(manager.get_vector_store('test').docstore.docs), 6)
+
+    def test_remote_files_are_recorded_after_sending(self):
+        """Test that files sent to a remote service enter the manifest only once the service has them"""
+        self.write('a.py', 'value = 1\n')
+        self.write('b.py', 'other = 2\n')
+        remote = RemoteManager()
+        recorded_when_sent = []
+        remote.add_to_vector_store = lambda name, documents, persist: recorded_when_sent.append(
+            sorted(self.store.recorded_paths))
+        self.run_pipeline(self.store.plan_full_index(), manager=remote)
+        self.assertEqual(recorded_when_sent, [[]])
+        self.assertEqual(sorted(self.store.file_manifest.entries), ['a.py', 'b.py'])
+
+        self.write('a.py', 'value = 3\n')
+        changed = self.store.find_changed_files(0)
+        remote.add_to_vector_store = mock.Mock(side_effect=RuntimeError('service unavailable'))
+        with self.assertRaises(RuntimeError):
+            IngestionPipeline(self.store, remote, 'test').run(changed)
+        self.assertNotIn('a.py', self.store.recorded_paths)
+
+    def test_remote_persists_follow_the_growth_rule(self):
+        """Test that a remote service is sent small batches but asked to persist as rarely as a local store"""
+        for i in range(40):
+            self.write(f'm{i}.py', f'value_{i} = {i}\n')
+        remote = RemoteManager()
+        pipeline = IngestionPipeline(self.store, remote, 'test', embed_batch_size=4, persist_every=10)
+        pipeline.run(self.store.plan_full_index())
+        # Batches of 4, flushed when a persist is due after 10, 20, 30 and 40 documents
+        sizes = [len(entry[1]) if entry[0] == 'documents' else entry[0] for entry in remote.sent]
+        self.assertEqual(sizes, [4, 4, 2, 'persisted'] * 4)
+
+class TestDuplicates(PipelineTestCase):
+
+    def test_duplicates_are_stored_as_references(self):
+        """Test that identical files are embedded once and hits name every copy"""
+        self.write('a.py', 'value = 1\n')
+        self.write('copy.py', 'value = 1\n')
+        self.write('b.py', 'other = 2\n')
+        stats = self.run_pipeline(self.store.plan_full_index())
+
+        self.assertEqual((stats['documents'], stats['duplicates']), (3, 1))
+        entries = self.store.file_manifest.entries
+        self.assertEqual(entries['copy.py']['duplicate_of'], 'a.py')
+        self.assertNotIn('duplicate_of', entries['a.py'])
+        self.assertEqual(self.hits(), {'a.py': ['copy.py'], 'b.py': []})
+
+    def test_reference_takes_over_from_changed_owner(self):
+        """Test that a reference to a file whose content changes gets the content's nodes"""
+        self.write('a.py', 'value = 1\n')
+        self.write('copy.py', 'value = 1\n')
+        self.run_pipeline(self.store.plan_full_index())
+
+        self.write('a.py', 'value = 22\n')
+        changed = self.store.find_changed_files(0)
+        self.assertEqual(sorted(path.name for path, _ in changed), ['a.py', 'copy.py'])
+        stats = self.run_pipeline(changed)
+
+        self.assertEqual(stats['duplicates'], 0)
+        self.assertNotIn('duplicate_of', self.store.file_manifest.entries['copy.py'])
+        self.assertEqual(self.hits(), {'a.py': [], 'copy.py': []})
+
+    def test_remote_manager_sends_references(self):
+        """Test that duplicates are deduplicated before being sent to a remote service"""
+        self.write('a.py', 'value = 1\n')
+        self.write('copy.py', 'value = 1\n')
+        remote = RemoteManager()
+        stats = self.run_pipeline(self.store.plan_full_index(), manager=remote)
+
+        self.assertEqual(stats['duplicates'], 1)
+        self.assertEqual(remote.sent, [('documents', ['a.py']), ('references', [('copy.py', 'a.py')]), ('persisted',)])
+        self.assertEqual(self.store.file_manifest.entries['copy.py']['duplicate_of'], 'a.py')
+
+if __name__ == '__main__':
+    unittest.main()
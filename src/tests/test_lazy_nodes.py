@@ -0,0 +1,118 @@
+import unittest
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from llama_index.core import QueryBundle
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.storage.docstore.utils import doc_to_json
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from lazy_nodes import (NODES_BLOB_FILE, NODES_BY_DOC_FILE, NODES_OFFSETS_FILE, LazyNodeRetriever, NodeBlobStore,
+                        read_node_index, write_node_blob)
+from streaming_search import write_embedding_file
+
+def make_node(node_id: str, text: str, doc_id: str = "doc") -> TextNode:
+    node = TextNode(id_=node_id, text=text)
+    node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=doc_id)
+    return node
+
+class TestLazyNodes(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.test_dir.name)
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_store_follows_rewritten_export(self):
+        """Test that an open store sees nodes added, moved and removed by later exports"""
+        a, b, c = make_node("a", "alpha"), make_node("b", "beta"), make_node("c", "gamma", doc_id="other")
+        write_node_blob(self.temp_path, [a, b])
+        store = NodeBlobStore(self.temp_path)
+
+        write_node_blob(self.temp_path, [c, a, b])
+        self.assertEqual([node.text for node in store.get_many(["b", "c"])], ["beta", "gamma"])
+        self.assertEqual([node.node_id for node in store.get_document_nodes("other")], ["c"])
+
+        write_node_blob(self.temp_path, [c, make_node("b", "beta, edited")])
+        self.assertEqual([node.text for node in store.get_many(["a", "b"])], ["beta, edited"])
+        self.assertNotIn("a", store)
+        with self.assertRaises(KeyError):
+            store.get("a")
+
+    def test_unchanged_nodes_are_not_rewritten(self):
+        """Test that an export only appends new and changed nodes, and skips writing when nothing changed"""
+        nodes = [make_node(f"n{i}", f"text {i}") for i in range(20)]
+        write_node_blob(self.temp_path, nodes)
+        index = read_node_index(self.temp_path)
+        blob_path = self.temp_path / index["blob"]
+        size = blob_path.stat().st_size
+        offsets_mtime = (self.temp_path / NODES_OFFSETS_FILE).stat().st_mtime_ns
+
+        write_node_blob(self.temp_path, nodes)
+        self.assertEqual((self.temp_path / NODES_OFFSETS_FILE).stat().st_mtime_ns, offsets_mtime)
+
+        nodes[3] = make_node("n3", "text 3, edited")
+        write_node_blob(self.temp_path, nodes)
+        updated = read_node_index(self.temp_path)
+        self.assertEqual(updated["blob"], index["blob"])
+        self.assertGreater(blob_path.stat().st_size, size)
+        self.assertEqual(updated["nodes"]["n4"], index["nodes"]["n4"])
+        self.assertEqual(NodeBlobStore(self.temp_path).get("n3").text, "text 3, edited")
+
+    def test_compaction(self):
+        """Test that the blob is rewritten under a new name once dead bytes dominate"""
+        nodes = [make_node(f"n{i}", f"text {i}") for i in range(20)]
+        write_node_blob(self.temp_path, nodes)
+        first = read_node_index(self.temp_path)["blob"]
+        store = NodeBlobStore(self.temp_path)
+
+        write_node_blob(self.temp_path, nodes[:5])
+        index = read_node_index(self.temp_path)
+        self.assertNotEqual(index["blob"], first)
+        self.assertEqual(index["blob_bytes"], sum(length for _, length, _ in index["nodes"].values()))
+        self.assertEqual(len(store), 20)
+        self.assertEqual([node.node_id for node in store.get_many(["n0", "n10"])], ["n0"])
+        self.assertEqual(len(store), 5)
+
+    def test_legacy_export(self):
+        """Test that exports in the old layout are read and replaced on the next write"""
+        node = make_node("a", "alpha")
+        payload = json.dumps(doc_to_json(node)).encode("utf-8")
+        (self.temp_path / NODES_BLOB_FILE).write_bytes(payload)
+        (self.temp_path / NODES_OFFSETS_FILE).write_text(json.dumps({"a": [0, len(payload)]}))
+        (self.temp_path / NODES_BY_DOC_FILE).write_text(json.dumps({"doc": ["a"]}))
+
+        store = NodeBlobStore(self.temp_path)
+        self.assertEqual(store.get_document_nodes("doc")[0].text, "alpha")
+
+        write_node_blob(self.temp_path, [node, make_node("b", "beta")])
+        self.assertEqual([node.text for node in store.get_many(["a", "b"])], ["alpha", "beta"])
+        write_node_blob(self.temp_path, [node])
+        self.assertFalse((self.temp_path / NODES_BY_DOC_FILE).exists())
+
+    def test_retriever_follows_persists(self):
+        """Test that a retriever kept across persists returns nodes added after it was built"""
+        rng = np.random.default_rng(0)
+        embeddings = {f"n{i}": rng.normal(size=8) for i in range(10)}
+        nodes = [make_node(node_id, f"text {node_id}") for node_id in embeddings]
+        write_node_blob(self.temp_path, nodes)
+        write_embedding_file(self.temp_path, embeddings)
+        retriever = LazyNodeRetriever(self.temp_path, similarity_top_k=1)
+
+        query = rng.normal(size=8)
+        embeddings["new"] = query
+        write_node_blob(self.temp_path, nodes + [make_node("new", "text new")])
+        write_embedding_file(self.temp_path, embeddings)
+
+        results = retriever.retrieve(QueryBundle(query_str="", embedding=list(query)))
+        self.assertEqual([result.node.text for result in results], ["text new"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from multi_indexer import _init_worker, parse_projects, split_budget
+
+class TestMultiIndexer(unittest.TestCase):
+
+    def test_parse_projects(self):
+        """Test that store names come after the last colon and default to the directory name"""
+        projects = parse_projects(['~/src/app:app_store', '/tmp/shared/', 'relative/lib:'])
+        self.assertEqual(projects[0], (os.path.expanduser('~/src/app'), 'app_store'))
+        self.assertEqual(projects[1], ('/tmp/shared', 'shared'))
+        self.assertEqual(projects[2], (os.path.abspath('relative/lib'), 'lib'))
+
+    def test_duplicate_store_names_are_rejected(self):
+        """Test that two projects cannot share a store"""
+        with self.assertRaises(ValueError):
+            parse_projects(['/a/app', '/b/app'])
+
+    def test_split_budget(self):
+        """Test that the CPU budget is divided between processes and their stages"""
+        self.assertEqual(split_budget(2, cpu_budget=16), (2, 8, 4, 2))
+        self.assertEqual(split_budget(8, processes=3, cpu_budget=12), (3, 4, 2, 1))
+        # Never fewer than one process or thread, and no more processes than projects
+        self.assertEqual(split_budget(5, cpu_budget=2), (2, 1, 1, 1))
+        self.assertEqual(split_budget(1, processes=4, cpu_budget=8), (1, 8, 4, 2))
+        with mock.patch('os.cpu_count', return_value=None):
+            self.assertEqual(split_budget(3), (1, 1, 1, 1))
+
+    def test_worker_thread_limits_override_the_parent(self):
+        """Test that a worker's thread limits replace values inherited from the parent"""
+        with mock.patch.dict(os.environ, {'OMP_NUM_THREADS': '64', 'MKL_NUM_THREADS': '64'}):
+            _init_worker(3)
+            self.assertEqual((os.environ['OMP_NUM_THREADS'], os.environ['MKL_NUM_THREADS']), ('3', '3'))
+            self.assertEqual(os.environ['TOKENIZERS_PARALLELISM'], 'false')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import store_manifest
+from store_manifest import verify_manifest, write_manifest
+
+class TestStoreManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.store_path = Path(self.test_dir.name)
+        (self.store_path / "docstore.json").write_text('{"docs": "' + "x" * 5000 + '"}')
+        (self.store_path / "index_store.json").write_text('{}')
+        write_manifest(self.store_path, chunk_size=1024)
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_intact_store(self):
+        """Test that an untouched store passes both shallow and deep checks"""
+        self.assertTrue(verify_manifest(self.store_path)["ok"])
+        self.assertTrue(verify_manifest(self.store_path, deep=True)["ok"])
+
+    def test_missing_file(self):
+        """Test that a deleted file is reported as missing"""
+        (self.store_path / "index_store.json").unlink()
+        report = verify_manifest(self.store_path)
+        self.assertFalse(report["ok"])
+        self.assertEqual(report["missing"], ["index_store.json"])
+
+    def test_truncated_file(self):
+        """Test that a shallow check catches a size change"""
+        (self.store_path / "docstore.json").write_text("")
+        report = verify_manifest(self.store_path)
+        self.assertEqual(report["size_mismatch"], ["docstore.json"])
+
+    def test_same_size_corruption_needs_deep_check(self):
+        """Test that flipped bytes are only caught by a deep check"""
+        path = self.store_path / "docstore.json"
+        data = bytearray(path.read_bytes())
+        data[3000] ^= 1
+        path.write_bytes(bytes(data))
+
+        self.assertTrue(verify_manifest(self.store_path)["ok"])
+        report = verify_manifest(self.store_path, deep=True)
+        self.assertFalse(report["ok"])
+        self.assertEqual(report["checksum_mismatch"], ["docstore.json"])
+
+    def test_no_manifest(self):
+        """Test that a store without a manifest does not verify"""
+        (self.store_path / "manifest.json").unlink()
+        report = verify_manifest(self.store_path)
+        self.assertFalse(report["ok"])
+        self.assertIn("error", report)
+
+    def test_unchanged_files_are_not_rehashed(self):
+        """Test that rewriting the manifest only hashes files whose size or mtime moved"""
+        (self.store_path / "index_store.json").write_text('{"changed": true}')
+        with mock.patch("store_manifest._hash_chunk", wraps=store_manifest._hash_chunk) as hash_chunk:
+            write_manifest(self.store_path, chunk_size=1024)
+        self.assertEqual({call.args[0].name for call in hash_chunk.call_args_list}, {"index_store.json"})
+        self.assertTrue(verify_manifest(self.store_path, deep=True)["ok"])
+
+if __name__ == '__main__':
+    unittest.main()
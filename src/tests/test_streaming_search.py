@@ -0,0 +1,141 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from streaming_search import (EMBEDDING_META_FILE, EMBEDDINGS_FILE, EMBEDDING_IDS_FILE, StreamingSearcher,
+                              read_embedding_meta, write_embedding_file)
+
+class TestStreamingSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.test_dir.name)
+        rng = np.random.default_rng(0)
+        self.embeddings = {f"node-{i}": rng.normal(size=16) for i in range(500)}
+        self.query = rng.normal(size=16)
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_matches_in_memory_search(self):
+        """Test that blocked search returns the same top-k as a full matmul"""
+        write_embedding_file(self.temp_path, self.embeddings)
+
+        # Block size deliberately does not divide the row count
+        results = StreamingSearcher(self.temp_path, block_rows=37, max_workers=3).query(self.query, top_k=5)
+
+        matrix = np.array(list(self.embeddings.values()))
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        scores = matrix @ (self.query / np.linalg.norm(self.query))
+        expected = [f"node-{i}" for i in np.argsort(-scores)[:5]]
+
+        self.assertEqual([node_id for node_id, _ in results], expected)
+
+    def test_empty_store(self):
+        """Test that an empty export returns no results"""
+        write_embedding_file(self.temp_path, {})
+        self.assertEqual(StreamingSearcher(self.temp_path).query(self.query, top_k=5), [])
+
+    def test_dimension_mismatch(self):
+        """Test that a query with the wrong dimension is rejected"""
+        write_embedding_file(self.temp_path, self.embeddings)
+        with self.assertRaises(ValueError):
+            StreamingSearcher(self.temp_path).query(np.ones(8), top_k=5)
+
+    def _expected(self, embeddings, top_k):
+        ids = list(embeddings)
+        matrix = np.array([embeddings[node_id] for node_id in ids])
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        scores = matrix @ (self.query / np.linalg.norm(self.query))
+        return [ids[i] for i in np.argsort(-scores)[:top_k]]
+
+    def test_persist_appends_and_marks_removed_rows(self):
+        """Test that a later export appends new rows and never returns removed ones"""
+        write_embedding_file(self.temp_path, self.embeddings)
+        meta = read_embedding_meta(self.temp_path)
+
+        current = dict(self.embeddings)
+        best = self._expected(current, 1)[0]
+        del current[best]
+        current["node-new"] = self.query
+        write_embedding_file(self.temp_path, current)
+
+        updated = read_embedding_meta(self.temp_path)
+        self.assertEqual(updated["matrix"], meta["matrix"])
+        self.assertEqual(updated["count"], 501)
+        self.assertEqual(updated["live"], 500)
+        results = StreamingSearcher(self.temp_path, block_rows=37).query(self.query, top_k=5)
+        self.assertEqual([node_id for node_id, _ in results], self._expected(current, 5))
+        self.assertEqual(results[0][0], "node-new")
+
+    def test_unchanged_export_is_not_rewritten(self):
+        """Test that exporting the same embeddings again leaves the meta file alone"""
+        write_embedding_file(self.temp_path, self.embeddings)
+        before = (self.temp_path / EMBEDDING_META_FILE).read_text()
+        write_embedding_file(self.temp_path, self.embeddings)
+        self.assertEqual((self.temp_path / EMBEDDING_META_FILE).read_text(), before)
+
+    def test_compaction_after_many_removals(self):
+        """Test that the export is rewritten under new names once most rows are dead"""
+        write_embedding_file(self.temp_path, self.embeddings)
+        first = read_embedding_meta(self.temp_path)
+        kept = {node_id: embedding for node_id, embedding in list(self.embeddings.items())[:100]}
+        write_embedding_file(self.temp_path, kept)
+
+        meta = read_embedding_meta(self.temp_path)
+        self.assertNotEqual(meta["matrix"], first["matrix"])
+        self.assertEqual((meta["count"], meta["dead"]), (100, None))
+        results = StreamingSearcher(self.temp_path).query(self.query, top_k=5)
+        self.assertEqual([node_id for node_id, _ in results], self._expected(kept, 5))
+
+    def test_incomplete_matrix_is_rejected(self):
+        """Test that a matrix shorter than the meta file says is detected on open"""
+        write_embedding_file(self.temp_path, self.embeddings)
+        matrix_path = self.temp_path / read_embedding_meta(self.temp_path)["matrix"]
+        with open(matrix_path, "r+b") as f:
+            f.truncate(100)
+        with self.assertRaises(ValueError):
+            StreamingSearcher(self.temp_path)
+
+    def test_legacy_export(self):
+        """Test that exports written before generations are read and then replaced"""
+        ids = list(self.embeddings)
+        matrix = np.array([self.embeddings[node_id] for node_id in ids], dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix.tofile(self.temp_path / EMBEDDINGS_FILE)
+        (self.temp_path / EMBEDDING_IDS_FILE).write_text("".join(f"{node_id}\n" for node_id in ids))
+        (self.temp_path / EMBEDDING_META_FILE).write_text('{"count": 500, "dim": 16}')
+
+        results = StreamingSearcher(self.temp_path).query(self.query, top_k=5)
+        self.assertEqual([node_id for node_id, _ in results], self._expected(self.embeddings, 5))
+
+        write_embedding_file(self.temp_path, self.embeddings)
+        meta = read_embedding_meta(self.temp_path)
+        self.assertNotEqual(meta["matrix"], EMBEDDINGS_FILE)
+        self.assertIn("ids_bytes", meta)
+        results = StreamingSearcher(self.temp_path).query(self.query, top_k=5)
+        self.assertEqual([node_id for node_id, _ in results], self._expected(self.embeddings, 5))
+
+    def test_searcher_follows_later_exports(self):
+        """Test that an open searcher picks up rows appended and compacted by later exports"""
+        write_embedding_file(self.temp_path, self.embeddings)
+        searcher = StreamingSearcher(self.temp_path, block_rows=64)
+
+        self.embeddings["exact"] = self.query
+        write_embedding_file(self.temp_path, self.embeddings)
+        self.assertEqual(searcher.query(self.query, top_k=1)[0][0], "exact")
+
+        kept = {node_id: self.embeddings[node_id] for node_id in list(self.embeddings)[:100]}
+        write_embedding_file(self.temp_path, kept)
+        write_embedding_file(self.temp_path, dict(list(kept.items())[:50]))
+        results = searcher.query(self.query, top_k=5)
+        self.assertEqual([node_id for node_id, _ in results], self._expected(dict(list(kept.items())[:50]), 5))
+
+if __name__ == '__main__':
+    unittest.main()
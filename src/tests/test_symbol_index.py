@@ -0,0 +1,63 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from symbol_index import SymbolIndex, navigation_target, python_symbols, script_symbols
+
+SCRIPT_SOURCE = '''export class Client {
+  async connect(url: string): Promise<void> {
+    if (url) {
+    }
+  }
+}
+export const add = (a, b) => a + b;
+const LIMIT = 3;
+'''
+
+class TestSymbolIndex(unittest.TestCase):
+
+    def test_python_symbols(self):
+        """Test that classes, methods, functions and module variables are found with their lines"""
+        symbols = python_symbols("X = 1\nclass A:\n    def m(self):\n        pass\nasync def f():\n    y = 2\n")
+        self.assertEqual([(s['qualified'], s['kind'], s['line']) for s in symbols],
+                         [('X', 'constant', 1), ('A', 'class', 2), ('A.m', 'method', 3), ('f', 'function', 5)])
+
+    def test_script_symbols(self):
+        """Test that TS/JS declarations and class methods are found, but not control flow"""
+        symbols = script_symbols(SCRIPT_SOURCE)
+        self.assertEqual([(s['qualified'], s['kind'], s['line']) for s in symbols],
+                         [('Client', 'class', 1), ('Client.connect', 'method', 2),
+                          ('add', 'function', 7), ('LIMIT', 'variable', 8)])
+
+    def test_navigation_questions(self):
+        """Test that only questions asking where something is defined are recognised"""
+        self.assertEqual(navigation_target("where is `makeQueryEngine` defined?"), "makeQueryEngine")
+        self.assertEqual(navigation_target("Which file defines the CodeStore class?"), "CodeStore")
+        self.assertIsNone(navigation_target("where is the config loaded from the environment?"))
+        self.assertIsNone(navigation_target("How does makeQueryEngine work?"))
+
+    def test_lookup_and_persistence(self):
+        """Test that saved symbols answer lookups, and files not kept are dropped"""
+        with tempfile.TemporaryDirectory() as test_dir:
+            index = SymbolIndex(Path(test_dir) / 'store.json')
+            index.update({'a.py': python_symbols("class A:\n    def run(self):\n        pass\n"),
+                          'b.ts': script_symbols("function run() {}\n")})
+            index.save()
+
+            loaded = SymbolIndex(Path(test_dir) / 'store.json')
+            self.assertEqual([(m['path'], m['line']) for m in loaded.lookup('run')], [('a.py', 2), ('b.ts', 1)])
+            self.assertEqual(len(loaded.lookup('a.run')), 1)
+            self.assertIn('b.ts:1', loaded.answer('where is run defined?'))
+            self.assertIsNone(loaded.answer('where is missing defined?'))
+
+            self.assertFalse(loaded.update({'b.ts': script_symbols("function run() {}\n")}))
+            self.assertTrue(loaded.update({}, keep={'b.ts'}))
+            self.assertEqual(loaded.lookup('A'), [])
+            self.assertFalse(loaded.update({}, keep={'b.ts'}))
+
+if __name__ == '__main__':
+    unittest.main()
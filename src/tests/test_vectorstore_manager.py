@@ -0,0 +1,151 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from llama_index.core import Document
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.settings import Settings
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import vectorstore
+from code_chunker import CodeChunkParser
+from lazy_nodes import LazyNodeRetriever
+from streaming_search import read_embedding_meta
+
+class VectorStoreTestCase(unittest.TestCase):
+    """Runs each test in an empty directory, where the manager keeps its stores."""
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.test_dir.name)
+        Settings.embed_model = MockEmbedding(embed_dim=8)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.test_dir.cleanup()
+
+    def make_store(self, manager, name="docs", texts=("alpha", "beta", "gamma")):
+        manager.add_vector_store(name, "basic")
+        manager.add_to_vector_store(name, [Document(text=text, id_=f"doc-{i}") for i, text in enumerate(texts)])
+
+class TestWarmUp(VectorStoreTestCase):
+
+    def test_basic_store_warms_exports_only(self):
+        """Test that warming a basic store prepares its exports and never loads the docstore"""
+        self.make_store(vectorstore.VectorStoreManager())
+        manager = vectorstore.VectorStoreManager()
+        with mock.patch.object(vectorstore.BasicHandler, "load_store", side_effect=AssertionError("loaded")):
+            warmed = manager.warm_up(["docs"])["docs"].result(timeout=10)
+            self.assertIsInstance(warmed, LazyNodeRetriever)
+            self.assertTrue(manager.is_ready("docs"))
+
+            retriever = manager.get_retriever("docs", similarity_top_k=2)
+            self.assertIs(retriever.searcher, warmed.searcher)
+            self.assertEqual(len(retriever.retrieve("alpha")), 2)
+
+    def test_incomplete_export_fails_warm_up(self):
+        """Test that a store whose exports are damaged is reported as failed, not ready"""
+        self.make_store(vectorstore.VectorStoreManager())
+        manager = vectorstore.VectorStoreManager()
+        store_path = manager.get_store_path("docs")
+        matrix = store_path / read_embedding_meta(store_path)["matrix"]
+        matrix.write_bytes(matrix.read_bytes()[:-4])
+
+        future = manager.warm_up(["docs"])["docs"]
+        with self.assertRaises(ValueError):
+            future.result(timeout=10)
+        self.assertEqual(manager.warm_status("docs"), "failed")
+        self.assertFalse(manager.is_ready("docs"))
+        self.assertEqual(manager.warm_status("other"), "cold")
+
+    def test_writes_reuse_the_loaded_index(self):
+        """Test that a store loaded for writing is kept for later writes"""
+        manager = vectorstore.VectorStoreManager()
+        self.make_store(manager)
+        manager = vectorstore.VectorStoreManager()
+        with mock.patch.object(vectorstore.BasicHandler, "load_store",
+                               wraps=manager.get_handler("basic", manager.get_store_path("docs")).load_store) as load:
+            manager.add_to_vector_store("docs", [Document(text="delta", id_="doc-3")])
+            manager.delete_from_vector_store("docs", ["doc-0"])
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(len(manager.get_retriever("docs", similarity_top_k=10).retrieve("alpha")), 3)
+
+    def test_loaded_index_follows_other_writers(self):
+        """Test that a loaded index is reloaded once another writer persists its store, and can be released"""
+        manager = vectorstore.VectorStoreManager()
+        self.make_store(manager)
+        loaded = manager.get_vector_store("docs")
+        vectorstore.VectorStoreManager().add_to_vector_store("docs", [Document(text="delta", id_="doc-3")])
+
+        reloaded = manager.get_vector_store("docs")
+        self.assertIsNot(reloaded, loaded)
+        self.assertIn("doc-3", reloaded.docstore.get_all_ref_doc_info())
+        self.assertIs(manager.get_vector_store("docs"), reloaded)
+
+        manager.release_vector_store("docs")
+        self.assertNotIn("docs", manager.loaded_indexes)
+
+    def test_documents_are_replaced_chunk_by_chunk(self):
+        """Test that a document added again keeps its unchanged chunks and embeds only the changed ones"""
+        def source(value):
+            return f"def first():\n    return 1\n\n\ndef second():\n    return {value}\n"
+
+        manager = vectorstore.VectorStoreManager()
+        manager.add_vector_store("docs", "basic")
+        embed = mock.patch.object(MockEmbedding, "get_text_embedding_batch", autospec=True,
+                                  side_effect=lambda model, texts, **kwargs: [[0.5] * 8 for _ in texts])
+        self.addCleanup(setattr, Settings, "_node_parser", Settings._node_parser)
+        Settings.node_parser = CodeChunkParser(max_chars=30)
+        with embed as embed_batch:
+            manager.add_to_vector_store("docs", [Document(text=source(2), id_="a.py", metadata={"file_type": ".py"})])
+            before = list(manager.get_vector_store("docs").docstore.get_ref_doc_info("a.py").node_ids)
+            embed_batch.reset_mock()
+            manager.add_to_vector_store("docs", [Document(text=source(3), id_="a.py", metadata={"file_type": ".py"})])
+            after = manager.get_vector_store("docs").docstore.get_ref_doc_info("a.py").node_ids
+
+        self.assertEqual(len(before), 2)
+        self.assertTrue(all(node_id.startswith("a.py#") for node_id in before + after))
+        self.assertEqual(before[0], after[0])
+        self.assertNotEqual(before[1], after[1])
+        self.assertEqual([len(call.args[1]) for call in embed_batch.call_args_list if call.args[1]], [1])
+
+    def test_clear_replaces_warmed_store(self):
+        """Test that a cleared store is empty on disk and for queries, and keeps its registration"""
+        manager = vectorstore.VectorStoreManager()
+        self.make_store(manager)
+        manager.warm_up(["docs"])["docs"].result(timeout=10)
+        manager.clear_vector_store("docs")
+        self.assertEqual(manager.get_retriever("docs", similarity_top_k=10).retrieve("alpha"), [])
+        self.assertTrue(vectorstore.VectorStoreManager().vector_store_exists("docs"))
+        self.assertEqual(len(vectorstore.VectorStoreManager().get_vector_store("docs").docstore.docs), 0)
+        with self.assertRaises(ValueError):
+            manager.clear_vector_store("missing")
+
+class TestGetManager(unittest.TestCase):
+
+    def setUp(self):
+        vectorstore._service_probes.clear()
+        self.addCleanup(vectorstore._service_probes.clear)
+
+    def test_probe_is_cached(self):
+        """Test that getManager probes the service once, not on every call"""
+        from vectorstore_service import VectorStoreClient
+        with mock.patch.dict(os.environ, {"VECTOR_STORE_SERVICE_URL": "http://127.0.0.1:1"}), \
+                mock.patch.object(VectorStoreClient, "is_available", return_value=True) as probe:
+            self.assertIsInstance(vectorstore.getManager(), VectorStoreClient)
+            self.assertIsInstance(vectorstore.getManager(), VectorStoreClient)
+            self.assertEqual(probe.call_count, 1)
+
+            with mock.patch.object(vectorstore, "SERVICE_PROBE_TTL", 0.0):
+                probe.return_value = False
+                self.assertIsInstance(vectorstore.getManager(), vectorstore.VectorStoreManager)
+            self.assertEqual(probe.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
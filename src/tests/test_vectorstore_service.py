@@ -0,0 +1,136 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from llama_index.core import Document
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.settings import Settings
+from llama_index.core.storage.docstore.utils import json_to_doc
+
+# Add the src directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import vectorstore
+from streaming_search import read_embedding_meta
+import vectorstore_service
+from vectorstore_service import VectorStoreClient, VectorStoreService, is_local_client, serve
+
+class ServiceTestCase(unittest.TestCase):
+    """Runs a service on an ephemeral port, with its stores in an empty directory."""
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.test_dir.name)
+        Settings.embed_model = MockEmbedding(embed_dim=8)
+        manager = vectorstore.VectorStoreManager()
+        manager.add_vector_store("docs", "basic")
+        manager.add_to_vector_store("docs", [Document(text=text, id_=f"doc-{i}")
+                                             for i, text in enumerate(("alpha", "beta", "gamma"))])
+
+        self.service = VectorStoreService()
+        self.server = serve("127.0.0.1", 0, self.service)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = VectorStoreClient(f"http://127.0.0.1:{self.server.server_address[1]}", timeout=10)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.cwd)
+        self.test_dir.cleanup()
+
+class TestRoundTrip(ServiceTestCase):
+
+    def stored_ids(self, name="docs"):
+        return sorted(json_to_doc(node["node"]).ref_doc_id for node in self.client.query(name, "alpha", top_k=10))
+
+    def test_upsert_query_delete_stats(self):
+        """Test that documents written through the client are queried and deleted in the service"""
+        self.assertEqual(self.stored_ids(), ["doc-0", "doc-1", "doc-2"])
+        self.assertEqual(self.client.upsert("docs", [Document(text="delta", id_="doc-3")]), 1)
+        self.assertEqual(self.stored_ids(), ["doc-0", "doc-1", "doc-2", "doc-3"])
+        self.assertEqual(self.client.delete("docs", ["doc-0", "doc-3"]), 2)
+        self.assertEqual(self.stored_ids(), ["doc-1", "doc-2"])
+
+        stats = self.client.stats()["stores"]["docs"]
+        self.assertTrue(stats["loaded"])
+        self.assertEqual(stats["nodes"], 2)
+        with self.assertRaises(ValueError):
+            self.client.upsert("missing", [Document(text="x", id_="x")])
+
+    def test_upserts_without_persisting(self):
+        """Test that upserts sent with persist=False reach disk and queries once the store is persisted"""
+        self.client.add_to_vector_store("docs", [Document(text="delta", id_="doc-3")], persist=False)
+        self.assertEqual(self.stored_ids(), ["doc-0", "doc-1", "doc-2"])
+        self.client.persist_vector_store("docs")
+        self.assertEqual(self.stored_ids(), ["doc-0", "doc-1", "doc-2", "doc-3"])
+        with self.assertRaises(ValueError):
+            self.client.persist_vector_store("missing")
+
+    def test_references(self):
+        """Test that references stored through the client are listed on their owner's hits"""
+        copy = Document(text="", id_="copy-0", metadata={"file_path": "copy.py"})
+        self.assertEqual(self.client.reference("docs", [(copy, "doc-0")]), 1)
+        self.assertEqual(self.stored_ids(), ["doc-0", "doc-1", "doc-2"])
+        duplicates = {json_to_doc(node["node"]).ref_doc_id: json_to_doc(node["node"]).metadata.get("duplicates")
+                      for node in self.client.query("docs", "alpha", top_k=10)}
+        self.assertEqual(duplicates, {"doc-0": ["copy.py"], "doc-1": None, "doc-2": None})
+
+    def test_writes_lock_only_their_store(self):
+        """Test that a store being written to blocks neither queries nor writes to other stores"""
+        self.client.add_vector_store("notes", "basic")
+        done = threading.Event()
+
+        def work():
+            self.client.query("docs", "alpha", top_k=1)
+            self.client.upsert("notes", [Document(text="note", id_="note-0")])
+            done.set()
+
+        with self.service.manager.store_lock("docs"):
+            threading.Thread(target=work, daemon=True).start()
+            self.assertTrue(done.wait(timeout=10))
+        self.assertEqual(self.stored_ids("notes"), ["note-0"])
+
+class TestClientWarmUp(ServiceTestCase):
+
+    def test_futures_resolve_when_the_service_is_warm(self):
+        """Test that warm-up futures wait for the service and is_ready reflects its state"""
+        self.assertFalse(self.client.is_ready("docs"))
+        futures = self.client.warm_up(["docs"], poll_interval=0.05)
+        self.assertEqual(futures["docs"].result(timeout=10).name, "docs")
+        self.assertTrue(self.client.is_ready("docs"))
+        self.assertTrue(self.service.manager.is_ready("docs"))
+
+    def test_failed_warm_up_fails_the_future(self):
+        """Test that a store the service cannot warm fails its future"""
+        store_path = self.service.manager.get_store_path("docs")
+        matrix = store_path / read_embedding_meta(store_path)["matrix"]
+        matrix.write_bytes(matrix.read_bytes()[:-4])
+        future = self.client.warm_up(["docs"], poll_interval=0.05)["docs"]
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=10)
+        self.assertFalse(self.client.is_ready("docs"))
+
+    def test_unknown_store(self):
+        """Test that warming an unknown store is rejected"""
+        with self.assertRaises(ValueError):
+            self.client.warm_up(["missing"])
+
+    def test_destructive_ops_are_local_only(self):
+        """Test that deleting or dropping stores is refused to clients on other machines"""
+        self.assertTrue(all(map(is_local_client, ("127.0.0.1", "127.0.0.2", "::1", "::ffff:127.0.0.1"))))
+        self.assertFalse(any(map(is_local_client, ("192.168.1.5", "::ffff:10.0.0.1", "fe80::1%eth0", "host"))))
+
+        with mock.patch.object(vectorstore_service, "is_local_client", return_value=False):
+            for call in (lambda: self.client.delete("docs", ["doc-0"]), lambda: self.client.clear_vector_store("docs"),
+                         lambda: self.client.remove_vector_store("docs")):
+                with self.assertRaises(RuntimeError):
+                    call()
+            self.assertEqual(len(self.client.query("docs", "alpha", top_k=10)), 3)
+
+if __name__ == '__main__':
+    unittest.main()
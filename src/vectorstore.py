@@ -1,20 +1,59 @@
 import os
 import json
+import functools
 import shutil
 import logging
 from pathlib import Path
-from llama_index.core import VectorStoreIndex, StorageContext, load_index_from_storage
+from llama_index.core import Document, QueryBundle, VectorStoreIndex, StorageContext, load_index_from_storage
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
 
 from llama_index.vector_stores.chroma import ChromaVectorStore
 import chromadb
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.core.settings import Settings
 import time
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from streaming_search import StreamingSearcher, embedding_file_exists, write_embedding_file
+from lazy_nodes import LazyNodeRetriever, annotate_duplicates, node_blob_exists, write_node_blob
+from import_graph import DEFAULT_TOKEN_BUDGET, ImportExpandingRetriever, ImportGraph
+from store_manifest import MANIFEST_FILE, verify_manifest, write_manifest
+from code_chunker import assign_chunk_ids, diff_chunks
+
+# Seconds a service availability probe is trusted for
+SERVICE_PROBE_TTL = 60.0
+# Service URL -> (time probed, reachable)
+_service_probes: Dict[str, Tuple[float, bool]] = {}
+_service_probes_lock = threading.Lock()
+
+# The manifest stamp each index was loaded or last persisted at, so a cached
+# index whose store was persisted by another writer since is noticed
+_index_stamps: "weakref.WeakKeyDictionary[VectorStoreIndex, Optional[Tuple[int, int, int]]]" = weakref.WeakKeyDictionary()
+
+def manifest_stamp(index_path) -> Optional[Tuple[int, int, int]]:
+    """Identify a store's last persist by its manifest file, or None if it has none."""
+    try:
+        stats = os.stat(Path(index_path) / MANIFEST_FILE)
+    except OSError:
+        return None
+    return stats.st_ino, stats.st_mtime_ns, stats.st_size
+
+def duplicate_paths(index: VectorStoreIndex) -> Dict[str, List[str]]:
+    """Document id -> paths of the files stored as references to it (see Handler.add_reference)."""
+    duplicates: Dict[str, List[str]] = {}
+    for doc in index.docstore.docs.values():
+        owner = doc.metadata.get('duplicate_of')
+        if owner:
+            duplicates.setdefault(owner, []).append(doc.metadata.get('file_path', doc.doc_id))
+    return {owner: sorted(paths) for owner, paths in duplicates.items()}
 
 class Handler:
     def __init__(self, store_type: str, index_path: Path):
         self.store_type = store_type
-        self.index_path = index_path
+        self.index_path = Path(index_path)
 
     def create_store(self, embed_model: str) -> VectorStoreIndex:
         """Create a new vector store."""
@@ -24,19 +63,86 @@ class Handler:
         """Load an existing vector store."""
         raise NotImplementedError
 
-    def add_to_store(self, index: VectorStoreIndex, documents: list) -> None:
-        """Add documents to the vector store."""
+    def add_to_store(self, index: VectorStoreIndex, documents: list, persist: bool = True) -> None:
+        """Add documents to the vector store, persisting it unless persist is False."""
         raise NotImplementedError
 
     def update_store(self, index: VectorStoreIndex, documents: list) -> None:
         """Update the vector store with new documents."""
         self.add_to_store(index, documents)
 
-    def _insert_documents(self, index: VectorStoreIndex, documents: list) -> None:
-        """Insert documents into the vector store and persist."""
+    def _insert_documents(self, index: VectorStoreIndex, documents: list, persist: bool = True) -> None:
+        """
+        Insert documents into the vector store, replacing any with the same id,
+        and persist unless told not to. Documents are chunked by
+        Settings.node_parser with ids derived from chunk text, so a document
+        already stored keeps its unchanged chunks and their embeddings.
+        """
         for doc in documents:
-            index.insert(doc)
+            nodes = assign_chunk_ids(doc.doc_id, Settings.node_parser.get_nodes_from_documents([doc]))
+            new, change = diff_chunks(index.docstore, doc.doc_id, nodes)
+            if change is None:
+                # A reference may be stored under the document's id
+                self.remove_document(index, doc.doc_id)
+                index.insert_nodes(new)
+            else:
+                self.update_nodes(index, new, *change)
+            index.docstore.set_document_hash(doc.doc_id, doc.hash)
+        if persist:
+            self.persist(index)
+
+    def delete_from_store(self, index: VectorStoreIndex, ref_doc_ids: list) -> None:
+        """Delete documents and all of their nodes, or their references, from the vector store and persist."""
+        for ref_doc_id in ref_doc_ids:
+            self.remove_document(index, ref_doc_id)
+        self.persist(index)
+
+    def remove_document(self, index: VectorStoreIndex, doc_id: str) -> None:
+        """Remove a document's nodes, or the reference stored for a duplicate, if present. Does not persist."""
+        if index.docstore.get_ref_doc_info(doc_id) is not None:
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+        elif index.docstore.document_exists(doc_id):
+            index.docstore.delete_document(doc_id)
+
+    def add_reference(self, index: VectorStoreIndex, doc: Document, canonical_id: str) -> None:
+        """
+        Store a document whose content duplicates canonical_id's as a reference.
+
+        The reference keeps the document's own metadata (file_path etc.) plus
+        'duplicate_of', but no text, nodes or embeddings. Does not persist.
+        """
+        reference = Document(id_=doc.doc_id, text='', metadata={**doc.metadata, 'duplicate_of': canonical_id},
+                             excluded_embed_metadata_keys=doc.excluded_embed_metadata_keys,
+                             excluded_llm_metadata_keys=doc.excluded_llm_metadata_keys)
+        index.docstore.add_documents([reference], allow_update=True)
+
+    def update_nodes(self, index: VectorStoreIndex, nodes: list, kept: list, removed_ids: list) -> None:
+        """
+        Apply a chunk-level change to a document already in the store: delete
+        its removed chunks, refresh the stored metadata of kept chunks without
+        touching their embeddings, and insert the new, embedded chunks. Does
+        not persist.
+        """
+        if removed_ids:
+            index.delete_nodes(removed_ids, delete_from_docstore=True)
+            for node_id in removed_ids:
+                index.index_struct.nodes_dict.pop(node_id, None)
+            index.storage_context.index_store.add_index_struct(index.index_struct)
+        if kept:
+            index.docstore.add_documents(kept, allow_update=True)
+        if nodes:
+            index.insert_nodes(nodes)
+
+    def persist(self, index: VectorStoreIndex) -> None:
+        """Persist the vector store to disk, followed by its checksummed manifest."""
         index.storage_context.persist(persist_dir=self.index_path)
+        self.export(index)
+        write_manifest(self.index_path)
+        _index_stamps[index] = manifest_stamp(self.index_path)
+
+    def export(self, index: VectorStoreIndex) -> None:
+        """Write any extra files the store keeps beside the persisted index."""
+        pass
 
 class BasicHandler(Handler):
     def create_store(self, embed_model: str) -> VectorStoreIndex:
@@ -48,7 +154,7 @@ class BasicHandler(Handler):
             raise RuntimeError(f"Failed to create directory {self.index_path}: {e}")
 
         index = VectorStoreIndex([], embed_model=embed_model)
-        index.storage_context.persist(persist_dir=self.index_path)
+        self.persist(index)
         return index
 
     def load_store(self) -> VectorStoreIndex:
@@ -68,9 +174,27 @@ class BasicHandler(Handler):
             # Create a new store
             return self.create_store(Settings.embed_model)
 
-    def add_to_store(self, index: VectorStoreIndex, documents: list) -> None:
+    def add_to_store(self, index: VectorStoreIndex, documents: list, persist: bool = True) -> None:
         """Add documents to the basic vector store."""
-        self._insert_documents(index, documents)
+        self._insert_documents(index, documents, persist)
+
+    def export(self, index: VectorStoreIndex) -> None:
+        """Write the streaming exports used for out-of-core search."""
+        # Nodes first, so every row a searcher can find already has a node to load
+        self.export_nodes(index)
+        self.export_embeddings(index)
+
+    def export_embeddings(self, index: VectorStoreIndex) -> int:
+        """Export the store's embeddings for out-of-core streaming search."""
+        embedding_dict = index.vector_store.to_dict().get("embedding_dict", {})
+        return write_embedding_file(self.index_path, embedding_dict)
+
+    def export_nodes(self, index: VectorStoreIndex) -> int:
+        """Export the store's nodes for lazy loading at query time."""
+        # References to duplicate files have no nodes of their own to load
+        return write_node_blob(self.index_path, (node for node in index.docstore.docs.values()
+                                                 if 'duplicate_of' not in node.metadata),
+                               duplicate_paths(index))
 
 class ChromaHandler(Handler):
     def create_store(self, embed_model: str) -> VectorStoreIndex:
@@ -86,7 +210,7 @@ class ChromaHandler(Handler):
         vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
         storage_context = StorageContext.from_defaults(vector_store=vector_store)
         index = VectorStoreIndex([], storage_context=storage_context, embed_model=embed_model)
-        index.storage_context.persist(persist_dir=self.index_path)
+        self.persist(index)
         return index
 
     def load_store(self) -> VectorStoreIndex:
@@ -109,15 +233,28 @@ class ChromaHandler(Handler):
             # Create a new store
             return self.create_store(Settings.embed_model)
 
-    def add_to_store(self, index: VectorStoreIndex, documents: list) -> None:
+    def add_to_store(self, index: VectorStoreIndex, documents: list, persist: bool = True) -> None:
         """Add documents to the Chroma vector store."""
-        self._insert_documents(index, documents)
+        self._insert_documents(index, documents, persist)
 
 class VectorStoreManager:
-    def __init__(self):
+    def __init__(self, save_index: bool = True):
+        """
+        Args:
+            save_index: Write changes to the store registry file. Processes that
+                share a registry with a parent that owns it pass False.
+        """
         self.index_base_path = Path("vector_stores")
         self.vs_index_path = self.index_base_path / "vector_store_index.json"
+        self.save_index = save_index
         self.vs_index = self.load_vsIndex()
+        # Futures for stores loaded in the background by warm_up()
+        self.warm_futures: Dict[str, Future] = {}
+        self.warm_lock = threading.Lock()
+        # One lock per store, held while it is written to so writers take turns
+        self.store_locks: Dict[str, threading.RLock] = {}
+        # Indexes loaded on demand by get_vector_store
+        self.loaded_indexes: Dict[str, VectorStoreIndex] = {}
 
     def load_vsIndex(self) -> dict:
         """Load the vector store index from a JSON file."""
@@ -128,6 +265,8 @@ class VectorStoreManager:
 
     def save_vsIndex(self) -> None:
         """Save the vector store index to a JSON file."""
+        if not self.save_index:
+            return
         # Create the directory and any necessary parent directories
         self.vs_index_path.parent.mkdir(parents=True, exist_ok=True)
         
@@ -201,51 +340,346 @@ class VectorStoreManager:
             return self.get_vector_store(name)
 
     def get_vector_store(self, name: str) -> VectorStoreIndex:
-        """Retrieve a vector store by name."""
+        """
+        Retrieve a vector store by name, reusing a warmed index if there is
+        one. Otherwise it is loaded on first use and kept for later writes
+        until release_vector_store drops it, or until another writer
+        persists the store, which loads it again.
+        """
         if name in self.vs_index:
-            store_info = self.vs_index[name]
-            handler = self.get_handler(store_info["type"], store_info["path"])
-            logging.info(f"Preloading vector store '{name}'")
-            return handler.load_store()
+            warmed = self._get_warmed_store(name)
+            if isinstance(warmed, VectorStoreIndex):
+                return warmed
+            with self.store_lock(name):
+                store_info = self.vs_index[name]
+                stamp = manifest_stamp(store_info["path"])
+                index = self.loaded_indexes.get(name)
+                if index is not None and _index_stamps.get(index) != stamp:
+                    logging.info(f"Vector store '{name}' was persisted elsewhere, reloading it")
+                    index = None
+                if index is None:
+                    handler = self.get_handler(store_info["type"], store_info["path"])
+                    logging.info(f"Preloading vector store '{name}'")
+                    index = self.loaded_indexes[name] = handler.load_store()
+                    _index_stamps.setdefault(index, stamp)
+                return index
         else:
             raise ValueError(f"Vector store '{name}' not found.")
 
+    def release_vector_store(self, name: str) -> None:
+        """
+        Drop the index get_vector_store loaded for a store, e.g. once an
+        indexing run is done with it. Queries read the store's exports, so
+        nothing else needs its docstore in memory.
+        """
+        with self.store_lock(name):
+            self.loaded_indexes.pop(name, None)
+
+    def warm_up(self, names: Optional[List[str]] = None, max_workers: int = 4) -> Dict[str, Future]:
+        """
+        Prepare vector stores for queries concurrently in background threads.
+
+        Only what the query path reads is warmed. Basic stores are queried
+        through their on-disk exports, so their embedding matrix is paged in
+        by a probe search and their node index loaded, without ever loading
+        the docstore; get_retriever and stream_query reuse them. Other store
+        types are queried through the loaded index, which get_vector_store
+        then reuses too. Stores that are already warming are not warmed twice.
+
+        Args:
+            names: Stores to warm up, defaults to every registered store
+            max_workers: Number of stores warmed at once
+
+        Returns:
+            Dict[str, Future]: Future per store resolving to its LazyNodeRetriever
+                (basic stores) or loaded index, or failing if it is unusable
+        """
+        names = list(self.vs_index) if names is None else names
+        unknown = [name for name in names if name not in self.vs_index]
+        if unknown:
+            raise ValueError(f"Vector stores not found: {', '.join(unknown)}")
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vectorstore-warmup")
+        futures = {}
+        with self.warm_lock:
+            for name in names:
+                if name not in self.warm_futures:
+                    self.warm_futures[name] = executor.submit(self._warm_store, name)
+                futures[name] = self.warm_futures[name]
+        executor.shutdown(wait=False)
+        logging.info(f"Warming up {len(names)} vector stores with {max_workers} workers")
+        return futures
+
+    def warm_status(self, name: str) -> str:
+        """'ready', 'warming' or 'failed' for a store passed to warm_up, 'cold' otherwise."""
+        with self.warm_lock:
+            future = self.warm_futures.get(name)
+        if future is None:
+            return "cold"
+        if not future.done():
+            return "warming"
+        return "failed" if future.exception() is not None else "ready"
+
+    def is_ready(self, name: str) -> bool:
+        """Check whether a store has finished warming up successfully."""
+        return self.warm_status(name) == "ready"
+
+    def _warm_store(self, name: str):
+        """Warm a single store's query path for warm_up and check that it is usable."""
+        start = time.time()
+        store_info = self.vs_index[name]
+        store_path = Path(store_info["path"])
+        if not store_path.exists():
+            raise FileNotFoundError(f"Vector store '{name}' has no files at {store_path}")
+
+        report = verify_manifest(store_path)
+        if not report["ok"] and "error" not in report:
+            logging.warning(f"Vector store '{name}' does not match its manifest: {report}")
+
+        if store_info["type"] != "basic":
+            handler = self.get_handler(store_info["type"], store_path)
+            index = handler.load_store()
+            logging.info(f"Warmed vector store '{name}' in {time.time() - start:.2f}s")
+            return index
+
+        # Opening the searcher checks that the matrix holds every row its meta lists
+        retriever = LazyNodeRetriever(self._ensure_exports(name))
+        searcher, node_store = retriever.searcher, retriever.node_store
+        live = searcher.meta["live"]
+        if live != len(node_store):
+            # A persist may have landed between opening the two
+            searcher.refresh()
+            node_store.refresh()
+            live = searcher.meta["live"]
+        if live != len(node_store):
+            raise ValueError(f"Vector store '{name}' exports disagree: {live} embeddings, {len(node_store)} nodes")
+        if live:
+            # Reads every block, paging the matrix in, and loads the best node from the blob
+            probe = [1.0] + [0.0] * (searcher.dim - 1)
+            hits = searcher.query(probe, top_k=1)
+            if not hits or not node_store.get_many([hits[0][0]]):
+                raise ValueError(f"Vector store '{name}' has embeddings without nodes")
+        logging.info(f"Warmed vector store '{name}' ({live} nodes) in {time.time() - start:.2f}s")
+        return retriever
+
+    def _get_warmed_store(self, name: str):
+        """Return what warm_up prepared, waiting for it if needed, or None if it was not warmed or failed."""
+        with self.warm_lock:
+            future = self.warm_futures.get(name)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            logging.warning(f"Warm-up of vector store '{name}' failed, loading on demand: {e}")
+            with self.warm_lock:
+                self.warm_futures.pop(name, None)
+            return None
+
+    def _forget_warmed_store(self, name: str) -> None:
+        """Drop a warmed or loaded index that no longer matches the store on disk."""
+        with self.warm_lock:
+            self.warm_futures.pop(name, None)
+            self.loaded_indexes.pop(name, None)
+
+    def store_lock(self, name: str) -> threading.RLock:
+        """
+        The lock held while a store is written to. Ingestion pipelines hold
+        it for a whole run, so e.g. a watcher's updates wait for the initial
+        index instead of interleaving with it.
+        """
+        with self.warm_lock:
+            return self.store_locks.setdefault(name, threading.RLock())
+
     def add_to_vector_store(self, name: str, documents: list) -> None:
         """Add documents to a specified vector store."""
         if name in self.vs_index:
             store_info = self.vs_index[name]
             handler = self.get_handler(store_info["type"], store_info["path"])
-            try:
-                index = handler.load_store()
-                handler.add_to_store(index, documents)
-                # Update timestamp on successful addition
-                self.update_store_timestamp(name)
-            except Exception as e:
-                logging.error(f"Error adding to vector store '{name}': {e}")
-                # Attempt to recreate the store if it's corrupted
+            with self.store_lock(name):
                 try:
-                    logging.warning(f"Attempting to recreate vector store '{name}'")
-                    index = handler.create_store(Settings.embed_model)
+                    index = self.get_vector_store(name)
                     handler.add_to_store(index, documents)
-                    # Update timestamp on successful recreation
+                    # Update timestamp on successful addition
                     self.update_store_timestamp(name)
-                    logging.info(f"Successfully recreated vector store '{name}'")
-                except Exception as recovery_err:
-                    logging.error(f"Failed to recover vector store '{name}': {recovery_err}")
-                    raise recovery_err
+                except Exception as e:
+                    logging.error(f"Error adding to vector store '{name}': {e}")
+                    # Attempt to recreate the store if it's corrupted
+                    try:
+                        logging.warning(f"Attempting to recreate vector store '{name}'")
+                        self._forget_warmed_store(name)
+                        index = handler.create_store(Settings.embed_model)
+                        handler.add_to_store(index, documents)
+                        # Update timestamp on successful recreation
+                        self.update_store_timestamp(name)
+                        logging.info(f"Successfully recreated vector store '{name}'")
+                    except Exception as recovery_err:
+                        logging.error(f"Failed to recover vector store '{name}': {recovery_err}")
+                        raise recovery_err
         else:
             raise ValueError(f"Vector store '{name}' not found.")
 
+    def add_references(self, name: str, references: List[Tuple[Document, str]], persist: bool = True) -> None:
+        """
+        Store documents as references to the documents holding their content
+        (see Handler.add_reference), replacing whatever is stored under their ids.
+
+        Args:
+            name: Store name
+            references: (document, id of the document whose content it duplicates) pairs
+            persist: Persist the store afterwards; pass False when persist_vector_store follows
+        """
+        if name not in self.vs_index:
+            raise ValueError(f"Vector store '{name}' not found.")
+        store_info = self.vs_index[name]
+        handler = self.get_handler(store_info["type"], store_info["path"])
+        with self.store_lock(name):
+            index = self.get_vector_store(name)
+            for doc, owner in references:
+                handler.remove_document(index, doc.doc_id)
+                handler.add_reference(index, doc, owner)
+            if persist:
+                handler.persist(index)
+            self.update_store_timestamp(name)
+
+    def persist_vector_store(self, name: str) -> None:
+        """Persist a store written to without persisting, e.g. by a batch of service upserts."""
+        if name not in self.vs_index:
+            raise ValueError(f"Vector store '{name}' not found.")
+        store_info = self.vs_index[name]
+        handler = self.get_handler(store_info["type"], store_info["path"])
+        with self.store_lock(name):
+            handler.persist(self.get_vector_store(name))
+            self.update_store_timestamp(name)
+
     def update_vector_store(self, name: str, documents: list) -> None:
         """Update a specified vector store with new documents."""
         if name in self.vs_index:
             store_info = self.vs_index[name]
             handler = self.get_handler(store_info["type"], store_info["path"])
-            index = handler.load_store()
-            handler.update_store(index, documents)
+            with self.store_lock(name):
+                index = self.get_vector_store(name)
+                handler.update_store(index, documents)
+        else:
+            raise ValueError(f"Vector store '{name}' not found.")
+
+    def delete_from_vector_store(self, name: str, ref_doc_ids: list) -> None:
+        """Delete documents, by document id, from a specified vector store."""
+        if name in self.vs_index:
+            store_info = self.vs_index[name]
+            handler = self.get_handler(store_info["type"], store_info["path"])
+            with self.store_lock(name):
+                index = self.get_vector_store(name)
+                handler.delete_from_store(index, ref_doc_ids)
+                self.update_store_timestamp(name)
         else:
             raise ValueError(f"Vector store '{name}' not found.")
 
+    def stream_query(self, name: str, query, top_k: int = 10,
+                     block_rows: int = 16384, max_workers: int = 2) -> list:
+        """
+        Run an exact top-k search without loading the store into memory.
+
+        Args:
+            name: Name of a basic vector store
+            query: Query string, or a precomputed query embedding
+            top_k: Number of results to return
+            block_rows: Embedding rows scored per block
+            max_workers: Threads reading blocks ahead of the one being scored
+
+        Returns:
+            list: (node_id, score) pairs, best first
+        """
+        index_path = self._ensure_exports(name)
+        if isinstance(query, str):
+            query = Settings.embed_model.get_query_embedding(query)
+        warmed = self._get_warmed_store(name)
+        if isinstance(warmed, LazyNodeRetriever) and (warmed.searcher.block_rows, warmed.searcher.max_workers) == (
+                block_rows, max_workers):
+            searcher = warmed.searcher
+        else:
+            searcher = StreamingSearcher(index_path, block_rows=block_rows, max_workers=max_workers)
+        return searcher.query(query, top_k=top_k)
+
+    def get_retriever(self, name: str, similarity_top_k: int = 10, expand_imports: bool = False,
+                      import_token_budget: int = DEFAULT_TOKEN_BUDGET):
+        """
+        Get a retriever for a vector store.
+
+        Basic stores are served by a LazyNodeRetriever, which scores the
+        on-disk embeddings and reads only the top-k nodes' text, so the
+        docstore is never loaded. Other store types load the full index.
+        Either way, hits whose content other files duplicate list those
+        files' paths in metadata['duplicates'].
+
+        Args:
+            name: Store name
+            similarity_top_k: Hits retrieved by similarity
+            expand_imports: Also return chunks of modules the hits import or
+                are imported by, when they define symbols the hits mention
+            import_token_budget: Estimated tokens those extra chunks may add
+        """
+        if name not in self.vs_index:
+            raise ValueError(f"Vector store '{name}' not found.")
+        if self.vs_index[name]["type"] == "basic":
+            warmed = self._get_warmed_store(name)
+            if isinstance(warmed, LazyNodeRetriever):
+                # Share the warmed searcher and node cache; they follow later persists
+                retriever = LazyNodeRetriever(warmed.searcher.index_path, similarity_top_k=similarity_top_k,
+                                              searcher=warmed.searcher, node_store=warmed.node_store)
+            else:
+                retriever = LazyNodeRetriever(self._ensure_exports(name), similarity_top_k=similarity_top_k)
+            document_nodes = retriever.node_store.get_document_nodes
+        else:
+            index = self.get_vector_store(name)
+            retriever = DuplicateAnnotatingRetriever(index.as_retriever(similarity_top_k=similarity_top_k),
+                                                     duplicate_paths(index))
+            document_nodes = functools.partial(self._document_nodes, index)
+
+        graph = ImportGraph.for_store(name) if expand_imports else None
+        if graph is None or not graph.exists():
+            return retriever
+        return ImportExpandingRetriever(retriever, graph, document_nodes, token_budget=import_token_budget)
+
+    def _document_nodes(self, index: VectorStoreIndex, doc_id: str) -> list:
+        """A document's nodes from a loaded index's docstore."""
+        info = index.docstore.get_ref_doc_info(doc_id)
+        return index.docstore.get_nodes(info.node_ids, raise_error=False) if info else []
+
+    def _ensure_exports(self, name: str) -> Path:
+        """Make sure a basic store has its embedding and node exports, returning its path."""
+        if name not in self.vs_index:
+            raise ValueError(f"Vector store '{name}' not found.")
+        store_info = self.vs_index[name]
+        if store_info["type"] != "basic":
+            raise ValueError(f"Streaming search is only supported for basic stores, not '{store_info['type']}'")
+
+        index_path = Path(store_info["path"])
+        if not embedding_file_exists(index_path) or not node_blob_exists(index_path):
+            # Stores persisted before exports existed need a one-time full load
+            logging.warning(f"No streaming exports for '{name}', exporting from the loaded store")
+            handler = self.get_handler(store_info["type"], index_path)
+            index = handler.load_store()
+            handler.export_embeddings(index)
+            handler.export_nodes(index)
+        return index_path
+
+    def verify_store(self, name: str, deep: bool = False, max_workers: int = 4) -> Dict:
+        """
+        Check a vector store's files against the manifest written at persist time.
+
+        Args:
+            name: Name of the vector store
+            deep: Re-hash file contents in parallel instead of only comparing sizes
+            max_workers: Threads used for hashing in deep mode
+
+        Returns:
+            Dict: Report with 'ok' plus lists of missing, resized and corrupted files
+        """
+        if name not in self.vs_index:
+            raise ValueError(f"Vector store '{name}' not found.")
+        return verify_manifest(self.vs_index[name]["path"], deep=deep, max_workers=max_workers)
+
     def get_index_path(self) -> str:
         """Get the base path for vector stores."""
         return str(self.index_base_path)
@@ -266,6 +700,7 @@ class VectorStoreManager:
                     return False
 
             # Remove the store from the index
+            self._forget_warmed_store(name)
             del self.vs_index[name]
             self.save_vsIndex()
             logging.info(f"Removed '{name}' from the vector store index")
@@ -274,6 +709,22 @@ class VectorStoreManager:
             logging.warning(f"Vector store '{name}' not found")
             return False
 
+    def clear_vector_store(self, name: str) -> VectorStoreIndex:
+        """Replace a vector store with an empty one of the same type, e.g. before a full rebuild."""
+        if name not in self.vs_index:
+            raise ValueError(f"Vector store '{name}' not found.")
+        with self.store_lock(name):
+            store_info = self.vs_index[name]
+            store_path = Path(store_info["path"])
+            self._forget_warmed_store(name)
+            if store_path.exists():
+                shutil.rmtree(store_path)
+            handler = self.get_handler(store_info["type"], store_path)
+            index = handler.create_store(Settings.embed_model)
+            self.loaded_indexes[name] = index
+            logging.info(f"Cleared vector store '{name}'")
+            return index
+
     def get_store_path(self, name: str) -> Path:
         """Get the path of a specified vector store."""
         if name in self.vs_index:
@@ -281,6 +732,38 @@ class VectorStoreManager:
         else:
             raise ValueError(f"Vector store '{name}' not found.")
 
-def getManager() -> VectorStoreManager:
-    """Get an instance of the VectorStoreManager."""
+class DuplicateAnnotatingRetriever(BaseRetriever):
+    """Wraps a loaded index's retriever, listing each hit's duplicate files (see annotate_duplicates)."""
+
+    def __init__(self, retriever: BaseRetriever, duplicates: Dict[str, List[str]]):
+        super().__init__()
+        self.retriever = retriever
+        self.duplicates = duplicates
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        hits = self.retriever.retrieve(query_bundle)
+        return annotate_duplicates(hits, lambda doc_id: self.duplicates.get(doc_id, []))
+
+def getManager():
+    """
+    Get a vector store manager.
+
+    When VECTOR_STORE_SERVICE_URL is set and the service is reachable, this
+    returns a VectorStoreClient that shares the service's hot indexes;
+    otherwise it returns a local VectorStoreManager. Whether the service is
+    reachable is remembered for SERVICE_PROBE_TTL seconds, so repeated calls
+    do not each wait on the network.
+    """
+    if os.environ.get("VECTOR_STORE_SERVICE_URL"):
+        from vectorstore_service import VectorStoreClient
+        client = VectorStoreClient()
+        with _service_probes_lock:
+            probed, available = _service_probes.get(client.url, (0.0, False))
+            if time.time() - probed > SERVICE_PROBE_TTL:
+                available = client.is_available()
+                _service_probes[client.url] = (time.time(), available)
+        if available:
+            logging.info(f"Using vector store service at {client.url}")
+            return client
+        logging.warning(f"Vector store service at {client.url} is unavailable, loading stores locally")
     return VectorStoreManager()
\ No newline at end of file
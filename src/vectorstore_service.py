@@ -0,0 +1,409 @@
+"""Local vector store service shared by all Yeshie Python processes.
+
+One daemon owns the stores and keeps loaded indexes hot; other processes talk
+to it over localhost HTTP through VectorStoreClient, which mirrors the
+VectorStoreManager interface.
+
+Run the daemon with:
+    python vectorstore_service.py [--port 3200]
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import ipaddress
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from llama_index.core import Document, QueryBundle, VectorStoreIndex
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+
+import vectorstore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 3200
+SERVICE_URL_ENV = "VECTOR_STORE_SERVICE_URL"
+# Operations that drop stored data, accepted only from clients on this machine
+LOCAL_ONLY_OPERATIONS = ("delete", "clear", "remove")
+
+
+def is_local_client(address: str) -> bool:
+    """Whether a client address is a loopback one, i.e. the client runs on this machine."""
+    try:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+    except ValueError:
+        return False
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_loopback
+
+
+class VectorStoreService:
+    """
+    Owns a VectorStoreManager, whose loaded indexes take its writes.
+
+    Requests run concurrently. Writes to a store hold that store's lock from
+    the manager, so writers to different stores do not wait for each other,
+    and queries take no lock: they read the exports a persist replaces
+    atomically. self.lock only guards the store registry.
+    """
+
+    def __init__(self, manager: Optional[vectorstore.VectorStoreManager] = None):
+        self.manager = manager or vectorstore.VectorStoreManager()
+        self.lock = threading.RLock()
+        self.started = time.time()
+
+    def _handler(self, name: str) -> vectorstore.Handler:
+        store_info = self.manager.vs_index[name]
+        return self.manager.get_handler(store_info["type"], Path(store_info["path"]))
+
+    def _index(self, name: str) -> VectorStoreIndex:
+        """Return the index writes to a store go to, as the manager keeps it. Caller holds the store's lock."""
+        return self.manager.get_vector_store(name)
+
+    def query(self, name: str, query: str, top_k: int = 10) -> List[Dict]:
+        """Retrieve the top_k nodes for a query string, through the store's warmed query path."""
+        retriever = self.manager.get_retriever(name, similarity_top_k=top_k)
+        return [{"node": doc_to_json(node.node), "score": node.score}
+                for node in retriever.retrieve(query)]
+
+    def upsert(self, name: str, documents: List[Dict], persist: bool = True) -> int:
+        """
+        Insert documents, replacing any already stored under the same id.
+        Writers sending many batches pass persist=False and call persist
+        once in a while, as every persist writes the whole store.
+        """
+        docs = [json_to_doc(doc) for doc in documents]
+        with self.manager.store_lock(name):
+            index = self._index(name)
+            self._handler(name).add_to_store(index, docs, persist=persist)
+        self.touch(name)
+        return len(docs)
+
+    def reference(self, name: str, references: List[Dict], persist: bool = True) -> int:
+        """Store documents as references to the documents holding their content."""
+        pairs = [(json_to_doc(reference["document"]), reference["duplicate_of"]) for reference in references]
+        self.manager.add_references(name, pairs, persist=persist)
+        return len(pairs)
+
+    def persist(self, name: str) -> None:
+        """Persist a store written to with persist=False."""
+        self.manager.persist_vector_store(name)
+
+    def delete(self, name: str, ref_doc_ids: List[str]) -> int:
+        """Delete documents and all of their nodes from a store."""
+        with self.manager.store_lock(name):
+            index = self._index(name)
+            self._handler(name).delete_from_store(index, ref_doc_ids)
+        self.touch(name)
+        return len(ref_doc_ids)
+
+    def stats(self) -> Dict:
+        """Report the registered stores and which of them are loaded."""
+        with self.lock:
+            registry = dict(self.manager.vs_index)
+        stores = {}
+        for name, store_info in registry.items():
+            index = self.manager.loaded_indexes.get(name)
+            stores[name] = {**store_info, "loaded": index is not None}
+            if index is not None:
+                stores[name]["nodes"] = len(index.docstore.docs)
+        return {"uptime": time.time() - self.started, "stores": stores}
+
+    def exists(self, name: str) -> bool:
+        with self.lock:
+            return self.manager.vector_store_exists(name)
+
+    def timestamp(self, name: str) -> float:
+        with self.lock:
+            return self.manager.get_store_timestamp(name)
+
+    def touch(self, name: str) -> None:
+        with self.lock:
+            self.manager.update_store_timestamp(name)
+
+    def create(self, name: str, store_type: str) -> None:
+        with self.lock, self.manager.store_lock(name):
+            self.manager.add_vector_store(name, store_type)
+
+    def warm_up(self, names: Optional[List[str]] = None, max_workers: int = 4) -> List[str]:
+        futures = self.manager.warm_up(names, max_workers=max_workers)
+        return list(futures)
+
+    def ready(self, names: List[str]) -> Dict[str, str]:
+        """Warm-up state of each store: 'ready', 'warming', 'failed' or 'cold'."""
+        return {name: self.manager.warm_status(name) for name in names}
+
+    def verify(self, name: str, deep: bool = False) -> Dict:
+        with self.manager.store_lock(name):
+            return self.manager.verify_store(name, deep=deep)
+
+    def clear(self, name: str) -> None:
+        with self.lock, self.manager.store_lock(name):
+            self.manager.clear_vector_store(name)
+
+    def remove(self, name: str) -> bool:
+        with self.lock, self.manager.store_lock(name):
+            return self.manager.remove_vector_store(name)
+
+    def path(self, name: str) -> str:
+        return str(self.manager.get_store_path(name))
+
+    def index_path(self) -> str:
+        return self.manager.get_index_path()
+
+    OPERATIONS = ("query", "upsert", "reference", "persist", "delete", "stats", "exists", "timestamp",
+                  "touch", "create", "clear", "remove", "path", "index_path", "warm_up", "ready", "verify")
+
+    def dispatch(self, op: str, params: Dict):
+        """Run a named operation with keyword parameters."""
+        if op not in self.OPERATIONS:
+            raise ValueError(f"Unknown operation: {op}")
+        return getattr(self, op)(**params)
+
+
+def make_request_handler(service: VectorStoreService):
+    """Build an HTTP handler class bound to a service instance."""
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            op = self.path.strip("/")
+            if op in LOCAL_ONLY_OPERATIONS and not is_local_client(self.client_address[0]):
+                self._reply(403, {"error": f"'{op}' is only accepted from this machine"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                params = json.loads(self.rfile.read(length) or b"{}")
+                self._reply(200, {"result": service.dispatch(op, params)})
+            except ValueError as e:
+                self._reply(400, {"error": str(e)})
+            except Exception as e:
+                logging.error(f"Vector store service error in '{op}': {e}")
+                self._reply(500, {"error": str(e)})
+
+        def _reply(self, status: int, body: Dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            logging.debug(f"Vector store service: {format % args}")
+
+    return RequestHandler
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          service: Optional[VectorStoreService] = None) -> ThreadingHTTPServer:
+    """Create the HTTP server for a service. Call serve_forever() to run it."""
+    service = service or VectorStoreService()
+    server = ThreadingHTTPServer((host, port), make_request_handler(service))
+    if host != "localhost" and not is_local_client(host):
+        logging.warning(f"Vector store service reachable at {host}; {', '.join(LOCAL_ONLY_OPERATIONS)} "
+                        f"are still only accepted from this machine")
+    logging.info(f"Vector store service listening on http://{host}:{port}")
+    return server
+
+
+class RemoteRetriever(BaseRetriever):
+    """Retriever that runs the similarity search inside the service."""
+
+    def __init__(self, client: "VectorStoreClient", name: str, similarity_top_k: int = 10):
+        super().__init__()
+        self.client = client
+        self.name = name
+        self.similarity_top_k = similarity_top_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        nodes = self.client.query(self.name, query_bundle.query_str, self.similarity_top_k)
+        return [NodeWithScore(node=json_to_doc(node["node"]), score=node["score"]) for node in nodes]
+
+
+class RemoteVectorStore:
+    """Stand-in for a VectorStoreIndex that lives in the service."""
+
+    def __init__(self, client: "VectorStoreClient", name: str):
+        self.client = client
+        self.name = name
+
+    def as_retriever(self, similarity_top_k: int = 10, **kwargs) -> RemoteRetriever:
+        return RemoteRetriever(self.client, self.name, similarity_top_k)
+
+    def insert(self, document: Document) -> None:
+        self.client.upsert(self.name, [document])
+
+
+class VectorStoreClient:
+    """Thin client for the vector store service with the VectorStoreManager interface."""
+
+    def __init__(self, url: Optional[str] = None, timeout: float = 60.0):
+        self.url = (url or os.environ.get(SERVICE_URL_ENV) or f"http://{DEFAULT_HOST}:{DEFAULT_PORT}").rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, op: str, **params):
+        request = urllib.request.Request(
+            f"{self.url}/{op}",
+            data=json.dumps(params).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())["result"]
+        except urllib.error.HTTPError as e:
+            message = json.loads(e.read() or b"{}").get("error", str(e))
+            if e.code == 400:
+                raise ValueError(message)
+            raise RuntimeError(f"Vector store service error: {message}")
+
+    def is_available(self) -> bool:
+        """Check whether the service is reachable."""
+        try:
+            self._call("stats")
+            return True
+        except (OSError, RuntimeError):
+            return False
+
+    def query(self, name: str, query: str, top_k: int = 10) -> List[Dict]:
+        return self._call("query", name=name, query=query, top_k=top_k)
+
+    def upsert(self, name: str, documents: list, persist: bool = True) -> int:
+        return self._call("upsert", name=name, documents=[doc_to_json(doc) for doc in documents], persist=persist)
+
+    def reference(self, name: str, references: list, persist: bool = True) -> int:
+        return self._call("reference", name=name, references=[{"document": doc_to_json(doc), "duplicate_of": owner}
+                                                              for doc, owner in references], persist=persist)
+
+    def persist(self, name: str) -> None:
+        self._call("persist", name=name)
+
+    def delete(self, name: str, ref_doc_ids: List[str]) -> int:
+        return self._call("delete", name=name, ref_doc_ids=ref_doc_ids)
+
+    def stats(self) -> Dict:
+        return self._call("stats")
+
+    # VectorStoreManager interface
+
+    def vector_store_exists(self, name: str) -> bool:
+        return self._call("exists", name=name)
+
+    def get_store_timestamp(self, name: str) -> float:
+        return self._call("timestamp", name=name)
+
+    def update_store_timestamp(self, name: str) -> None:
+        self._call("touch", name=name)
+
+    def add_vector_store(self, name: str, store_type: str) -> RemoteVectorStore:
+        self._call("create", name=name, store_type=store_type)
+        return RemoteVectorStore(self, name)
+
+    def get_vector_store(self, name: str) -> RemoteVectorStore:
+        if not self.vector_store_exists(name):
+            raise ValueError(f"Vector store '{name}' not found.")
+        return RemoteVectorStore(self, name)
+
+    def get_retriever(self, name: str, similarity_top_k: int = 10) -> RemoteRetriever:
+        return self.get_vector_store(name).as_retriever(similarity_top_k=similarity_top_k)
+
+    def warm_up(self, names: Optional[List[str]] = None, max_workers: int = 4,
+                poll_interval: float = 0.2) -> Dict[str, Future]:
+        """
+        Ask the service to warm stores. Each future resolves once the service
+        reports the store warmed, or fails if warming it failed there.
+        """
+        futures = {name: Future() for name in self._call("warm_up", names=names, max_workers=max_workers)}
+        threading.Thread(target=self._await_warm_up, args=(dict(futures), poll_interval),
+                         name="vectorstore-warmup-poll", daemon=True).start()
+        return futures
+
+    def _await_warm_up(self, pending: Dict[str, Future], poll_interval: float) -> None:
+        """Poll the service until every pending store is warmed or has failed."""
+        while pending:
+            try:
+                states = self._call("ready", names=list(pending))
+            except (OSError, RuntimeError, ValueError) as e:
+                for future in pending.values():
+                    future.set_exception(e)
+                return
+            for name, state in states.items():
+                if state == "ready":
+                    pending.pop(name).set_result(RemoteVectorStore(self, name))
+                elif state != "warming":
+                    pending.pop(name).set_exception(
+                        RuntimeError(f"Vector store '{name}' failed to warm up in the service"))
+            if pending:
+                time.sleep(poll_interval)
+
+    def is_ready(self, name: str) -> bool:
+        """Check whether the service has finished warming a store successfully."""
+        return self._call("ready", names=[name]).get(name) == "ready"
+
+    def add_to_vector_store(self, name: str, documents: list, persist: bool = True) -> None:
+        self.upsert(name, documents, persist=persist)
+
+    def update_vector_store(self, name: str, documents: list) -> None:
+        self.upsert(name, documents)
+
+    def add_references(self, name: str, references: list, persist: bool = True) -> None:
+        self.reference(name, references, persist=persist)
+
+    def persist_vector_store(self, name: str) -> None:
+        self.persist(name)
+
+    def delete_from_vector_store(self, name: str, ref_doc_ids: List[str]) -> None:
+        self.delete(name, ref_doc_ids)
+
+    def verify_store(self, name: str, deep: bool = False) -> Dict:
+        return self._call("verify", name=name, deep=deep)
+
+    def clear_vector_store(self, name: str) -> None:
+        self._call("clear", name=name)
+
+    def remove_vector_store(self, name: str) -> bool:
+        return self._call("remove", name=name)
+
+    def get_store_path(self, name: str) -> Path:
+        return Path(self._call("path", name=name))
+
+    def get_index_path(self) -> str:
+        return self._call("index_path")
+
+
+def main():
+    """Run the vector store service until interrupted."""
+    parser = argparse.ArgumentParser(description="Yeshie vector store service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    from embedding_model import init_embedding_model
+    from code_chunker import init_node_parser
+    init_embedding_model()
+    # Clients send whole documents; chunk them as a local pipeline would
+    init_node_parser()
+
+    service = VectorStoreService()
+    service.manager.warm_up()
+    server = serve(args.host, args.port, service)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Vector store service stopped")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()